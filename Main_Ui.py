@@ -8,44 +8,61 @@ import PyQt5.QtCore
 import pymysql
 import sip
 from PyQt5.QtCore import QDate
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon, QFont, QColor, QCursor
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 from PyQt5.QtWidgets import QDialog
 from PyQt5.QtWidgets import QFrame
 from PyQt5.QtWidgets import QGridLayout, QDateEdit
-from PyQt5.QtWidgets import QHeaderView
+from PyQt5.QtWidgets import QHeaderView, QTableView
 from PyQt5.QtWidgets import (QMainWindow, QApplication, QWidget, QVBoxLayout,
                              QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
-                             QLabel, QLineEdit, QComboBox, QMessageBox, QAction, QGroupBox, QTextEdit)
+                             QLabel, QLineEdit, QComboBox, QMessageBox, QAction, QGroupBox, QTextEdit, QCheckBox)
 import history
 from db_connect import Database
+from dict_cache import change_type_cache
+from history_pager import HistoryPager
 from network import SocketClient
+from query_executor import QueryExecutor
+from table_models import EmployeeTableModel
+from tcp_client import TcpSocketClient
 
 
 class MainWindow(QMainWindow):
-    FIELD_MAPPING = [
-        "employee_id",  # 第0列
-        "employee_name",  # 第1列
-        "account",  # 第2列
-        "created_at",  # 第3列（日期类型）
-        "marital_status",  # 第4列
-        "education",  # 第5列
-        "gender",  # 第6列
-        "position_name"  # 第7列（可能为NULL）
-    ] # 员工字段映射
+    FIELD_MAPPING = EmployeeTableModel.FIELDS  # 员工字段映射
     POSITION_FIELD_MAPPING = ["position_id", "position_name"]   # 职位映射
+    EMPLOYEE_QUERY = """
+        SELECT e.employee_id, a.employee_name, a.account, a.created_at, 
+               e.marital_status, e.education, e.gender, p.position_name
+        FROM employee_basic_info e
+        LEFT JOIN employee_positions p ON e.position_id = p.position_id
+        LEFT JOIN employee_accounts a ON e.employee_id = a.employee_id
+    """  # 员工列表基础查询（WHERE/ORDER BY由调用方追加）
+    SUGGESTION_QUERY = """
+        SELECT s.suggestion_id, 
+               CONCAT(a.employee_id, ' - ', a.employee_name) AS employee,
+               s.suggestion_type, s.suggestion_content,
+               s.submit_time, s.status, s.employee_id
+        FROM suggestion_box s
+        LEFT JOIN employee_accounts a ON s.employee_id = a.employee_id
+    """  # 意见箱基础查询
+    SUBSCRIBED_TOPICS = ["employee", "suggestion"]  # 连接服务器后订阅的数据变更主题
     def __init__(self, admin_type_id=1):
         super().__init__()
         self.admin_type_id = admin_type_id  # 管理员登录
         self.db = Database()  # 数据库连接
+        self.query_executor = QueryExecutor(self)  # 后台查询执行器（避免阻塞界面）
+        self.query_executor.loading_changed.connect(self._on_loading_changed)
+        self.history_pager = HistoryPager(page_size=50)  # 历史记录键集分页（缓存跨标签页重建保留）
+        self.history_cursor = None  # 当前历史页的翻页游标
         self.init_ui()
         self.load_employee_data()  # 加载员工数据
         self.setup_menu()  # 设置菜单
         self.object_cleanup_timers = {}  # 维护清理定时器
         self.weak_refs = weakref.WeakValueDictionary()  # 全局弱引用存储
         self.socket_client = None  # 初始化 SocketClient 对象
+        self.streaming_commands = {}  # 流式命令 request_id -> {"command", "started"}
         self.history_service = history.HistoryService(self.db)  # 初始化历史记录服务
 
     def init_ui(self):
@@ -246,17 +263,24 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             self.close()
 
-    def _populate_employee_table(self, employees):
-        """通用方法：填充员工表格数据"""
-        self.employee_table.setRowCount(len(employees))
-        for row, emp in enumerate(employees):
-            for col in range(8):
-                field = self.FIELD_MAPPING[col]
-                value = emp.get(field, "")
-                if isinstance(value, (datetime.date, datetime.datetime)):
-                    value = value.strftime('%Y-%m-%d')
-                item_text = str(value) if value is not None else "未设置"
-                self.employee_table.setItem(row, col, QTableWidgetItem(item_text))
+    def closeEvent(self, event):
+        """窗口关闭时停止后台查询、写完历史记录并归还数据库连接"""
+        self.query_executor.shutdown()
+        self.history_service.close()
+        self.db.close()
+        super().closeEvent(event)
+
+    def _on_loading_changed(self, key, loading):
+        """后台查询进行中时在状态栏显示加载提示（不阻塞界面）"""
+        if self.query_executor.is_loading():
+            self.statusBar().showMessage("正在加载数据...")
+        else:
+            self.statusBar().clearMessage()
+
+    def _selected_employee_row(self):
+        """返回员工表格当前选中的行号，未选中时返回None"""
+        selected_rows = self.employee_table.selectionModel().selectedRows()
+        return selected_rows[0].row() if selected_rows else None
 
     # 另一个功能的ui  分界符********************************
     def create_employee_list_tab(self):
@@ -278,6 +302,14 @@ class MainWindow(QMainWindow):
         self.emp_search.setMinimumWidth(200)
         search_btn = QPushButton("搜索")
         search_btn.clicked.connect(self.search_employees)
+
+        # 输入停顿300ms后自动搜索，新的搜索会取代尚未返回的旧查询
+        self.emp_search_timer = QTimer(tab)
+        self.emp_search_timer.setSingleShot(True)
+        self.emp_search_timer.setInterval(300)
+        self.emp_search_timer.timeout.connect(self.search_employees)
+        self.emp_search.textChanged.connect(lambda _: self.emp_search_timer.start())
+        self.emp_search.returnPressed.connect(self.search_employees)
         # --------------------------------------
 
         add_btn = QPushButton("添加员工")
@@ -299,41 +331,66 @@ class MainWindow(QMainWindow):
 
         layout.addLayout(search_bar)
 
-        # 员工表格
-        self.employee_table = QTableWidget()
-        self.employee_table.setEditTriggers(QTableWidget.NoEditTriggers)  # 不可编辑
-        self.employee_table.setSelectionBehavior(QTableWidget.SelectRows)  # 整行选择
-        self.employee_table.setSelectionMode(QTableWidget.SingleSelection)  # 单选
-        self.employee_table.setColumnCount(8)
-        self.employee_table.setHorizontalHeaderLabels([
-            "员工ID", "姓名", "电话", "入职日期", "婚姻状况", "学历", "性别", "职位"
-        ])
-        self.employee_table.horizontalHeader().setStretchLastSection(True)
-        self.employee_table.doubleClicked.connect(self.edit_employee)  # 双击编辑
+        # 员工表格（模型/视图：只渲染可见行）
+        self.employee_table = QTableView()
+        self.employee_model = EmployeeTableModel(self.employee_table)
+        self.employee_table.setModel(self.employee_model)
+        self._setup_employee_table()
 
         layout.addWidget(self.employee_table)
 
         return tab
+
+    def _setup_employee_table(self):
+        """员工表格视图的通用配置"""
+        self.employee_table.setEditTriggers(QTableView.NoEditTriggers)  # 不可编辑
+        self.employee_table.setSelectionBehavior(QTableView.SelectRows)  # 整行选择
+        self.employee_table.setSelectionMode(QTableView.SingleSelection)  # 单选
+        self.employee_table.horizontalHeader().setStretchLastSection(True)
+        # 固定行高，避免视图为计算行高遍历全部行
+        self.employee_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.employee_table.verticalHeader().setDefaultSectionSize(30)
+        self.employee_table.doubleClicked.connect(self.edit_employee)  # 双击编辑
     # 另一个功能的ui  分界符********************************
     def load_employee_data(self):
-        """加载员工基本信息到表格"""
-        try:
-            query = """
-                SELECT e.employee_id, a.employee_name, a.account, a.created_at, 
-                       e.marital_status, e.education, e.gender, p.position_name
-                FROM employee_basic_info e
-                LEFT JOIN employee_positions p ON e.position_id = p.position_id
-                LEFT JOIN employee_accounts a ON e.employee_id = a.employee_id
-                ORDER BY e.employee_id
-            """
+        """加载员工基本信息到表格（后台线程查询）"""
+        query = self.EMPLOYEE_QUERY + " ORDER BY e.employee_id"
+        self.query_executor.submit(
+            "employee", lambda db: EmployeeTableModel.columnize(db.fetch_all(query)),
+            on_success=lambda employees: self._on_employees_loaded(employees, "已加载 {} 条员工记录"),
+            on_error=lambda msg: QMessageBox.critical(self, "错误", f"加载员工数据失败: {msg}")
+        )
 
-            employees = self.db.fetch_all(query)
-            self._populate_employee_table(employees)
+    def _on_employees_loaded(self, columns, status_text):
+        """后台查询（已在工作线程中按列整理）完成后刷新员工模型"""
+        if sip.isdeleted(self.employee_table):
+            return
+        self.employee_model.set_columns(columns)
+        self.statusBar().showMessage(status_text.format(self.employee_model.rowCount()), 3000)
 
+    def refresh_employee_rows(self, action, employee_ids):
+        """只刷新变更涉及的员工行：删除直接移除，新增/修改按ID查询这几行后更新到模型"""
+        if sip.isdeleted(self.employee_table) or not employee_ids:
+            return
+        if action == "delete":
+            self.employee_model.remove_ids(employee_ids)
+            return
+        # 正在显示搜索结果时不插入新员工（可能不符合搜索条件），已显示的行照常更新
+        search = getattr(self, 'emp_search', None)
+        insert = action == "insert" and (search is None or sip.isdeleted(search) or not search.text().strip())
+        placeholders = ", ".join(["%s"] * len(employee_ids))
+        query = self.EMPLOYEE_QUERY + f" WHERE e.employee_id IN ({placeholders})"
+        self.query_executor.submit(
+            f"employee_rows:{','.join(map(str, employee_ids))}",
+            lambda db: db.fetch_all(query, tuple(employee_ids)),
+            on_success=lambda rows: self._on_employee_rows_loaded(rows, insert),
+            on_error=lambda msg: self.statusBar().showMessage(f"刷新员工数据失败: {msg}", 3000)
+        )
 
-            self.statusBar().showMessage(f"已加载 {len(employees)} 条员工记录", 3000)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"加载员工数据失败: {str(e)}")
+    def _on_employee_rows_loaded(self, rows, insert):
+        if sip.isdeleted(self.employee_table):
+            return
+        self.employee_model.upsert_rows(rows, insert)
 
     def search_employees(self):
         """搜索员工（优化版：支持选择搜索字段）"""
@@ -356,26 +413,16 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", "无效的搜索字段，请选择有效选项")
             return
 
-        try:
-            # 3. 构造动态查询
-            query = f"""
-                SELECT e.employee_id, a.employee_name, a.account, a.created_at, 
-                       e.marital_status, e.education, e.gender, p.position_name
-                FROM employee_basic_info e
-                LEFT JOIN employee_positions p ON e.position_id = p.position_id
-                LEFT JOIN employee_accounts a ON e.employee_id = a.employee_id
-                WHERE {db_field} LIKE %s 
-                ORDER BY e.employee_id
-            """
-            params = (f"%{keyword}%",)  # 模糊查询参数
-
-            # 4. 执行查询并填充表格
-            employees = self.db.fetch_all(query, params)
-            self._populate_employee_table(employees)  # 复用统一填充方法
+        # 3. 构造动态查询
+        query = self.EMPLOYEE_QUERY + f" WHERE {db_field} LIKE %s ORDER BY e.employee_id"
+        params = (f"%{keyword}%",)  # 模糊查询参数
 
-            self.statusBar().showMessage(f"搜索到 {len(employees)} 条记录", 3000)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"搜索失败: {str(e)}")
+        # 4. 后台执行查询并填充表格（与加载共用key，新搜索会取代旧查询）
+        self.query_executor.submit(
+            "employee", lambda db: EmployeeTableModel.columnize(db.fetch_all(query, params)),
+            on_success=lambda employees: self._on_employees_loaded(employees, "搜索到 {} 条记录"),
+            on_error=lambda msg: QMessageBox.critical(self, "错误", f"搜索失败: {msg}")
+        )
     def add_employee(self):
         """添加员工（完整实现）"""
         dialog = QDialog(self)
@@ -544,7 +591,8 @@ class MainWindow(QMainWindow):
                     client_ip=self.get_current_ip()  # 可选：获取客户端IP
                 )
                 QMessageBox.information(dialog, "成功", "员工添加成功")
-                self.load_employee_data()  # 刷新数据
+                self.refresh_employee_rows("insert", [employee_id])  # 只查询并插入新增的这一行
+                self.publish_change("employee", "insert", [employee_id])
                 dialog.accept()
             except pymysql.Error as e:
                 QMessageBox.critical(dialog, "错误", f"添加失败: {str(e)}")
@@ -558,13 +606,12 @@ class MainWindow(QMainWindow):
     def edit_employee(self):
         """修改员工（完善版）"""
         # 获取选中行
-        selected_rows = self.employee_table.selectionModel().selectedRows()
-        if not selected_rows:
+        row = self._selected_employee_row()
+        if row is None:
             QMessageBox.warning(self, "提示", "请先选择要修改的员工")
             return
 
-        row = selected_rows[0].row()
-        emp_id = self.employee_table.item(row, 0).text()
+        emp_id = str(self.employee_model.value(row, "employee_id"))
 
         # 获取员工当前数据
         try:
@@ -751,7 +798,8 @@ class MainWindow(QMainWindow):
                     client_ip=self.get_current_ip()
                 )
                 QMessageBox.information(dialog, "成功", "员工信息更新成功")
-                self.load_employee_data()
+                self.refresh_employee_rows("update", [int(emp_id)])
+                self.publish_change("employee", "update", [int(emp_id)])
                 dialog.accept()
             except pymysql.Error as e:
                 self.db.rollback()
@@ -771,15 +819,13 @@ class MainWindow(QMainWindow):
 # 下面为删除员工得函数
     def delete_employee(self):
         """删除员工"""
-        selected_rows = self.employee_table.selectionModel().selectedRows()
-        if not selected_rows:
+        row = self._selected_employee_row()
+        if row is None:
             QMessageBox.warning(self, "提示", "请先选择要删除的员工")
             return
 
-        # 修正：获取QModelIndex对应的行号
-        row = selected_rows[0].row()  # 获取选中行的行号
-        emp_id = self.employee_table.item(row, 0).text()
-        emp_name = self.employee_table.item(row, 1).text()
+        emp_id = str(self.employee_model.value(row, "employee_id"))
+        emp_name = self.employee_model.index(row, 1).data()
 
         reply = QMessageBox.question(self, "确认删除",
                                      f"确定要删除员工 {emp_name} (ID: {emp_id}) 吗？",
@@ -808,7 +854,8 @@ class MainWindow(QMainWindow):
                     operator_id=self.admin_type_id,
                     client_ip=self.get_current_ip()
                 )
-                self.load_employee_data()  # 重新加载数据
+                self.employee_model.remove_ids([int(emp_id)])
+                self.publish_change("employee", "delete", [int(emp_id)])
                 self.statusBar().showMessage(f"已删除员工 {emp_name}", 3000)
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
@@ -893,56 +940,53 @@ class MainWindow(QMainWindow):
 
         return tab
 
-    def load_position_data(self):
-        """加载职位数据（修复版）"""
-        try:
-            query = "SELECT position_id, position_name FROM employee_positions ORDER BY position_id"
-            positions = self.db.fetch_all(query)
+    def _populate_position_table(self, positions, status_text):
+        """通用方法：填充职位表格数据（表格可能已随标签页切换被销毁）"""
+        if sip.isdeleted(self.position_table):
+            return
+        self.position_table.setRowCount(len(positions))
+        for row, pos in enumerate(positions):
+            for col in range(2):
+                field = self.POSITION_FIELD_MAPPING[col]  # 按列取字段名
+                value = pos.get(field, "")  # 安全获取值（避免键不存在）
 
-            self.position_table.setRowCount(len(positions))
-            for row, pos in enumerate(positions):
-                for col in range(2):
-                    field = self.POSITION_FIELD_MAPPING[col]  # 按列取字段名
-                    value = pos.get(field, "")  # 安全获取值（避免键不存在）
+                # 处理空值（如数据库中为NULL）
+                item_text = str(value) if value is not None else "未设置"
 
-                    # 处理空值（如数据库中为NULL）
-                    item_text = str(value) if value is not None else "未设置"
+                item = QTableWidgetItem(item_text)
+                item.setTextAlignment(Qt.AlignCenter)
+                self.position_table.setItem(row, col, item)
 
-                    item = QTableWidgetItem(item_text)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.position_table.setItem(row, col, item)
+        self.status_label.setText(status_text.format(len(positions)))
 
-            self.status_label.setText(f"共加载 {len(positions)} 个职位")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"加载职位数据失败: {str(e)}")
+    def _on_position_load_failed(self, message, title):
+        QMessageBox.critical(self, "错误", f"{title}: {message}")
+        if not sip.isdeleted(self.status_label):
             self.status_label.setText("数据加载失败")
 
+    def load_position_data(self):
+        """加载职位数据（后台线程查询）"""
+        query = "SELECT position_id, position_name FROM employee_positions ORDER BY position_id"
+        self.query_executor.submit(
+            "position", lambda db: db.fetch_all(query),
+            on_success=lambda positions: self._populate_position_table(positions, "共加载 {} 个职位"),
+            on_error=lambda msg: self._on_position_load_failed(msg, "加载职位数据失败")
+        )
+
     def search_positions(self):
-        """搜索职位（修复版）"""
+        """搜索职位（后台线程查询）"""
         keyword = self.pos_search.text().strip()
         if not keyword:
             self.load_position_data()
             return
 
-        try:
-            query = "SELECT position_id, position_name FROM employee_positions WHERE position_name LIKE %s ORDER BY position_id"
-            positions = self.db.fetch_all(query, (f"%{keyword}%",))
-
-            self.position_table.setRowCount(len(positions))
-            for row, pos in enumerate(positions):
-                for col in range(2):
-                    field = self.POSITION_FIELD_MAPPING[col]
-                    value = pos.get(field, "")
-                    item_text = str(value) if value is not None else "未设置"
-
-                    item = QTableWidgetItem(item_text)
-                    item.setTextAlignment(Qt.AlignCenter)
-                    self.position_table.setItem(row, col, item)
-
-            self.status_label.setText(f"搜索到 {len(positions)} 个职位")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"搜索职位失败: {str(e)}")
-            self.status_label.setText("搜索失败")
+        query = "SELECT position_id, position_name FROM employee_positions WHERE position_name LIKE %s ORDER BY position_id"
+        params = (f"%{keyword}%",)
+        self.query_executor.submit(
+            "position", lambda db: db.fetch_all(query, params),
+            on_success=lambda positions: self._populate_position_table(positions, "搜索到 {} 个职位"),
+            on_error=lambda msg: self._on_position_load_failed(msg, "搜索职位失败")
+        )
     def show_add_position_dialog(self):
         """显示添加职位对话框"""
         dialog = QDialog(self)
@@ -1182,12 +1226,8 @@ class MainWindow(QMainWindow):
 
         # 加载变更类型（修复数据绑定）
         try:
-            # 获取type_id、type_name、description三个字段
-            types = self.db.fetch_all("""
-                SELECT type_id, type_name, description 
-                FROM change_type_dict 
-                WHERE is_active = 1
-            """)
+            # 获取type_id、type_name、description三个字段（读字典缓存）
+            types = change_type_cache.active_types(self.db)
             self.history_type.addItem("所有类型", None)
             for t in types:
                 # 显示友好的description，存储type_name作为筛选依据
@@ -1475,7 +1515,7 @@ class MainWindow(QMainWindow):
         # 事件连接
         search_btn.clicked.connect(self.search_history)
         export_btn.clicked.connect(self.export_history)
-        refresh_btn.clicked.connect(self.load_history_data)
+        refresh_btn.clicked.connect(self.refresh_history)
         clear_btn.clicked.connect(self.clear_filters)
         self.history_table.doubleClicked.connect(self.show_history_detail)
         self.prev_page.clicked.connect(self.prev_page_func)
@@ -1485,60 +1525,51 @@ class MainWindow(QMainWindow):
         # 初始化分页
         self.current_page = 1
         self.total_pages = 1
-        self.items_per_page = 50
+        self.items_per_page = self.history_pager.page_size
+        self.history_cursor = None
         return tab
 
     def load_history_data(self, page=1):
-        """加载历史记录（修复数据显示、记录数矛盾）"""
-        try:
-            offset = (page - 1) * self.items_per_page
-            base_subquery = """
-                SELECT h.history_id, h.employee_id, a.employee_name, h.change_date, 
-                       t.type_name AS change_type, admin.admin_account AS operator,
-                       h.old_info, h.new_info, h.related_table
-                FROM history_info h
-                JOIN change_type_dict t ON h.type_id = t.type_id
-                LEFT JOIN employee_accounts a ON h.employee_id = a.employee_id
-                LEFT JOIN admin_accounts admin ON h.operator_id = admin.admin_account_id
-            """
-            where_clause = " WHERE 1=1 "
-            params = []
-
-            # 员工筛选
-            emp_id = self.history_emp_id.text().strip()
-            if emp_id:
-                where_clause += " AND (subquery.employee_id = %s OR subquery.employee_name LIKE %s) "
-                params.extend([emp_id, f"%{emp_id}%"])
-
-            # 变更类型筛选（修复：匹配数据库`type_name`）
-            change_type = self.history_type.currentData()  # 存储type_name
-            if change_type is not None and change_type != "所有类型":
-                where_clause += " AND subquery.change_type = %s "
-                params.append(change_type)
-
-            # 日期筛选
-            start_date = self.start_date.date().toString("yyyy-MM-dd")
-            end_date = self.end_date.date().toString("yyyy-MM-dd")
-            where_clause += " AND subquery.change_date BETWEEN %s AND %s "
-            params.extend([f"{start_date} 00:00:00", f"{end_date} 23:59:59"])
-
-            # 总记录数（修复列引用）
-            count_query = f"SELECT COUNT(*) as total FROM ({base_subquery}) AS subquery {where_clause}"
-            total_result = self.db.fetch_one(count_query, params)
-            total = total_result["total"] if total_result else 0
-            self.total_pages = (total + self.items_per_page - 1) // self.items_per_page
-            self.current_page = page
-
-            # 分页查询（修复列引用）
-            query = f"""
-                SELECT * FROM ({base_subquery}) AS subquery 
-                {where_clause} 
-                ORDER BY subquery.history_id DESC 
-                LIMIT %s OFFSET %s
-            """
-            params.extend([self.items_per_page, offset])
-            history = self.db.fetch_all(query, params) or []
+        """加载历史记录（筛选条件在GUI线程读取，键集分页查询在后台线程执行）"""
+        start_date = self.start_date.date().toString("yyyy-MM-dd")
+        end_date = self.end_date.date().toString("yyyy-MM-dd")
+        where_clause, params = HistoryPager.build_filters(
+            self.history_emp_id.text().strip(),
+            self.history_type.currentData(),  # 存储type_name
+            f"{start_date} 00:00:00",
+            f"{end_date} 23:59:59"
+        )
+        cursor = self.history_cursor
+
+        self.query_executor.submit(
+            "history",
+            lambda db: self.history_pager.fetch_page(db, where_clause, params, page, cursor),
+            on_success=self._on_history_loaded,
+            on_error=self._on_history_load_failed
+        )
+
+    def refresh_history(self):
+        """刷新：丢弃缓存的总数与游标索引后重新加载第一页"""
+        self.history_pager.invalidate()
+        self.load_history_data(page=1)
 
+    def _on_history_load_failed(self, message):
+        QMessageBox.critical(self, "错误", f"加载失败: {message}")
+        if not sip.isdeleted(self.history_status):
+            self.history_status.setText("数据加载失败")
+
+    def _on_history_loaded(self, result):
+        """后台查询完成后填充历史记录表格"""
+        if sip.isdeleted(self.history_table):
+            return
+        total = result["total"]
+        history = result["rows"]
+        self.total_pages = result["total_pages"]
+        self.current_page = result["page"]
+        self.history_cursor = result["cursor"]
+        try:
+            # 填充表格前关闭排序，避免逐行插入时反复重排导致错位
+            self.history_table.setSortingEnabled(False)
             # 填充表格（存储原始JSON到UserRole）
             self.history_table.setRowCount(len(history))
             for row, item in enumerate(history):
@@ -1590,6 +1621,8 @@ class MainWindow(QMainWindow):
                 new_item.setData(Qt.UserRole, new_info_raw)
                 self.history_table.setItem(row, 6, new_item)
 
+            self.history_table.setSortingEnabled(True)
+
             # 更新状态
             self.update_pagination()
             self.history_status.setText(f"共 {total} 条记录，当前显示 {len(history)} 条")
@@ -1685,9 +1718,9 @@ class MainWindow(QMainWindow):
 
         self.total_pages = max(1, self.total_pages)  # 确保至少1页
         self.page_label.setText(f"第 {self.current_page} 页 / 共 {self.total_pages} 页")
-        self.page_combo.clear()
-        for i in range(1, self.total_pages + 1):
-            self.page_combo.addItem(str(i))
+        if self.page_combo.count() != self.total_pages:  # 页数不变时不重建下拉项
+            self.page_combo.clear()
+            self.page_combo.addItems([str(i) for i in range(1, self.total_pages + 1)])
         self.page_combo.setCurrentIndex(self.current_page - 1)
 
         # 恢复信号连接
@@ -1758,8 +1791,10 @@ class MainWindow(QMainWindow):
         import csv
         from PyQt5.QtWidgets import QFileDialog
 
-        # 获取当前筛选条件下的数据
-        self.search_history()  # 确保加载最新数据
+        # 导出当前表格中已加载的数据（查询在后台执行，这里不再同步重新加载）
+        if self.query_executor.is_loading("history"):
+            QMessageBox.information(self, "提示", "数据正在加载，请稍后再导出")
+            return
 
         # 生成文件名
         filename = f"历史记录导出_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
@@ -2157,6 +2192,9 @@ class MainWindow(QMainWindow):
         self.connect_btn = QPushButton("连接服务器")
         self.disconnect_btn = QPushButton("断开连接")
         self.disconnect_btn.setEnabled(False)
+        # 事件驱动客户端：不占用单独线程，断开时立即返回
+        self.event_client_check = QCheckBox("事件驱动客户端")
+        self.event_client_check.setChecked(True)
 
         connection_layout.addWidget(host_label)
         connection_layout.addWidget(self.server_host)
@@ -2164,6 +2202,7 @@ class MainWindow(QMainWindow):
         connection_layout.addWidget(self.server_port)
         connection_layout.addWidget(self.connect_btn)
         connection_layout.addWidget(self.disconnect_btn)
+        connection_layout.addWidget(self.event_client_check)
         connection_layout.addStretch()
 
         # 状态显示
@@ -2198,8 +2237,11 @@ class MainWindow(QMainWindow):
         self.cmd_input.setPlaceholderText("输入命令...")
         send_cmd_btn = QPushButton("发送命令")
 
+        stats_btn = QPushButton("查看服务器统计")
+
         cmd_layout.addWidget(self.cmd_input)
         cmd_layout.addWidget(send_cmd_btn)
+        cmd_layout.addWidget(stats_btn)
 
         layout.addWidget(cmd_group)
 
@@ -2220,6 +2262,7 @@ class MainWindow(QMainWindow):
         self.send_ip_btn.clicked.connect(self.send_ip_to_server)
         self.cmd_input.returnPressed.connect(lambda: send_cmd_btn.click())
         send_cmd_btn.clicked.connect(self.send_command)
+        stats_btn.clicked.connect(self.request_server_stats)
 
         return tab
 
@@ -2232,13 +2275,23 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请输入服务器地址和端口")
             return
 
+        # 旧连接可能仍在后台自动重连，先停止
+        if self.socket_client and self.socket_client.isRunning():
+            self.socket_client.stop()
+
         try:
-            self.socket_client = SocketClient()
+            client_class = TcpSocketClient if self.event_client_check.isChecked() else SocketClient
+            self.socket_client = client_class()
             self.socket_client.set_server(host, port)
             self.socket_client.status_updated.connect(self.update_log)
             self.socket_client.message_received.connect(self.process_server_message)  # 关键修改：连接到新的处理方法
             self.socket_client.connection_established.connect(self.on_connected)
             self.socket_client.connection_lost.connect(self.on_disconnected)
+            self.socket_client.request_timed_out.connect(self.on_command_timed_out)
+            self.socket_client.request_failed.connect(self.on_command_failed)
+            self.socket_client.rtt_measured.connect(self.on_rtt_measured)
+            self.socket_client.reconnecting.connect(self.on_reconnecting)
+            self.socket_client.subscribe(self.SUBSCRIBED_TOPICS)  # 其他客户端修改数据时由服务器推送变更
 
             self.socket_client.start()
             self.log_display.append(f"正在连接到服务器 {host}:{port}...")
@@ -2263,6 +2316,25 @@ class MainWindow(QMainWindow):
                 result = f"命令执行结果: {command}\n状态: {status}\n输出:\n{output}\n错误:\n{error}"
                 self.update_log(result)
 
+            # 处理流式命令输出（边执行边显示）
+            elif message.get("type") == "command_chunk":
+                self.append_command_output(message)
+
+            # 流式命令执行结束
+            elif message.get("type") == "command_done":
+                pending = self.streaming_commands.pop(message.get("request_id"), {})
+                command = pending.get("command", message.get("command", "unknown"))
+                status = message.get("status", "unknown")
+                self.update_log(f"命令执行结果: {command}\n状态: {status}\n{message.get('message', '')}")
+
+            # 服务器运行统计
+            elif message.get("type") == "stats":
+                self.show_server_stats(message.get("stats", {}))
+
+            # 其他客户端推送的数据变更
+            elif message.get("type") == "event":
+                self.apply_change_event(message.get("topic"), message.get("event") or {})
+
             # 处理普通消息
             elif message.get("type") in ["response", "heartbeat_ack", "ip"]:
                 self.update_log(f"收到服务器消息: {message}")
@@ -2275,6 +2347,42 @@ class MainWindow(QMainWindow):
 
         except Exception as e:
             self.update_log(f"处理服务器消息失败: {str(e)}")
+    def publish_change(self, topic, action, ids, **fields):
+        """已连接服务器时广播数据变更，其他客户端据此刷新受影响的行"""
+        if self.socket_client and self.socket_client.isRunning():
+            self.socket_client.publish(topic, action, ids, **fields)
+
+    def apply_change_event(self, topic, event):
+        """处理服务器推送的数据变更事件：只刷新涉及的行"""
+        ids = event.get("ids") or []
+        if topic == "employee":
+            self.refresh_employee_rows(event.get("action"), ids)
+        elif topic == "suggestion":
+            self.refresh_suggestion_rows(event.get("action"), ids)
+        self.update_log(f"数据变更: {topic} {event.get('action')} {ids}")
+
+    def on_command_timed_out(self, request_id):
+        pending = self.streaming_commands.pop(request_id, None)
+        if pending is not None:
+            self.update_log(f"错误: 命令响应超时: {pending['command']}")
+
+    def on_command_failed(self, request_id, reason):
+        pending = self.streaming_commands.pop(request_id, None)
+        if pending is not None:
+            self.update_log(f"错误: 命令未完成: {pending['command']} ({reason})")
+
+    def append_command_output(self, message):
+        """把流式命令输出原样追加到日志末尾"""
+        pending = self.streaming_commands.get(message.get("request_id"))
+        if pending is not None and not pending["started"]:
+            pending["started"] = True
+            self.log_display.append("")  # 输出从新的一段开始
+        cursor = self.log_display.textCursor()
+        cursor.movePosition(cursor.End)
+        cursor.insertText(message.get("data", ""))
+        self.log_display.setTextCursor(cursor)
+        self.log_display.ensureCursorVisible()
+
     def disconnect_from_server(self):
         """断开与服务器的连接"""
         if self.socket_client and self.socket_client.isRunning():
@@ -2350,19 +2458,49 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请先连接到服务器")
             return
 
-        # 构建命令数据
+        # 构建命令数据（流式执行，输出通过command_chunk陆续返回）
         data = {
             "type": "command",
             "command": cmd,
-            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "client_id": "your_client_identifier"  # 客户端标识
+            "client_id": "your_client_identifier",  # 客户端标识
+            "stream": True
         }
 
-        # 发送安全数据（包含签名）
-        self.socket_client.send_secure_data(data)
+        # 发送安全数据（包含签名），无需等待上一条命令返回
+        future = self.socket_client.send_request(data)
+        if not future.done():
+            self.streaming_commands[future.request_id] = {"command": cmd, "started": False}
         self.cmd_input.clear()
         self.update_log(f"发送安全命令: {cmd}")
 
+    def request_server_stats(self):
+        """向服务器查询运行统计"""
+        if not self.socket_client or not self.socket_client.isRunning():
+            QMessageBox.warning(self, "警告", "请先连接到服务器")
+            return
+        self.socket_client.request_stats()
+
+    def show_server_stats(self, stats):
+        """在通信日志中显示服务器运行统计"""
+        wait = stats.get("command_wait", {})
+        run = stats.get("command_run", {})
+        commands = "，".join(f"{name}×{count}" for name, count in stats.get("commands", {}).items()) or "无"
+        lines = [
+            "服务器统计:",
+            f"连接: 当前 {stats.get('active_connections', 0)}，累计 {stats.get('total_connections', 0)}，"
+            f"拒绝 {stats.get('rejected_connections', 0)}",
+            f"帧: 收 {stats.get('frames_in', 0)} / 发 {stats.get('frames_out', 0)}，"
+            f"{stats.get('frames_per_sec', 0):.1f} 帧/秒",
+            f"字节: 收 {stats.get('bytes_in', 0)} / 发 {stats.get('bytes_out', 0)}",
+            f"签名失败 {stats.get('signature_failures', 0)}，重放拒绝 {stats.get('replay_rejections', 0)}",
+            f"排队耗时(ms): p50 {wait.get('p50', 0) * 1000:.1f} / p95 {wait.get('p95', 0) * 1000:.1f} / "
+            f"p99 {wait.get('p99', 0) * 1000:.1f}",
+            f"执行耗时(ms): p50 {run.get('p50', 0) * 1000:.1f} / p95 {run.get('p95', 0) * 1000:.1f} / "
+            f"p99 {run.get('p99', 0) * 1000:.1f}",
+            f"命令: {commands}",
+        ]
+        self.update_log("\n".join(lines))
+
     def on_connected(self):
         """连接建立后的处理"""
         self.connect_btn.setEnabled(False)
@@ -2372,6 +2510,15 @@ class MainWindow(QMainWindow):
         self.status_label.setStyleSheet("font-size: 14px; color: #4CAF50; font-weight: bold;")
         self.update_log("服务器连接已建立")
 
+    def on_reconnecting(self, attempt, delay):
+        """自动重连中：期间发送的命令会在重连后补发"""
+        self.status_label.setText(f"服务器状态: 重连中 (第{attempt}次，{delay:.0f}秒后)")
+        self.status_label.setStyleSheet("font-size: 14px; color: #FF9800; font-weight: bold;")
+
+    def on_rtt_measured(self, rtt_ms):
+        """心跳往返时间更新到服务器状态"""
+        self.status_label.setText(f"服务器状态: 已连接 (延迟 {rtt_ms:.0f} ms)")
+
     def on_disconnected(self):
         """连接断开后的处理"""
         self.connect_btn.setEnabled(True)
@@ -2515,53 +2662,99 @@ class MainWindow(QMainWindow):
         return tab
 
     def load_suggestion_data(self):
-        """加载意见数据（管理员视图）"""
-        try:
-            query = """
-                SELECT s.suggestion_id, 
-                       CONCAT(a.employee_id, ' - ', a.employee_name) AS employee,
-                       s.suggestion_type, s.suggestion_content,
-                       s.submit_time, s.status, s.employee_id
-                FROM suggestion_box s
-                LEFT JOIN employee_accounts a ON s.employee_id = a.employee_id
-                ORDER BY s.submit_time DESC
-            """
-            suggestions = self.db.fetch_all(query)
+        """加载意见数据（管理员视图，后台线程查询）"""
+        query = self.SUGGESTION_QUERY + " ORDER BY s.submit_time DESC"
+        self.query_executor.submit(
+            "suggestion", lambda db: db.fetch_all(query),
+            on_success=self._populate_suggestion_table,
+            on_error=lambda msg: QMessageBox.critical(self, "错误", f"加载意见数据失败: {msg}")
+        )
 
+    def _populate_suggestion_table(self, suggestions):
+        """通用方法：填充意见表格数据（表格可能已随标签页切换被销毁）"""
+        if sip.isdeleted(self.suggestion_table):
+            return
+        try:
             self.suggestion_table.setRowCount(len(suggestions))
             for row, sugg in enumerate(suggestions):
-                self.suggestion_table.setItem(row, 0, QTableWidgetItem(str(sugg['suggestion_id'])))
-                self.suggestion_table.setItem(row, 1, QTableWidgetItem(sugg['employee']))
-                self.suggestion_table.setItem(row, 2, QTableWidgetItem(sugg['suggestion_type']))
-                self.suggestion_table.setItem(row, 3, QTableWidgetItem(sugg['suggestion_content']))
-                self.suggestion_table.setItem(row, 4, QTableWidgetItem(str(sugg['submit_time'])))
-
-                # 状态显示
-                status_text = "未处理" if sugg['status'] == 0 else "已处理"
-                status_item = QTableWidgetItem(status_text)
-                status_item.setForeground(QColor("red" if sugg['status'] == 0 else "green"))
-                self.suggestion_table.setItem(row, 5, status_item)
-
-                # 操作按钮
-                reply_btn = QPushButton("回复")
-                reply_btn.setStyleSheet("""
-                    QPushButton {
-                        background-color: #165DFF;
-                        color: white;
-                        border-radius: 4px;
-                        padding: 4px 8px;
-                        font-size: 12px;
-                    }
-                    QPushButton:hover {
-                        background-color: #0D47A1;
-                    }
-                """)
-                reply_btn.clicked.connect(lambda checked, id=sugg['suggestion_id']: self.show_reply_dialog(id))
-                self.suggestion_table.setCellWidget(row, 6, reply_btn)
-
+                self._set_suggestion_row(row, sugg)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"加载意见数据失败: {str(e)}")
 
+    def _set_suggestion_row(self, row, sugg):
+        """填充意见表格的一行"""
+        self.suggestion_table.setItem(row, 0, QTableWidgetItem(str(sugg['suggestion_id'])))
+        self.suggestion_table.setItem(row, 1, QTableWidgetItem(sugg['employee']))
+        self.suggestion_table.setItem(row, 2, QTableWidgetItem(sugg['suggestion_type']))
+        self.suggestion_table.setItem(row, 3, QTableWidgetItem(sugg['suggestion_content']))
+        self.suggestion_table.setItem(row, 4, QTableWidgetItem(str(sugg['submit_time'])))
+
+        # 状态显示
+        status_text = "未处理" if sugg['status'] == 0 else "已处理"
+        status_item = QTableWidgetItem(status_text)
+        status_item.setForeground(QColor("red" if sugg['status'] == 0 else "green"))
+        self.suggestion_table.setItem(row, 5, status_item)
+
+        # 操作按钮
+        reply_btn = QPushButton("回复")
+        reply_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #165DFF;
+                color: white;
+                border-radius: 4px;
+                padding: 4px 8px;
+                font-size: 12px;
+            }
+            QPushButton:hover {
+                background-color: #0D47A1;
+            }
+        """)
+        reply_btn.clicked.connect(lambda checked, id=sugg['suggestion_id']: self.show_reply_dialog(id))
+        self.suggestion_table.setCellWidget(row, 6, reply_btn)
+
+    def _suggestion_row_of(self, suggestion_id):
+        """意见ID所在的表格行号，不在表格中时返回None"""
+        for row in range(self.suggestion_table.rowCount()):
+            item = self.suggestion_table.item(row, 0)
+            if item is not None and item.text() == str(suggestion_id):
+                return row
+        return None
+
+    def refresh_suggestion_rows(self, action, suggestion_ids):
+        """只刷新变更涉及的意见行（意见管理页未打开时忽略）"""
+        table = getattr(self, 'suggestion_table', None)
+        if table is None or sip.isdeleted(table) or not suggestion_ids:
+            return
+        if action == "delete":
+            for suggestion_id in suggestion_ids:
+                row = self._suggestion_row_of(suggestion_id)
+                if row is not None:
+                    self.suggestion_table.removeRow(row)
+            return
+        # 按员工或“已处理”筛选时，新提交的意见可能不符合条件，不插入
+        insert = (action == "insert" and not self.suggest_emp_id.text().strip()
+                  and self.status_combo.currentIndex() != 2)
+        placeholders = ", ".join(["%s"] * len(suggestion_ids))
+        query = self.SUGGESTION_QUERY + f" WHERE s.suggestion_id IN ({placeholders}) ORDER BY s.submit_time"
+        self.query_executor.submit(
+            f"suggestion_rows:{','.join(map(str, suggestion_ids))}",
+            lambda db: db.fetch_all(query, tuple(suggestion_ids)),
+            on_success=lambda rows: self._on_suggestion_rows_loaded(rows, insert),
+            on_error=lambda msg: self.statusBar().showMessage(f"刷新意见数据失败: {msg}", 3000)
+        )
+
+    def _on_suggestion_rows_loaded(self, suggestions, insert):
+        if sip.isdeleted(self.suggestion_table):
+            return
+        for sugg in suggestions:
+            row = self._suggestion_row_of(sugg['suggestion_id'])
+            if row is None:
+                if not insert:
+                    continue
+                row = 0  # 列表按提交时间倒序，新意见排在最前
+                self.suggestion_table.insertRow(row)
+            self._set_suggestion_row(row, sugg)
+
     def search_suggestions(self):
         """搜索意见"""
         emp_key = self.suggest_emp_id.text().strip()
@@ -2569,14 +2762,7 @@ class MainWindow(QMainWindow):
         start_date = self.suggest_start_date.date().toString("yyyy-MM-dd")
         end_date = self.suggest_end_date.date().toString("yyyy-MM-dd")
 
-        query = """
-            SELECT s.suggestion_id, 
-                   CONCAT(a.employee_id, ' - ', a.employee_name) AS employee,
-                   s.suggestion_type, s.suggestion_content,
-                   s.submit_time, s.status, s.employee_id
-            FROM suggestion_box s
-            LEFT JOIN employee_accounts a ON s.employee_id = a.employee_id
-        """
+        query = self.SUGGESTION_QUERY
         where_clause = " WHERE 1=1 "
         params = []
 
@@ -2594,39 +2780,11 @@ class MainWindow(QMainWindow):
 
         query += where_clause + " ORDER BY s.submit_time DESC"
 
-        try:
-            suggestions = self.db.fetch_all(query, params)
-            self.suggestion_table.setRowCount(len(suggestions))
-            for row, sugg in enumerate(suggestions):
-                self.suggestion_table.setItem(row, 0, QTableWidgetItem(str(sugg['suggestion_id'])))
-                self.suggestion_table.setItem(row, 1, QTableWidgetItem(sugg['employee']))
-                self.suggestion_table.setItem(row, 2, QTableWidgetItem(sugg['suggestion_type']))
-                self.suggestion_table.setItem(row, 3, QTableWidgetItem(sugg['suggestion_content']))
-                self.suggestion_table.setItem(row, 4, QTableWidgetItem(str(sugg['submit_time'])))
-
-                status_text = "未处理" if sugg['status'] == 0 else "已处理"
-                status_item = QTableWidgetItem(status_text)
-                status_item.setForeground(QColor("red" if sugg['status'] == 0 else "green"))
-                self.suggestion_table.setItem(row, 5, status_item)
-
-                reply_btn = QPushButton("回复")
-                reply_btn.setStyleSheet("""
-                    QPushButton {
-                        background-color: #165DFF;
-                        color: white;
-                        border-radius: 4px;
-                        padding: 4px 8px;
-                        font-size: 12px;
-                    }
-                    QPushButton:hover {
-                        background-color: #0D47A1;
-                    }
-                """)
-                reply_btn.clicked.connect(lambda checked, id=sugg['suggestion_id']: self.show_reply_dialog(id))
-                self.suggestion_table.setCellWidget(row, 6, reply_btn)
-
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"搜索意见失败: {str(e)}")
+        self.query_executor.submit(
+            "suggestion", lambda db: db.fetch_all(query, params),
+            on_success=self._populate_suggestion_table,
+            on_error=lambda msg: QMessageBox.critical(self, "错误", f"搜索意见失败: {msg}")
+        )
 
     def show_reply_dialog(self, suggestion_id=None):
         """显示回复对话框"""
@@ -2740,7 +2898,9 @@ class MainWindow(QMainWindow):
                 self.db.execute("UPDATE suggestion_box SET status = 1 WHERE suggestion_id = %s", (suggestion_id,))
                 QMessageBox.information(dialog, "成功", "回复保存成功")
                 dialog.accept()
-                self.load_suggestion_data()  # 刷新数据
+                self.refresh_suggestion_rows("update", [int(suggestion_id)])  # 只刷新这一条意见
+                self.publish_change("suggestion", "update", [int(suggestion_id)],
+                                    employee_id=suggestion['employee_id'])
             except Exception as e:
                 QMessageBox.critical(dialog, "错误", f"保存回复失败: {str(e)}")
 
@@ -2767,6 +2927,9 @@ class MainWindow(QMainWindow):
                 self.refresh_current_tab()
                 return
 
+            # 旧标签页的后台查询结果已无处显示，直接撤销
+            self.query_executor.cancel_all()
+
             # 安全移除旧部件
             while main_layout.count() > 1:
                 item = main_layout.takeAt(1)
@@ -2865,20 +3028,14 @@ class MainWindow(QMainWindow):
                 except RuntimeError:
                     pass
 
-                    # 新建表格
-            self.employee_table = QTableWidget()
+            # 新建表格
+            self.employee_table = QTableView()
             self.employee_table.setObjectName(f"employeeTable_{int(time.time())}")
 
-            # 重新初始化
-            self.employee_table.setColumnCount(8)
-            self.employee_table.setHorizontalHeaderLabels([
-                "员工ID", "姓名", "电话", "入职日期",
-                "婚姻状况", "学历", "性别", "职位"
-            ])
-            # 其他初始化配置...
-
-            # 弱引用信号连接
-            weakref.WeakMethod(self.edit_employee)  # 示例连接
+            # 重新初始化（新视图配新模型）
+            self.employee_model = EmployeeTableModel(self.employee_table)
+            self.employee_table.setModel(self.employee_model)
+            self._setup_employee_table()
             return True
 
         except Exception as e:
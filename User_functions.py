@@ -1,21 +1,49 @@
 import json
 import sys
 
+import sip
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
                              QPushButton, QLabel, QLineEdit, QMessageBox, QTextEdit, QFormLayout,
                              QComboBox, QTabWidget, QHeaderView)
 
 from db_connect import Database
+from dict_cache import change_type_cache
+from tcp_client import TcpSocketClient
 
 
 class UserMainWindow(QMainWindow):
+    SERVER_HOST = "127.0.0.1"  # 数据变更推送服务器（连不上时不影响使用，只是不自动刷新）
+    SERVER_PORT = 5555
+    SUBSCRIBED_TOPICS = ["suggestion", "notification"]
+    SUGGESTION_HISTORY_QUERY = """
+        SELECT 
+            s.suggestion_id,
+            s.suggestion_type,
+            s.suggestion_content,
+            s.submit_time,
+            s.status,
+            r.reply_content,
+            r.reply_time,
+            a.admin_account AS reply_by
+        FROM suggestion_box s
+        LEFT JOIN suggestion_replies r ON s.suggestion_id = r.suggestion_id
+        LEFT JOIN admin_accounts a ON r.reply_admin_id = a.admin_account_id
+        WHERE s.employee_id = %s
+    """  # 本人意见历史查询（ORDER BY/追加条件由调用方拼接）
+
     def __init__(self, user_id=1):
         super().__init__()
+        self.push_client = None
+        self.db = None
+        self.suggestion_table = None  # 当前显示的意见历史表格
+        self.notice_table = None  # 当前显示的系统通知表格
         try:
             self.user_id = user_id
             self.db = Database()
             self.init_ui()
+            self.connect_push_channel()
 
             # 先显示窗口，再处理可能耗时的操作
             self.show()
@@ -68,6 +96,52 @@ class UserMainWindow(QMainWindow):
         # 状态栏
         self.statusBar().showMessage("用户登录 | 就绪", 3000)
 
+    def connect_push_channel(self):
+        """连接服务器并订阅意见回复和通知的变更推送"""
+        self.push_client = TcpSocketClient(parent=self)
+        self.push_client.set_server(self.SERVER_HOST, self.SERVER_PORT)
+        self.push_client.message_received.connect(self.on_push_message)
+        self.push_client.subscribe(self.SUBSCRIBED_TOPICS)
+        self.push_client.start()
+
+    def publish_change(self, topic, action, ids, **fields):
+        """广播本人的数据变更（管理员界面据此只刷新对应的行），未连接服务器时忽略"""
+        if self.push_client is not None and self.push_client.connected:
+            self.push_client.publish(topic, action, ids, **fields)
+
+    def on_push_message(self, message):
+        """处理服务器推送的数据变更，只刷新当前界面中受影响的行"""
+        if message.get("type") != "event":
+            return
+        event = message.get("event") or {}
+        ids = event.get("ids") or []
+        if message.get("topic") == "suggestion" and str(event.get("employee_id")) == str(self.user_id):
+            self.refresh_suggestion_rows(ids)
+            self.statusBar().showMessage("您提交的意见有新的处理结果", 5000)
+        elif message.get("topic") == "notification" and (
+                event.get("target_type", "all") == "all" or str(event.get("target_employee_id")) == str(self.user_id)):
+            self.refresh_notice_rows(event.get("action"), ids)
+            self.statusBar().showMessage("收到新的通知", 5000)
+
+    def _table_visible(self, table):
+        return table is not None and not sip.isdeleted(table) and table.window() is self
+
+    def _find_row(self, table, item_id):
+        """按第0列保存的ID查找行号"""
+        for row in range(table.rowCount()):
+            item = table.item(row, 0)
+            if item is not None and item.data(Qt.UserRole) == item_id:
+                return row
+        return None
+
+    def closeEvent(self, event):
+        """窗口关闭时停止推送连接并归还数据库连接"""
+        if self.push_client is not None:
+            self.push_client.stop()
+        if self.db is not None:
+            self.db.close()
+        super().closeEvent(event)
+
 
     def load_user_info(self):
         """加载用户完整信息（关联账户表和基本信息表）"""
@@ -173,6 +247,7 @@ class UserMainWindow(QMainWindow):
                 })
 
                 self.db.commit()
+                self.publish_change("employee", "update", [self.user_id])
                 QMessageBox.information(self, "成功", "个人信息修改成功！")
                 self.show_user_info()
             else:
@@ -184,9 +259,8 @@ class UserMainWindow(QMainWindow):
 
     def record_modification_history(self, change_type, data):
         """记录修改历史到history_info表（修正JSON格式）"""
-        # 校验type_name是否存在
-        check_query = "SELECT type_id FROM change_type_dict WHERE type_name = %s"
-        type_id = self.db.fetch_one(check_query, (change_type,))
+        # 校验type_name是否存在（读字典缓存，不再每次查库）
+        type_id = change_type_cache.get_type_id(self.db, change_type)
 
         if not type_id:
             QMessageBox.critical(self, "错误", f"变更类型 '{change_type}' 不存在，请联系管理员！")
@@ -204,7 +278,7 @@ class UserMainWindow(QMainWindow):
             """
             return self.db.execute(query, (
                 self.user_id,
-                type_id['type_id'],
+                type_id,
                 old_json,
                 new_json
             ))
@@ -244,23 +318,9 @@ class UserMainWindow(QMainWindow):
         history_layout = QVBoxLayout(history_widget)
 
         # 查询意见历史
-        query = """
-            SELECT 
-                s.suggestion_id,
-                s.suggestion_type,
-                s.suggestion_content,
-                s.submit_time,
-                s.status,
-                r.reply_content,
-                r.reply_time,
-                a.admin_account AS reply_by
-            FROM suggestion_box s
-            LEFT JOIN suggestion_replies r ON s.suggestion_id = r.suggestion_id
-            LEFT JOIN admin_accounts a ON r.reply_admin_id = a.admin_account_id
-            WHERE s.employee_id = %s
-            ORDER BY s.submit_time DESC
-        """
+        query = self.SUGGESTION_HISTORY_QUERY + " ORDER BY s.submit_time DESC"
         suggestions = self.db.fetch_all(query, (self.user_id,))
+        self.suggestion_table = None
 
         if suggestions:
             table = QTableWidget()
@@ -271,22 +331,10 @@ class UserMainWindow(QMainWindow):
             table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)  # 内容列自适应
 
             for row, suggestion in enumerate(suggestions):
-                table.setItem(row, 0, QTableWidgetItem(str(suggestion['suggestion_id'])))
-                table.setItem(row, 1, QTableWidgetItem(suggestion['suggestion_type']))
-                table.setItem(row, 2, QTableWidgetItem(suggestion['suggestion_content']))
-                table.setItem(row, 3, QTableWidgetItem(str(suggestion['submit_time'])))
-
-                # 状态显示
-                status = "已提交"
-                if suggestion['status'] == 1:
-                    status = "已处理"
-                table.setItem(row, 4, QTableWidgetItem(status))
-
-                # 回复内容
-                table.setItem(row, 5, QTableWidgetItem(suggestion['reply_content'] or "等待回复"))
-                table.setItem(row, 6, QTableWidgetItem(str(suggestion['reply_time'] or "")))
+                self._set_suggestion_row(table, row, suggestion)
 
             history_layout.addWidget(table)
+            self.suggestion_table = table
         else:
             history_layout.addWidget(QLabel("暂无提交记录"))
 
@@ -296,6 +344,36 @@ class UserMainWindow(QMainWindow):
 
         self.content_layout.addWidget(tab_widget)
 
+    def _set_suggestion_row(self, table, row, suggestion):
+        """填充意见历史表格的一行"""
+        id_item = QTableWidgetItem(str(suggestion['suggestion_id']))
+        id_item.setData(Qt.UserRole, suggestion['suggestion_id'])
+        table.setItem(row, 0, id_item)
+        table.setItem(row, 1, QTableWidgetItem(suggestion['suggestion_type']))
+        table.setItem(row, 2, QTableWidgetItem(suggestion['suggestion_content']))
+        table.setItem(row, 3, QTableWidgetItem(str(suggestion['submit_time'])))
+
+        # 状态显示
+        status = "已提交"
+        if suggestion['status'] == 1:
+            status = "已处理"
+        table.setItem(row, 4, QTableWidgetItem(status))
+
+        # 回复内容
+        table.setItem(row, 5, QTableWidgetItem(suggestion['reply_content'] or "等待回复"))
+        table.setItem(row, 6, QTableWidgetItem(str(suggestion['reply_time'] or "")))
+
+    def refresh_suggestion_rows(self, suggestion_ids):
+        """管理员处理了本人的意见：只重新查询并更新这几行（意见历史未打开时忽略）"""
+        if not suggestion_ids or not self._table_visible(self.suggestion_table):
+            return
+        placeholders = ", ".join(["%s"] * len(suggestion_ids))
+        query = self.SUGGESTION_HISTORY_QUERY + f" AND s.suggestion_id IN ({placeholders})"
+        for suggestion in self.db.fetch_all(query, (self.user_id, *suggestion_ids)) or []:
+            row = self._find_row(self.suggestion_table, suggestion['suggestion_id'])
+            if row is not None:
+                self._set_suggestion_row(self.suggestion_table, row, suggestion)
+
     def submit_suggestion(self, suggestion_type, content):
         """提交意见"""
         if not content:
@@ -309,6 +387,9 @@ class UserMainWindow(QMainWindow):
         """
         result = self.db.execute(query, (self.user_id, suggestion_type, content))
         if result:
+            last = self.db.fetch_one("SELECT LAST_INSERT_ID() AS last_id")
+            if last:
+                self.publish_change("suggestion", "insert", [last['last_id']], employee_id=self.user_id)
             QMessageBox.information(self, "成功", "意见提交成功！")
             self.show_suggestion_box()  # 刷新页面
         else:
@@ -332,6 +413,7 @@ class UserMainWindow(QMainWindow):
             ORDER BY publish_time DESC
         """
         system_notices = self.db.fetch_all(query, (self.user_id,))
+        self.notice_table = None
 
         if system_notices:
             table = QTableWidget()
@@ -341,20 +423,10 @@ class UserMainWindow(QMainWindow):
             table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
             for row, notice in enumerate(system_notices):
-                table.setItem(row, 0, QTableWidgetItem(notice['title']))
-                table.setItem(row, 1, QTableWidgetItem(notice['content']))
-                table.setItem(row, 2, QTableWidgetItem(str(notice['publish_time'])))
-                table.setItem(row, 3, QTableWidgetItem(notice['publisher']))
-
-                # 类型显示
-                target_type = "个人通知"
-                if notice['target_type'] == 'all':
-                    target_type = "全体通知"
-                elif notice['target_type'] == 'department':
-                    target_type = "部门通知"
-                table.setItem(row, 4, QTableWidgetItem(target_type))
+                self._set_notice_row(table, row, notice)
 
             system_notice_layout.addWidget(table)
+            self.notice_table = table
         else:
             system_notice_layout.addWidget(QLabel("暂无系统通知"))
 
@@ -410,6 +482,48 @@ class UserMainWindow(QMainWindow):
 
         self.content_layout.addWidget(tab_widget)
 
+    def _set_notice_row(self, table, row, notice):
+        """填充系统通知表格的一行"""
+        title_item = QTableWidgetItem(notice['title'])
+        title_item.setData(Qt.UserRole, notice['notification_id'])
+        table.setItem(row, 0, title_item)
+        table.setItem(row, 1, QTableWidgetItem(notice['content']))
+        table.setItem(row, 2, QTableWidgetItem(str(notice['publish_time'])))
+        table.setItem(row, 3, QTableWidgetItem(notice['publisher']))
+
+        # 类型显示
+        target_type = "个人通知"
+        if notice['target_type'] == 'all':
+            target_type = "全体通知"
+        elif notice['target_type'] == 'department':
+            target_type = "部门通知"
+        table.setItem(row, 4, QTableWidgetItem(target_type))
+
+    def refresh_notice_rows(self, action, notification_ids):
+        """通知有变更：删除直接移除，新增的插到最前，修改的原位更新（系统通知未打开时忽略）"""
+        table = self.notice_table
+        if not notification_ids or not self._table_visible(table):
+            return
+        if action == "delete":
+            for notification_id in notification_ids:
+                row = self._find_row(table, notification_id)
+                if row is not None:
+                    table.removeRow(row)
+            return
+        placeholders = ", ".join(["%s"] * len(notification_ids))
+        query = f"""
+            SELECT * FROM system_notifications 
+            WHERE notification_id IN ({placeholders})
+            AND (target_employee_id = %s OR target_type = 'all')
+            ORDER BY publish_time
+        """
+        for notice in self.db.fetch_all(query, (*notification_ids, self.user_id)) or []:
+            row = self._find_row(table, notice['notification_id'])
+            if row is None:
+                row = 0  # 通知按发布时间倒序，新通知排在最前
+                table.insertRow(row)
+            self._set_notice_row(table, row, notice)
+
     def clear_content_layout(self):
         """递归清空布局（支持嵌套布局）"""
         for i in reversed(range(self.content_layout.count())):
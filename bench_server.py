@@ -0,0 +1,391 @@
+"""命令服务器压力测试工具
+
+模拟N个管理端客户端，按network.py的协议（长度前缀帧、hello编码协商、HMAC签名+nonce）
+连接服务器，以设定的速率发送心跳和命令（如echo/date的混合），结束后统计吞吐量、
+p50/p95/p99延迟和各类错误。可用--spawn-server在本机拉起一个server.py进程再测试：
+
+    python bench_server.py --spawn-server thread --clients 50 --duration 30
+    python bench_server.py --port 5555 --clients 20 --command-rate 5 --mix "echo bench:3,date:1"
+"""
+import argparse
+import itertools
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from codec import JSON_CODEC, DecodeError, available_encodings, decode_frame, negotiate
+from framing import COMPRESSION_METHODS, FrameCompressor, FrameDecodeError, FrameReader, FrameTooLargeError, encode_frame
+from signing import SigningContext, signing_timestamp
+
+
+def percentile(sorted_values, q):
+    """最近秩法求分位数，sorted_values须已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(spec):
+    """解析命令混合比例，如 "echo bench:3,date:1"，返回 [(命令, 权重)]"""
+    mix = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        command, sep, weight = item.rpartition(":")
+        if not sep or not weight.isdigit():
+            command, weight = item, "1"
+        mix.append((command.strip(), int(weight)))
+    if not mix:
+        raise ValueError("命令混合比例为空")
+    return mix
+
+
+class BenchStats:
+    """所有模拟客户端共享的统计（线程安全），按请求类别（command/heartbeat）分别记录"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = Counter()
+        self.ok = Counter()
+        self.latencies = {}  # 类别 -> [秒]
+        self.errors = Counter()  # (类别, 原因) -> 次数
+        self.connected = 0
+        self.connect_failures = Counter()
+
+    def record_sent(self, kind):
+        with self._lock:
+            self.sent[kind] += 1
+
+    def record_reply(self, kind, latency, error=None):
+        with self._lock:
+            if error:
+                self.errors[(kind, error)] += 1
+            else:
+                self.ok[kind] += 1
+                self.latencies.setdefault(kind, []).append(latency)
+
+    def record_error(self, kind, reason, count=1):
+        with self._lock:
+            self.errors[(kind, reason)] += count
+
+    def record_connect(self, error=None):
+        with self._lock:
+            if error:
+                self.connect_failures[error] += 1
+            else:
+                self.connected += 1
+
+    def report(self, elapsed):
+        lines = [f"测试时长 {elapsed:.1f} 秒，连接成功 {self.connected}，连接失败 {sum(self.connect_failures.values())}"]
+        for reason, count in self.connect_failures.items():
+            lines.append(f"  连接失败({reason}): {count}")
+        with self._lock:
+            kinds = sorted(set(self.sent) | set(self.ok))
+            for kind in kinds:
+                values = sorted(self.latencies.get(kind, []))
+                failed = sum(count for (k, _), count in self.errors.items() if k == kind)
+                sent = self.sent[kind]
+                lines.append(
+                    f"{kind}: 发送 {sent}，成功 {self.ok[kind]}，失败 {failed}"
+                    f"（错误率 {failed / sent * 100 if sent else 0:.2f}%），吞吐 {self.ok[kind] / elapsed:.1f}/秒")
+                lines.append(
+                    f"  延迟(ms) p50 {percentile(values, 0.5) * 1000:.2f}  p95 {percentile(values, 0.95) * 1000:.2f}  "
+                    f"p99 {percentile(values, 0.99) * 1000:.2f}  max {(values[-1] if values else 0) * 1000:.2f}")
+                for (k, reason), count in sorted(self.errors.items()):
+                    if k == kind:
+                        lines.append(f"  错误({reason}): {count}")
+        return "\n".join(lines)
+
+
+class BenchClient(threading.Thread):
+    """一个模拟客户端：发送线程按速率发请求，接收线程按request_id匹配响应计算延迟"""
+
+    def __init__(self, index, options, stats, stop_event):
+        super().__init__(name=f"BenchClient-{index}", daemon=True)
+        self.index = index
+        self.options = options
+        self.stats = stats
+        self.stop_event = stop_event
+        self.signer = SigningContext(options.secret_key)
+        self.commands, weights = zip(*parse_mix(options.mix))
+        self.weights = list(weights)
+        self.random = random.Random(options.seed + index if options.seed is not None else None)
+        self._counter = itertools.count(1)
+        self._pending = {}  # request_id -> (类别, 发送时间)
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self.sock = None
+        self.codec = None
+        self.compressor = None
+
+    def next_request_id(self):
+        return f"bench{self.index}-{next(self._counter)}"
+
+    def _send_frame(self, data):
+        frame = encode_frame(self.codec.encode(data), self.compressor)
+        with self._send_lock:
+            self.sock.sendall(frame)
+
+    def _send(self, kind, data):
+        request_id = data["request_id"]
+        with self._pending_lock:
+            self._pending[request_id] = (kind, time.perf_counter())
+        self.stats.record_sent(kind)
+        try:
+            self._send_frame(data)
+        except OSError as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            self.stats.record_error(kind, f"发送失败: {e.__class__.__name__}")
+            return False
+        return True
+
+    def connect(self):
+        """建立连接并完成hello握手"""
+        options = self.options
+        self.sock = socket.create_connection((options.host, options.port), timeout=options.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.codec = JSON_CODEC  # 握手完成前使用JSON
+        self.compressor = None
+        reader = FrameReader(self.sock)
+        self._send_frame({"type": "hello", "encodings": options.encodings,
+                          "compression": COMPRESSION_METHODS if options.compress else [],
+                          "request_id": self.next_request_id()})
+        reply = decode_frame(reader.read_frame())
+        if reply.get("type") != "hello_ack":
+            raise ConnectionError(f"握手失败: {reply.get('message', reply.get('type'))}")
+        self.codec = negotiate([reply.get("encoding")])
+        if reply.get("compression"):
+            self.compressor = FrameCompressor()
+        return reader
+
+    def command_message(self):
+        command = self.random.choices(self.commands, self.weights)[0]
+        timestamp = signing_timestamp()
+        nonce = uuid.uuid4().hex
+        return {
+            "type": "command",
+            "command": command,
+            "timestamp": timestamp,
+            "nonce": nonce,
+            "signature": self.signer.sign(command, timestamp, nonce),
+            "sign_type": "hmac-sha256",
+            "request_id": self.next_request_id(),
+            "client_id": f"bench-{self.index}"
+        }
+
+    def _interval(self, rate):
+        """两次请求的间隔：--poisson时按指数分布，否则固定为1/rate"""
+        if self.options.poisson:
+            return self.random.expovariate(rate)
+        return 1.0 / rate
+
+    def run(self):
+        try:
+            reader = self.connect()
+        except Exception as e:
+            self.stats.record_connect(e.__class__.__name__)
+            return
+        self.stats.record_connect()
+        receiver = threading.Thread(target=self._receive_loop, args=(reader,), daemon=True)
+        receiver.start()
+
+        options = self.options
+        now = time.monotonic()
+        # 各客户端错开起步，避免所有请求同一时刻发出
+        next_command = now + self.random.uniform(0, 1.0 / options.command_rate) if options.command_rate > 0 else None
+        next_heartbeat = now + self.random.uniform(0, options.heartbeat_interval) \
+            if options.heartbeat_interval > 0 else None
+        while not self.stop_event.is_set():
+            due = min(t for t in (next_command, next_heartbeat, now + 0.5) if t is not None)
+            if self.stop_event.wait(max(0.0, due - time.monotonic())):
+                break
+            now = time.monotonic()
+            if next_command is not None and now >= next_command:
+                if not self._send("command", self.command_message()):
+                    break
+                next_command += self._interval(options.command_rate)
+            if next_heartbeat is not None and now >= next_heartbeat:
+                if not self._send("heartbeat", {"type": "heartbeat", "request_id": self.next_request_id(),
+                                                "timestamp": time.time()}):
+                    break
+                next_heartbeat += options.heartbeat_interval
+
+        # 等待在途请求的响应，超过drain时间仍未返回的记为超时
+        deadline = time.monotonic() + options.drain
+        while time.monotonic() < deadline:
+            with self._pending_lock:
+                if not self._pending:
+                    break
+            time.sleep(0.05)
+        with self._pending_lock:
+            leftover = Counter(kind for kind, _ in self._pending.values())
+            self._pending.clear()
+        for kind, count in leftover.items():
+            self.stats.record_error(kind, "超时", count)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        receiver.join(1)
+
+    def _receive_loop(self, reader):
+        self.sock.settimeout(None)
+        while True:
+            try:
+                data = reader.read_frame()
+                if data is None:
+                    break
+                message = decode_frame(data)
+            except (OSError, FrameTooLargeError, FrameDecodeError, DecodeError):
+                break
+            if message.get("type") == "command_chunk":
+                continue
+            with self._pending_lock:
+                entry = self._pending.pop(message.get("request_id"), None)
+            if entry is None:
+                continue
+            kind, sent_at = entry
+            latency = time.perf_counter() - sent_at
+            self.stats.record_reply(kind, latency, self.classify(message))
+
+        # 连接断开：剩余请求记为连接断开
+        with self._pending_lock:
+            leftover = Counter(kind for kind, _ in self._pending.values())
+            self._pending.clear()
+        for kind, count in leftover.items():
+            self.stats.record_error(kind, "连接断开", count)
+
+    @staticmethod
+    def classify(message):
+        """把响应归类为成功(None)或错误原因"""
+        message_type = message.get("type")
+        if message_type == "error":
+            return f"错误 {message.get('code', '')} {message.get('message', '')}".strip()
+        if message_type in ("command_response", "command_done"):
+            status = message.get("status")
+            if status == "success":
+                return None
+            return f"{status} {message.get('code', '')}".strip()
+        return None
+
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def spawn_server(options):
+    """在本机启动一个server.py子进程用于测试"""
+    command = [sys.executable, "server.py", "--mode", options.spawn_server, "--host", options.host,
+               "--port", str(options.port), "--secret-key", options.secret_key]
+    # 压测时默认关闭客户端/主机限速，否则测到的是限速而不是服务器本身；放在前面，--server-args中可再覆盖
+    command += ["--client-rate", "0", "--host-rate", "0"]
+    command += options.server_args
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not wait_for_port(options.host, options.port, 10):
+        process.kill()
+        raise RuntimeError("测试服务器未能在10秒内启动")
+    return process
+
+
+def fetch_server_stats(options):
+    """测试结束后用签名的stats请求取服务器端统计，失败时返回None"""
+    client = BenchClient(-1, options, BenchStats(), threading.Event())
+    try:
+        reader = client.connect()
+        timestamp = signing_timestamp()
+        nonce = uuid.uuid4().hex
+        client._send_frame({"type": "stats", "command": "stats", "timestamp": timestamp, "nonce": nonce,
+                            "signature": client.signer.sign("stats", timestamp, nonce),
+                            "sign_type": "hmac-sha256", "request_id": client.next_request_id()})
+        reply = decode_frame(reader.read_frame())
+        return reply.get("stats")
+    except Exception:
+        return None
+    finally:
+        if client.sock is not None:
+            client.sock.close()
+
+
+def run_benchmark(options):
+    stats = BenchStats()
+    stop_event = threading.Event()
+    clients = [BenchClient(i, options, stats, stop_event) for i in range(options.clients)]
+    ramp_step = options.ramp_up / options.clients if options.clients else 0
+    started_at = time.monotonic()
+    for client in clients:
+        client.start()
+        if ramp_step:
+            time.sleep(ramp_step)
+    try:
+        stop_event.wait(max(0.0, options.duration - (time.monotonic() - started_at)))
+    except KeyboardInterrupt:
+        print("提前结束测试")
+    stop_event.set()
+    elapsed = time.monotonic() - started_at
+    for client in clients:
+        client.join(options.drain + 2)
+    return stats, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令服务器压力测试")
+    parser.add_argument("--host", default="127.0.0.1", help="服务器地址")
+    parser.add_argument("--port", type=int, default=5555, help="服务器端口")
+    parser.add_argument("--secret-key", default="personnel_management_system_key", help="HMAC签名密钥")
+    parser.add_argument("--clients", type=int, default=10, help="模拟客户端数量")
+    parser.add_argument("--duration", type=float, default=10, help="测试时长(秒)")
+    parser.add_argument("--ramp-up", type=float, default=0, help="在这段时间(秒)内逐个启动客户端")
+    parser.add_argument("--command-rate", type=float, default=1, help="每个客户端每秒发送的命令数（0表示不发命令）")
+    parser.add_argument("--heartbeat-interval", type=float, default=5, help="心跳间隔(秒)（0表示不发心跳）")
+    parser.add_argument("--mix", default="echo bench:1,date:1", help="命令及权重，如 \"echo bench:3,date:1\"")
+    parser.add_argument("--poisson", action="store_true", help="请求间隔按指数分布（默认固定间隔）")
+    parser.add_argument("--encoding", choices=available_encodings(), help="指定编码（默认按优先级协商）")
+    parser.add_argument("--compress", action="store_true", help="协商zlib压缩")
+    parser.add_argument("--timeout", type=float, default=10, help="连接超时(秒)")
+    parser.add_argument("--drain", type=float, default=10, help="结束后等待在途响应的时间(秒)")
+    parser.add_argument("--seed", type=int, help="随机种子（便于复现命令序列）")
+    parser.add_argument("--spawn-server", choices=["thread", "asyncio"], help="先在本机启动server.py再测试")
+    parser.add_argument("--server-args", nargs=argparse.REMAINDER, default=[],
+                        help="传给server.py的其他参数（须放在最后）")
+    options = parser.parse_args()
+    options.encodings = [options.encoding] if options.encoding else available_encodings()
+
+    server_process = spawn_server(options) if options.spawn_server else None
+    try:
+        print(f"开始测试 {options.host}:{options.port}：{options.clients} 个客户端，{options.duration} 秒，"
+              f"每客户端 {options.command_rate} 命令/秒，心跳间隔 {options.heartbeat_interval} 秒")
+        stats, elapsed = run_benchmark(options)
+        print(stats.report(elapsed))
+
+        server_stats = fetch_server_stats(options)
+        if server_stats:
+            wait = server_stats.get("command_wait", {})
+            run = server_stats.get("command_run", {})
+            print(f"服务器端: 排队耗时(ms) p50 {wait.get('p50', 0) * 1000:.1f} p95 {wait.get('p95', 0) * 1000:.1f} "
+                  f"p99 {wait.get('p99', 0) * 1000:.1f}；执行耗时(ms) p50 {run.get('p50', 0) * 1000:.1f} "
+                  f"p95 {run.get('p95', 0) * 1000:.1f} p99 {run.get('p99', 0) * 1000:.1f}；"
+                  f"状态 {server_stats.get('command_status', {})}")
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait(5)
+
+
+if __name__ == "__main__":
+    main()
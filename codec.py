@@ -0,0 +1,71 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # 未安装msgpack时只能使用JSON
+    msgpack = None
+
+
+class DecodeError(ValueError):
+    """帧内容无法按任何已知编码解析"""
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, data):
+        try:
+            return json.loads(str(data, 'utf-8'))
+        except ValueError as e:
+            raise DecodeError(str(e))
+
+
+class MsgpackCodec:
+    """MessagePack二进制编码，比JSON更紧凑、编解码更快（需安装msgpack）"""
+    name = "msgpack"
+
+    def encode(self, obj):
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data):
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise DecodeError(str(e))
+
+
+JSON_CODEC = JsonCodec()
+MSGPACK_CODEC = MsgpackCodec() if msgpack is not None else None
+
+# 按优先级排列的可用编码
+CODECS = {codec.name: codec for codec in (MSGPACK_CODEC, JSON_CODEC) if codec is not None}
+
+
+def available_encodings():
+    """本端支持的编码名称（按优先级排列）"""
+    return list(CODECS)
+
+
+def get_codec(name):
+    return CODECS.get(name, JSON_CODEC)
+
+
+def negotiate(offered):
+    """按对端给出的优先级选择双方都支持的编码，没有交集时使用JSON"""
+    for name in offered or []:
+        if name in CODECS:
+            return CODECS[name]
+    return JSON_CODEC
+
+
+def decode_frame(data):
+    """解析一帧：JSON对象总以'{'开头，其余按MessagePack解析
+
+    按首字节识别编码，因此握手完成前后、两种编码的帧混在一起时都能正确解析。
+    """
+    if len(data) and data[0] != ord('{') and MSGPACK_CODEC is not None:
+        return MSGPACK_CODEC.decode(data)
+    return JSON_CODEC.decode(data)
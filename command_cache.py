@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from command_runner import CommandRejectedError, CommandRunner
+
+# 结果可短时复用的白名单命令及缓存秒数（按白名单命令名精确匹配）
+DEFAULT_CACHE_TTLS = {
+    "whoami": 60,
+    "date": 1,
+    "time": 1,
+    "df": 5,
+}
+
+
+def parse_ttl_options(values, base=None):
+    """解析形如 "df=10" 的缓存时间配置（0表示不缓存该命令），返回新的命令名->秒数字典"""
+    ttls = dict(DEFAULT_CACHE_TTLS if base is None else base)
+    for value in values or []:
+        name, sep, seconds = value.partition("=")
+        if not sep:
+            raise ValueError(f"缓存时间格式应为 命令=秒数: {value}")
+        ttls[name.strip().lower()] = float(seconds)
+    return {name: ttl for name, ttl in ttls.items() if ttl > 0}
+
+
+class CommandCache:
+    """幂等命令的结果缓存（线程安全）
+
+    - 以runner解析后的argv为键（引号内的空白、参数大小写都保留），按白名单命令名配置各自的缓存时间
+    - 只缓存执行成功的结果；过期或超过max_entries时淘汰
+    - 单飞：同一命令正在执行时，后到的相同请求等待这次执行的结果，而不是再起一个进程
+    """
+
+    def __init__(self, ttls=None, max_entries=256, runner=None):
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self.runner = runner or CommandRunner()
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 命令 -> (过期时间(monotonic), 结果)
+        self._inflight = {}  # 命令 -> 正在执行的Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def ttl_for(self, command):
+        """命令的缓存秒数，不可缓存（含不允许执行）时返回0"""
+        name = self.runner.name_of(command)
+        return self.ttls.get(name, 0) if name is not None else 0
+
+    def get_or_run(self, command, run):
+        """返回命令结果：缓存未过期时直接返回，否则调用run(command)执行（相同命令并发时只执行一次）"""
+        ttl = self.ttl_for(command)
+        if not ttl:
+            return run(command)
+
+        try:
+            key = self.runner.prepare(command)  # (argv元组, 是否走shell)，实际执行的就是它
+        except CommandRejectedError:
+            return run(command)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return dict(entry[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return dict(flight.result())
+
+        try:
+            result = run(command)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            if result.get("status") == "success":
+                self._store(key, time.monotonic() + ttl, result)
+        flight.set_result(result)
+        return dict(result)
+
+    def _store(self, key, expires_at, result):
+        """写入缓存并淘汰过期/最久未用的条目（调用方持有锁）"""
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        now = time.monotonic()
+        for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[stale]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
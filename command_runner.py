@@ -0,0 +1,92 @@
+import functools
+import os
+import shlex
+import shutil
+import subprocess
+
+# 命令白名单（仅允许执行安全命令）
+SAFE_COMMANDS = ["ls", "dir", "echo", "date", "time", "whoami", "ping", "ps", "top", "df"]
+
+IS_WINDOWS = os.name == "nt"
+WINDOWS_ALIASES = {"ls": "dir"}  # Windows中ls等价于dir
+# 回退为shell执行时，会把参数当作命令执行的shell关键字（如bash的time），只允许不带参数
+SHELL_ARGUMENT_RUNNERS = {"time"}
+# cmd.exe中即使出现在引号内也可能被解释的字符（list2cmdline不会转义），回退执行时参数中不允许出现
+CMD_METACHARACTERS = set('&|<>^%!"\r\n')
+
+
+class CommandRejectedError(ValueError):
+    """命令为空、不在白名单中或无法解析"""
+
+
+class CommandRunner:
+    """白名单命令执行器
+
+    - 创建时用shutil.which把白名单中的命令解析成绝对路径，之后直接按argv列表执行，
+      不再经过/bin/sh，省去一次shell的fork+exec，也不会解释; | &&等shell语法
+    - 白名单按解析后的第一个参数精确匹配（Windows不区分大小写）
+    - 解析好的argv模板按命令字符串缓存，相同命令不再重复拆分
+    - 找不到可执行文件的命令（如Windows的dir/echo、POSIX的time等shell内建命令）
+      回退为shell执行：POSIX下参数逐个转义，time这类会执行参数的关键字不允许带参数；
+      Windows下参数中不允许出现cmd.exe的元字符，保证参数不能再启动第二个命令
+    """
+
+    def __init__(self, allowed=SAFE_COMMANDS, template_cache_size=512):
+        self.allowed = list(allowed)
+        self.executables = {}  # 命令名 -> 绝对路径（找不到时为None，走shell）
+        for name in self.allowed:
+            target = WINDOWS_ALIASES.get(name, name) if IS_WINDOWS else name
+            self.executables[name] = shutil.which(target)
+        self.prepare = functools.lru_cache(maxsize=template_cache_size)(self._prepare)
+
+    def _prepare(self, command):
+        """把命令字符串解析为 (argv元组, 是否需要shell)，不允许执行时抛出CommandRejectedError"""
+        try:
+            argv = shlex.split(command, posix=not IS_WINDOWS)
+        except ValueError as e:
+            raise CommandRejectedError(f"命令解析失败: {e}")
+        if not argv:
+            raise CommandRejectedError("空命令")
+        name = argv[0].lower() if IS_WINDOWS else argv[0]
+        if name not in self.executables:
+            raise CommandRejectedError("禁止执行该命令")
+
+        executable = self.executables[name]
+        if executable is not None:
+            return (executable,) + tuple(argv[1:]), False
+        if IS_WINDOWS:
+            if any(CMD_METACHARACTERS.intersection(arg) for arg in argv[1:]):
+                raise CommandRejectedError("参数中包含不允许的字符")
+            name = WINDOWS_ALIASES.get(name, name)
+            return (subprocess.list2cmdline([name] + argv[1:]),), True
+        if name in SHELL_ARGUMENT_RUNNERS and len(argv) > 1:
+            raise CommandRejectedError(f"{name} 不允许带参数")
+        return (shlex.join([name] + argv[1:]),), True
+
+    def name_of(self, command):
+        """命令对应的白名单命令名（Windows下为小写），不允许执行时返回None"""
+        try:
+            self.prepare(command)
+        except CommandRejectedError:
+            return None
+        name = shlex.split(command, posix=not IS_WINDOWS)[0]
+        return name.lower() if IS_WINDOWS else name
+
+    def check(self, command):
+        """命令可以执行时返回None，否则返回错误结果"""
+        try:
+            self.prepare(command)
+        except CommandRejectedError as e:
+            return {"status": "error", "message": str(e)}
+        return None
+
+    def run(self, command, timeout):
+        """执行命令并收集全部输出，返回subprocess.CompletedProcess（超时抛出TimeoutExpired）"""
+        argv, use_shell = self.prepare(command)
+        return subprocess.run(argv[0] if use_shell else argv, shell=use_shell,
+                              capture_output=True, text=True, timeout=timeout)
+
+    def popen(self, command, **kwargs):
+        """启动命令并返回Popen对象（用于流式读取输出）"""
+        argv, use_shell = self.prepare(command)
+        return subprocess.Popen(argv[0] if use_shell else argv, shell=use_shell, **kwargs)
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+
+class SchedulerBusyError(Exception):
+    """排队任务数超过上限，命令被拒绝"""
+
+
+class CommandScheduler:
+    """命令执行调度器（线程安全）
+
+    - 最多max_workers个命令同时执行，其余排队
+    - 每个客户端一个队列，工作线程在各客户端之间轮转取任务，
+      一个客户端连发大量慢命令不会饿死其他客户端
+    - 单个客户端排队数超过max_queue_per_client、或全局排队数超过max_queue_total时，
+      submit直接抛出SchedulerBusyError，由调用方回复繁忙
+    - 分别统计排队等待时间与实际执行时间
+    """
+
+    def __init__(self, max_workers=4, max_queue_per_client=8, max_queue_total=64):
+        self.max_workers = max_workers
+        self.max_queue_per_client = max_queue_per_client
+        self.max_queue_total = max_queue_total
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # client_key -> deque[(future, fn, args, 入队时间)]
+        self._queued = 0
+        self._running = 0
+        self._shutdown = False
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "run_total": 0.0,
+            "run_max": 0.0,
+        }
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker, name=f"CommandWorker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, client_key, fn, *args):
+        """提交任务，返回concurrent.futures.Future；队列已满时抛出SchedulerBusyError"""
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("调度器已关闭")
+            client_queue = self._queues.get(client_key)
+            client_depth = len(client_queue) if client_queue else 0
+            if client_depth >= self.max_queue_per_client or self._queued >= self.max_queue_total:
+                self._stats["rejected"] += 1
+                raise SchedulerBusyError(
+                    f"排队命令过多（客户端 {client_depth}/{self.max_queue_per_client}，"
+                    f"全部 {self._queued}/{self.max_queue_total}）")
+            if client_queue is None:
+                client_queue = self._queues[client_key] = deque()
+            client_queue.append((future, fn, args, time.monotonic()))
+            self._queued += 1
+            self._stats["submitted"] += 1
+            self._cond.notify()
+        return future
+
+    def _next_job(self):
+        """轮转取出下一个任务（调用方持有锁）"""
+        client_key, client_queue = next(iter(self._queues.items()))
+        job = client_queue.popleft()
+        if client_queue:
+            self._queues.move_to_end(client_key)  # 该客户端排到队尾，轮到下一个客户端
+        else:
+            del self._queues[client_key]
+        self._queued -= 1
+        return job
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queues and not self._shutdown:
+                    self._cond.wait()
+                if not self._queues:
+                    return
+                future, fn, args, enqueued_at = self._next_job()
+                self._running += 1
+
+            if future.set_running_or_notify_cancel():
+                started_at = time.monotonic()
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    error = e
+                else:
+                    error = None
+                finished_at = time.monotonic()
+                self._record(started_at - enqueued_at, finished_at - started_at, error is None)
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+            with self._cond:
+                self._running -= 1
+
+    def _record(self, wait_time, run_time, ok):
+        with self._cond:
+            stats = self._stats
+            stats["completed" if ok else "failed"] += 1
+            stats["wait_total"] += wait_time
+            stats["wait_max"] = max(stats["wait_max"], wait_time)
+            stats["run_total"] += run_time
+            stats["run_max"] = max(stats["run_max"], run_time)
+
+    def stats(self):
+        """返回统计信息快照（时间单位：秒）"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = self._queued
+            stats["running"] = self._running
+            stats["clients_waiting"] = len(self._queues)
+        done = stats["completed"] + stats["failed"]
+        stats["wait_avg"] = stats["wait_total"] / done if done else 0.0
+        stats["run_avg"] = stats["run_total"] / done if done else 0.0
+        return stats
+
+    def shutdown(self, wait=True):
+        """停止接收新任务；排队中的任务仍会执行完"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
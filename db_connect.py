@@ -1,26 +1,227 @@
+import collections
+import threading
+import time
+
 import pymysql
+from pymysql.constants import SERVER_STATUS
 from pymysql.cursors import DictCursor
 
+# 数据库连接参数（部署时修改这里即可）
+DB_CONFIG = {
+    'host': 'localhost',  # 或你的数据库主机地址
+    'user': 'root',
+    'password': '208271',
+    'database': 'works',
+    'charset': 'utf8mb4',
+    'cursorclass': DictCursor
+}
+
+
+class PoolExhaustedError(pymysql.err.OperationalError):
+    """连接池已满且等待超时"""
+
+
+class ConnectionPool:
+    """线程安全的有界连接池
+
+    - min_size/max_size: 常驻连接数与连接总数上限
+    - idle_timeout: 空闲超过该秒数的多余连接会被关闭（保留min_size个）
+    - max_lifetime: 连接最长存活秒数，到期后归还时直接关闭
+    - health_check_interval: 借出前若空闲超过该秒数则先ping一次，失效连接直接丢弃
+    - acquire_timeout: 连接数已达上限时借用的最长等待秒数
+    """
+
+    def __init__(self, min_size=1, max_size=10, idle_timeout=300, max_lifetime=3600,
+                 health_check_interval=5, acquire_timeout=10, **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+        self._idle = collections.deque()  # (connection, created_at, last_used)
+        self._created_at = {}  # id(connection) -> 创建时间（含借出中的连接）
+        self._size = 0  # 当前连接总数（空闲+借出+正在创建）
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+    def _connect(self):
+        return pymysql.connect(**self.connect_kwargs)
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except pymysql.Error:
+            pass
+
+    def _discard(self, conn):
+        """关闭连接并释放名额（调用方需持有锁）"""
+        self._created_at.pop(id(conn), None)
+        self._size -= 1
+        self._cond.notify()
+
+    def prefill(self):
+        """预先建立min_size个连接，失败时静默（首次借用时会再尝试）"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except pymysql.Error as e:
+                with self._cond:
+                    self._size -= 1
+                print(f"连接池预热失败: {e}")
+                return
+            now = time.monotonic()
+            with self._cond:
+                self._created_at[id(conn)] = now
+                self._idle.append((conn, now, now))
+                self._cond.notify()
+
+    def acquire(self):
+        """借出一个可用连接，必要时新建；连接数已达上限时等待归还"""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise pymysql.err.InterfaceError("连接池已关闭")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(f"连接池已满（{self.max_size}），等待超时")
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise pymysql.err.InterfaceError("连接池已关闭")
+
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()  # 后进先出，优先复用热连接
+                else:
+                    conn = None
+                    self._size += 1  # 先占名额，锁外建连
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except pymysql.Error:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created_at[id(conn)] = time.monotonic()
+                return conn
+
+            now = time.monotonic()
+            expired = now - created_at >= self.max_lifetime or now - last_used >= self.idle_timeout
+            if not expired and now - last_used >= self.health_check_interval:
+                try:
+                    conn.ping(reconnect=False)
+                except pymysql.Error:
+                    expired = True
+            if not expired:
+                return conn
+
+            self._close_quietly(conn)
+            with self._cond:
+                self._discard(conn)
+
+    def release(self, conn):
+        """归还连接；未结束的事务会被回滚，超龄或已断开的连接直接关闭"""
+        if conn is None:
+            return
+        keep = conn.open and not self._closed
+        if keep and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                conn.rollback()
+            except pymysql.Error:
+                keep = False
+
+        now = time.monotonic()
+        with self._cond:
+            created_at = self._created_at.get(id(conn), now)
+            if keep and now - created_at < self.max_lifetime:
+                self._idle.append((conn, created_at, now))
+                self._cond.notify()
+                stale = self._collect_idle(now)
+            else:
+                self._discard(conn)
+                stale = [conn]
+        for c in stale:
+            self._close_quietly(c)
+
+    def _collect_idle(self, now):
+        """摘出超过idle_timeout的多余空闲连接（调用方需持有锁）"""
+        stale = []
+        while self._idle and self._size > self.min_size:
+            conn, _, last_used = self._idle[0]  # 队头是最久未使用的
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._discard(conn)
+            stale.append(conn)
+        return stale
+
+    def close(self):
+        """关闭连接池及所有空闲连接（借出中的连接在归还时关闭）"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            for conn in idle:
+                self._discard(conn)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """获取进程级默认连接池（首次调用时创建并预热）"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool._closed:
+            _default_pool = ConnectionPool(**DB_CONFIG)
+            _default_pool.prefill()
+        return _default_pool
+
+
+def close_pool():
+    """关闭默认连接池（程序退出时调用）"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
+
 
 class Database:
-    def __init__(self):
-        """初始化数据库连接，包含连接异常处理"""
+    def __init__(self, pool=None):
+        """从连接池借用数据库连接，包含连接异常处理"""
         self.connection = None
         self.connect_success = False
+        self.pool = pool
 
         try:
-            self.connection = pymysql.connect(
-                host='localhost',  # 或你的数据库主机地址
-                user='root',
-                password='208271',
-                database='works',
-                charset='utf8mb4',
-                cursorclass=DictCursor
-            )
+            if self.pool is None:
+                self.pool = get_pool()
+            self.connection = self.pool.acquire()
             self.connect_success = True
         except pymysql.Error as e:
             print(f"数据库连接失败: {e}")
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def execute(self, query, args=None):
         """执行更新操作（INSERT/UPDATE/DELETE），返回操作是否成功"""
         if not self.connect_success or not self.connection:
@@ -73,13 +274,15 @@ class Database:
         self.connection.rollback()
 
     def close(self):
-        """关闭数据库连接，包含异常处理"""
+        """将连接归还连接池，包含异常处理"""
         if self.connection:
             try:
-                self.connection.close()
-                self.connect_success = False
+                self.pool.release(self.connection)
             except pymysql.Error as e:
-                print(f"关闭连接失败: {e}")
+                print(f"归还连接失败: {e}")
+            finally:
+                self.connection = None
+                self.connect_success = False
 
     def get_lastrowid(self):
         """获取最后插入行的自增ID"""
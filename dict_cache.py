@@ -0,0 +1,86 @@
+import threading
+import time
+
+
+class ChangeTypeCache:
+    """change_type_dict字典表的进程内缓存（线程安全）
+
+    首次使用时整表加载，之后name→id、id→名称/描述都直接从内存读取；
+    超过ttl秒或调用bump_version()后，下一次访问时重新加载。
+    查不到的类型名会触发一次补充加载（间隔不小于miss_reload_interval秒），
+    以便及时识别新增的类型。
+    """
+    QUERY = "SELECT type_id, type_name, description, category, is_active FROM change_type_dict"
+
+    def __init__(self, ttl=300, miss_reload_interval=5):
+        self.ttl = ttl
+        self.miss_reload_interval = miss_reload_interval
+        self._lock = threading.Lock()
+        self._by_name = {}
+        self._by_id = {}
+        self._loaded_at = None
+        self._loaded_version = -1
+        self._version = 0
+        self.load_failed = False  # 最近一次加载是否失败（查不到类型时据此区分“字典读不到”和“类型不存在”）
+
+    def bump_version(self):
+        """字典表被修改后调用，使缓存在下一次访问时重新加载"""
+        with self._lock:
+            self._version += 1
+
+    invalidate = bump_version
+
+    def _is_fresh(self):
+        return (self._loaded_at is not None and self._loaded_version == self._version
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    def _load(self, db):
+        with self._lock:
+            version = self._version
+        rows = db.fetch_all(self.QUERY)
+        self.load_failed = not rows
+        if not rows:
+            return  # 查询失败时保留旧数据，下次访问再试
+        by_name = {row["type_name"]: row for row in rows}
+        by_id = {row["type_id"]: row for row in rows}
+        with self._lock:
+            self._by_name = by_name
+            self._by_id = by_id
+            self._loaded_at = time.monotonic()
+            self._loaded_version = version
+
+    def _ensure_loaded(self, db):
+        with self._lock:
+            fresh = self._is_fresh()
+        if not fresh:
+            self._load(db)
+
+    def _reload_on_miss(self, db):
+        with self._lock:
+            recent = (self._loaded_at is not None
+                      and time.monotonic() - self._loaded_at < self.miss_reload_interval)
+        if not recent:
+            self._load(db)
+
+    def get_type_id(self, db, type_name):
+        """根据变更类型名称获取type_id，不存在时返回None"""
+        self._ensure_loaded(db)
+        row = self._by_name.get(type_name)
+        if row is None:
+            self._reload_on_miss(db)
+            row = self._by_name.get(type_name)
+        return row["type_id"] if row else None
+
+    def get_type(self, db, type_id):
+        """根据type_id获取类型信息字典（含type_name、description等），不存在时返回None"""
+        self._ensure_loaded(db)
+        return self._by_id.get(type_id)
+
+    def active_types(self, db):
+        """返回所有启用的变更类型（按type_id排序）"""
+        self._ensure_loaded(db)
+        return [row for _, row in sorted(self._by_id.items()) if row["is_active"]]
+
+
+# 进程级共享实例
+change_type_cache = ChangeTypeCache()
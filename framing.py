@@ -0,0 +1,260 @@
+import socket
+import threading
+import zlib
+
+HEADER_SIZE = 4  # 4字节大端长度前缀
+MAX_FRAME_SIZE = 16 * 1024 * 1024  # 单帧最大16MB（解压后）
+COMPRESSED_FLAG = 0x80000000  # 长度前缀最高位：负载经zlib压缩
+LENGTH_MASK = 0x7FFFFFFF
+COMPRESSION_METHODS = ["zlib"]  # 可协商的压缩算法
+
+
+class FrameTooLargeError(ValueError):
+    """帧长度超过上限（连接已无法继续解析，应关闭）"""
+
+
+class FrameDecodeError(ValueError):
+    """压缩帧无法解压"""
+
+
+def parse_header(header):
+    """解析长度前缀，返回 (负载长度, 是否压缩)"""
+    value = int.from_bytes(header, byteorder='big')
+    return value & LENGTH_MASK, bool(value & COMPRESSED_FLAG)
+
+
+def decompress_payload(data, max_size=MAX_FRAME_SIZE):
+    """解压压缩帧的负载，解压后超过max_size时抛出FrameTooLargeError"""
+    decompressor = zlib.decompressobj()
+    try:
+        payload = decompressor.decompress(data, max_size)
+    except zlib.error as e:
+        raise FrameDecodeError(f"解压失败: {e}")
+    if decompressor.unconsumed_tail:
+        raise FrameTooLargeError(f"解压后帧长度超过上限 {max_size}")
+    return payload
+
+
+def encode_frame(payload, compressor=None):
+    """给负载加上长度前缀；传入compressor时由其决定是否压缩"""
+    flag = 0
+    if compressor is not None:
+        payload, compressed = compressor.compress(payload)
+        if compressed:
+            flag = COMPRESSED_FLAG
+    return (len(payload) | flag).to_bytes(HEADER_SIZE, byteorder='big') + payload
+
+
+def set_nodelay(sock):
+    """关闭Nagle算法：每帧都是一次完整写入，小响应不必等待延迟ACK"""
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (OSError, AttributeError):
+        pass  # 非TCP socket
+
+
+class FrameWriter:
+    """向阻塞socket写帧（线程安全）
+
+    每帧（长度前缀+负载）已是一个完整缓冲区，一次sendall写出。多个线程同时发送时，
+    正在写的线程会把写入期间其他线程排队的帧合并成一次sendall一起写出（组合写），
+    其他线程等待自己的帧写完再返回；写入失败时，所有尚未写出帧的调用方都会收到异常。
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._cond = threading.Condition()
+        self._pending = []
+        self._writing = False
+        self._queued = 0  # 已排队的帧序号
+        self._flushed = 0  # 已写出的帧序号
+        self._error = None
+        self.frames = 0
+        self.writes = 0
+
+    def send(self, frame):
+        with self._cond:
+            if self._error is not None:
+                raise OSError(f"连接已失效: {self._error}")
+            self._pending.append(frame)
+            self._queued += 1
+            seq = self._queued
+            while self._writing and self._flushed < seq:
+                self._cond.wait()
+            if self._flushed >= seq:
+                return
+            if self._error is not None:
+                raise OSError(f"连接已失效: {self._error}")
+            self._writing = True
+
+        # 本线程负责写出，直到没有排队的帧
+        while True:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                batch_end = self._queued
+                if not batch:
+                    self._writing = False
+                    self._cond.notify_all()
+                    return
+            try:
+                self.sock.sendall(batch[0] if len(batch) == 1 else b"".join(batch))
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    self._writing = False
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._flushed = batch_end
+                self.frames += len(batch)
+                self.writes += 1
+                self._cond.notify_all()
+
+
+class FrameCompressor:
+    """发送端帧压缩（线程安全）：负载达到threshold字节且压缩后更小时才压缩，并统计节省的字节数"""
+
+    def __init__(self, threshold=1024, level=6):
+        self.threshold = threshold
+        self.level = level
+        self._lock = threading.Lock()
+        self.frames_compressed = 0
+        self.bytes_before = 0  # 被压缩帧的原始字节数
+        self.bytes_after = 0  # 被压缩帧压缩后的字节数
+
+    def compress(self, payload):
+        """返回 (负载, 是否已压缩)"""
+        if len(payload) < self.threshold:
+            return payload, False
+        compressed = zlib.compress(payload, self.level)
+        if len(compressed) >= len(payload):
+            return payload, False
+        with self._lock:
+            self.frames_compressed += 1
+            self.bytes_before += len(payload)
+            self.bytes_after += len(compressed)
+        return compressed, True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "frames_compressed": self.frames_compressed,
+                "bytes_before": self.bytes_before,
+                "bytes_after": self.bytes_after,
+                "bytes_saved": self.bytes_before - self.bytes_after
+            }
+
+
+class FrameReader:
+    """从阻塞socket读取长度前缀帧
+
+    数据通过recv_into直接读入预分配、跨帧复用的缓冲区，不做逐块拼接；
+    缓冲区只在遇到更大的帧时扩容。socket超时(socket.timeout)时已读进度保留，
+    再次调用read_frame会从中断处继续。最高位带压缩标志的帧在这里解压，
+    调用方拿到的总是原始负载。
+    """
+
+    def __init__(self, sock, max_frame_size=MAX_FRAME_SIZE, initial_size=64 * 1024):
+        self.sock = sock
+        self.max_frame_size = max_frame_size
+        self._header = bytearray(HEADER_SIZE)
+        self._buffer = bytearray(initial_size)
+        self.last_frame_size = 0  # 最近一帧在线路上的字节数（含长度前缀）
+        self.frames_decompressed = 0
+        self.bytes_decompressed = 0  # 压缩帧解压后的字节数
+        self.bytes_compressed = 0  # 压缩帧在线路上的字节数
+        self._reset()
+
+    def _reset(self):
+        self._header_read = 0
+        self._length = None
+        self._compressed = False
+        self._body_read = 0
+
+    def _fill(self, view, start):
+        """向view[start:]读取一次，返回新的已读字节数；对端关闭时返回None"""
+        received = self.sock.recv_into(view[start:])
+        if not received:
+            return None
+        return start + received
+
+    def read_frame(self):
+        """读取一帧，返回指向内部缓冲区的memoryview（下一次调用前有效）；对端关闭时返回None
+
+        帧长度超过max_frame_size时抛出FrameTooLargeError，压缩帧无法解压时抛出FrameDecodeError。
+        """
+        if self._length is None:
+            header_view = memoryview(self._header)
+            while self._header_read < HEADER_SIZE:
+                filled = self._fill(header_view, self._header_read)
+                if filled is None:
+                    return None
+                self._header_read = filled
+
+            length, self._compressed = parse_header(self._header)
+            if length > self.max_frame_size:
+                raise FrameTooLargeError(f"帧长度 {length} 超过上限 {self.max_frame_size}")
+            if length > len(self._buffer):
+                self._buffer = bytearray(max(length, min(len(self._buffer) * 2, self.max_frame_size)))
+            self._length = length
+
+        body_view = memoryview(self._buffer)[:self._length]
+        while self._body_read < self._length:
+            filled = self._fill(body_view, self._body_read)
+            if filled is None:
+                return None
+            self._body_read = filled
+
+        compressed = self._compressed
+        self.last_frame_size = HEADER_SIZE + self._length
+        self._reset()
+        if compressed:
+            payload = decompress_payload(body_view, self.max_frame_size)
+            self.frames_decompressed += 1
+            self.bytes_compressed += len(body_view)
+            self.bytes_decompressed += len(payload)
+            return memoryview(payload)
+        return body_view
+
+
+class FrameDecoder:
+    """增量帧解析（用于事件驱动的socket，如QTcpSocket的readyRead）
+
+    feed()传入任意长度的已到达数据，返回其中已完整的帧负载列表（压缩帧已解压），
+    不完整的部分留在内部缓冲区等待后续数据。
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+        self.frames_decompressed = 0
+        self.bytes_decompressed = 0
+        self.bytes_compressed = 0
+
+    def feed(self, data):
+        """帧长度超过max_frame_size时抛出FrameTooLargeError，压缩帧无法解压时抛出FrameDecodeError"""
+        self._buffer += data
+        buffer = self._buffer
+        frames = []
+        offset = 0
+        while len(buffer) - offset >= HEADER_SIZE:
+            length, compressed = parse_header(buffer[offset:offset + HEADER_SIZE])
+            if length > self.max_frame_size:
+                raise FrameTooLargeError(f"帧长度 {length} 超过上限 {self.max_frame_size}")
+            end = offset + HEADER_SIZE + length
+            if len(buffer) < end:
+                break
+            payload = bytes(buffer[offset + HEADER_SIZE:end])
+            if compressed:
+                self.bytes_compressed += len(payload)
+                payload = decompress_payload(payload, self.max_frame_size)
+                self.frames_decompressed += 1
+                self.bytes_decompressed += len(payload)
+            frames.append(payload)
+            offset = end
+        if offset:
+            del buffer[:offset]  # 一次性丢弃已解析的部分
+        return frames
+
+    def pending_bytes(self):
+        return len(self._buffer)
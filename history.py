@@ -1,51 +1,267 @@
 import json
 import logging
 import datetime
+import os
+import queue
+import threading
+import time
+
+import pymysql
+
+from db_connect import Database
+from dict_cache import change_type_cache
+
+
+class AuditWriter:
+    """历史记录异步批量写入器
+
+    事件先进入有界内存队列，由后台线程每攒够batch_size条或等待flush_interval_ms毫秒后，
+    在一个事务里用多行INSERT写入history_info。数据库不可用（或队列已满）时事件追加到
+    本地溢出文件，数据库恢复后优先补写。
+    只有连接类的临时错误才写入溢出文件重试；数据本身有问题（如违反约束）时改为逐条写入，
+    写不进去的记录移入隔离文件，不会一直卡在溢出文件里阻塞之后的写入。
+    """
+    INSERT_QUERY = """
+        INSERT INTO history_info
+        (employee_id, operator_id, client_ip, change_date, type_id, old_info, new_info)
+        VALUES (%(employee_id)s, %(operator_id)s, %(client_ip)s, %(change_date)s, %(type_id)s, %(old_info)s, %(new_info)s)
+    """
+    DEFAULT_SPILL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history_spill.jsonl")
+    TRANSIENT_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)  # 稍后重试可能成功的错误
+    _FLUSH = "flush"
+    _STOP = "stop"
+
+    def __init__(self, batch_size=100, flush_interval_ms=500, max_queue_size=10000,
+                 spill_path=None, retry_interval=5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.spill_path = spill_path or self.DEFAULT_SPILL_PATH
+        self.loading_path = self.spill_path + ".loading"  # 补写期间溢出文件先改名为此，新溢出的事件写入新文件
+        self.rejected_path = os.path.splitext(self.spill_path)[0] + ".rejected.jsonl"
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._spill_lock = threading.Lock()
+        self._last_failure = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="AuditWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, event):
+        """提交一条历史事件（不阻塞调用方），队列已满时直接写入溢出文件"""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logging.warning("历史记录队列已满，事件写入溢出文件")
+            return self._spill([event])
+        return True
+
+    def flush(self, timeout=None):
+        """等待此前提交的事件全部落库（或落入溢出文件），返回是否在超时前完成"""
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put((self._FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """写完剩余事件并停止后台线程（程序退出时调用）"""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush(timeout)
+        self._queue.put((self._STOP, None))
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            if pending:
+                timeout = max(0.0, deadline - time.monotonic())
+            elif self._has_spill():
+                timeout = self.retry_interval  # 空闲时定期尝试补写溢出文件
+            else:
+                timeout = None
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                command, done = item
+                self._write_batch(pending)
+                pending = []
+                if done is not None:
+                    done.set()
+                if command == self._STOP:
+                    return
+                continue
+
+            if item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.flush_interval
+                pending.append(item)
+                if len(pending) < self.batch_size and time.monotonic() < deadline:
+                    continue
+
+            self._write_batch(pending)
+            pending = []
+
+    def _write_batch(self, events):
+        """把一批事件（连同溢出文件中的积压事件）在一个事务内写入数据库"""
+        spilled = []
+        if self._has_spill() and time.monotonic() - self._last_failure >= self.retry_interval:
+            spilled = self._load_spill()
+        if not events and not spilled:
+            return
+
+        batch = spilled + events
+        try:
+            with Database() as db:
+                if not db.connect_success:
+                    raise pymysql.err.OperationalError("数据库未连接")
+                rows, unknown = self._resolve_type_ids(db, batch)
+                try:
+                    with db.connection.cursor() as cursor:
+                        # executemany会把INSERT ... VALUES改写为单条多行INSERT
+                        cursor.executemany(self.INSERT_QUERY, rows)
+                    db.connection.commit()
+                except self.TRANSIENT_ERRORS:
+                    db.connection.rollback()
+                    raise
+                except pymysql.Error as e:
+                    db.connection.rollback()
+                    logging.warning(f"批量写入历史失败，改为逐条写入: {str(e)}")
+                    self._write_rows(db, rows)
+        except self.TRANSIENT_ERRORS as e:
+            self._last_failure = time.monotonic()
+            logging.error(f"批量写入历史失败，{len(batch)}条事件写入溢出文件: {str(e)}")
+            if spilled:
+                self._restore_spill(spilled)
+            self._spill(events)
+            return
+
+        if unknown:
+            logging.error(f"{len(unknown)}条历史记录的变更类型不存在，已移入隔离文件 {self.rejected_path}")
+            self._append_jsonl(self.rejected_path, [{**event, "error": "未知变更类型"} for event in unknown])
+        if spilled:
+            self._clear_spill()
+            logging.info(f"已补写溢出文件中的 {len(spilled)} 条历史记录")
+
+    def _write_rows(self, db, rows):
+        """逐条写入：数据有问题的记录移入隔离文件，遇到临时错误时剩余记录写入溢出文件"""
+        for index, row in enumerate(rows):
+            try:
+                with db.connection.cursor() as cursor:
+                    cursor.execute(self.INSERT_QUERY, row)
+                db.connection.commit()
+            except self.TRANSIENT_ERRORS as e:
+                self._last_failure = time.monotonic()
+                logging.error(f"写入历史失败，{len(rows) - index}条事件写入溢出文件: {str(e)}")
+                self._spill(rows[index:])
+                return
+            except pymysql.Error as e:
+                db.connection.rollback()
+                logging.error(f"历史记录无法写入，已移入隔离文件 {self.rejected_path}: {str(e)}")
+                self._append_jsonl(self.rejected_path, [{**row, "error": str(e)}])
+
+    def _resolve_type_ids(self, db, events):
+        """把变更类型名称映射为type_id（读字典缓存），返回 (可写入的行, 类型不存在的事件)
+
+        字典表读取失败时查不到类型，按临时错误处理（整批写入溢出文件稍后重试），不丢弃事件
+        """
+        rows, unknown = [], []
+        for event in events:
+            type_id = change_type_cache.get_type_id(db, event["change_type"])
+            if type_id:
+                rows.append({**event, "type_id": type_id})
+            elif change_type_cache.load_failed:
+                raise pymysql.err.OperationalError("变更类型字典读取失败")
+            else:
+                unknown.append(event)
+        return rows, unknown
+
+    def _has_spill(self):
+        return os.path.exists(self.spill_path) or os.path.exists(self.loading_path)
+
+    def _spill(self, events):
+        return self._append_jsonl(self.spill_path, events)
+
+    def _append_jsonl(self, path, events):
+        if not events:
+            return True
+        try:
+            with self._spill_lock, open(path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            return True
+        except OSError as e:
+            logging.error(f"写入历史溢出文件失败，{len(events)}条事件丢失: {str(e)}", exc_info=True)
+            return False
+
+    def _load_spill(self):
+        """把溢出文件改名后读取（上次补写中断留下的改名文件优先），之后新溢出的事件写入新文件，不会被清理误删"""
+        events = []
+        with self._spill_lock:
+            try:
+                if not os.path.exists(self.loading_path):
+                    os.replace(self.spill_path, self.loading_path)
+                with open(self.loading_path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            events.append(json.loads(line))
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(f"读取历史溢出文件失败: {str(e)}")
+        return events
+
+    def _restore_spill(self, events):
+        """补写失败：把读出的事件放回溢出文件，删除改名文件"""
+        if self._spill(events):
+            self._clear_spill()
+
+    def _clear_spill(self):
+        """只删除本次读取的改名文件"""
+        with self._spill_lock:
+            try:
+                os.remove(self.loading_path)
+            except OSError as e:
+                logging.error(f"清理历史溢出文件失败: {str(e)}")
+
+
 class HistoryService:
-    def __init__(self, db):
+    def __init__(self, db, writer=None):
         self.db = db
+        self.writer = writer if writer is not None else AuditWriter()
+
     def record_change(self, employee_id, change_type, old_info, new_info, operator_id=None, client_ip=None):
-        """记录员工变更历史"""
+        """记录员工变更历史（放入异步写入队列后立即返回）"""
         try:
-            # 将变更类型映射为数据库中的type_id（从字典表查询）
-            type_id = self._get_type_id(change_type)
-            if not type_id:
-                raise ValueError(f"未知变更类型: {change_type}")
-
-            # 构造历史记录数据
-            data = {
+            # 构造历史记录数据（type_id由写入线程从字典缓存解析）
+            event = {
                 "employee_id": employee_id,
                 "operator_id": operator_id,
                 "client_ip": client_ip,
-                "change_date": datetime.datetime.now(),
-                "type_id": type_id,
-                "old_info": json.dumps(old_info, ensure_ascii=False),
-                "new_info": json.dumps(new_info, ensure_ascii=False)
+                "change_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "change_type": change_type,
+                "old_info": json.dumps(old_info, ensure_ascii=False, default=str),
+                "new_info": json.dumps(new_info, ensure_ascii=False, default=str)
             }
-
-            # 写入历史表（使用事务确保原子性）
-            with self.db.connection.cursor() as cursor:
-                query = """
-                    INSERT INTO history_info 
-                    (employee_id, operator_id, client_ip, change_date, type_id, old_info, new_info)
-                    VALUES (%(employee_id)s, %(operator_id)s, %(client_ip)s, %(change_date)s, %(type_id)s, %(old_info)s, %(new_info)s)
-                """
-                cursor.execute(query, data)
-
-            self.db.connection.commit()
-            return True
+            return self.writer.submit(event)
         except Exception as e:
-            self.db.connection.rollback()
             logging.error(f"记录历史失败: {str(e)}", exc_info=True)
             return False
 
-    def _get_type_id(self, change_type):
-        """根据变更类型名称获取type_id"""
-        with self.db.connection.cursor() as cursor:
-            query = "SELECT type_id FROM change_type_dict WHERE type_name = %s"
-            cursor.execute(query, (change_type,))
-            result = cursor.fetchone()
-            return result["type_id"] if result else None
+    def flush(self, timeout=None):
+        """等待已提交的历史记录写入完成"""
+        return self.writer.flush(timeout)
+
+    def close(self):
+        """写完剩余历史记录并停止写入线程"""
+        self.writer.close()
+
     def record_position_create(self, position_id, position_name, operator_id=None, client_ip=None):
         """记录职位创建（无员工关联，employee_id=None）"""
         return self.record_change(
@@ -73,4 +289,4 @@ class HistoryService:
             new_info={},
             operator_id=operator_id,
             client_ip=client_ip
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,135 @@
+import threading
+import time
+
+
+class HistoryPager:
+    """历史记录键集分页（按history_id倒序）
+
+    - 上一页/下一页：用当前页首尾的history_id做游标（WHERE history_id < / > 游标），
+      不再使用OFFSET，翻页代价与页码无关
+    - 总数与稀疏游标索引：同一组筛选条件只扫描一次，得到总记录数以及每隔
+      index_stride页的页首history_id，缓存cache_ttl秒（期间总数为近似值）
+    - 跳页：从最近的索引游标出发，OFFSET不超过index_stride页
+    """
+    SELECT_COLUMNS = """
+        SELECT h.history_id, h.employee_id, a.employee_name, h.change_date,
+               t.type_name AS change_type, admin.admin_account AS operator,
+               h.old_info, h.new_info, h.related_table
+    """
+    FROM_CLAUSE = """
+        FROM history_info h
+        JOIN change_type_dict t ON h.type_id = t.type_id
+        LEFT JOIN employee_accounts a ON h.employee_id = a.employee_id
+    """
+    OPERATOR_JOIN = """
+        LEFT JOIN admin_accounts admin ON h.operator_id = admin.admin_account_id
+    """
+
+    def __init__(self, page_size=50, index_stride=20, cache_ttl=60):
+        self.page_size = page_size
+        self.index_stride = index_stride
+        self.cache_ttl = cache_ttl
+        self._index_cache = {}  # 筛选条件 -> (建立时间, 总数, 稀疏游标列表)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_filters(emp_key, change_type, start_time, end_time):
+        """构造筛选条件，返回(where子句, 参数列表)"""
+        where_clause = " WHERE 1=1 "
+        params = []
+
+        # 员工筛选
+        if emp_key:
+            where_clause += " AND (h.employee_id = %s OR a.employee_name LIKE %s) "
+            params.extend([emp_key, f"%{emp_key}%"])
+
+        # 变更类型筛选（匹配数据库`type_name`）
+        if change_type is not None and change_type != "所有类型":
+            where_clause += " AND t.type_name = %s "
+            params.append(change_type)
+
+        # 日期筛选
+        where_clause += " AND h.change_date BETWEEN %s AND %s "
+        params.extend([start_time, end_time])
+        return where_clause, params
+
+    def invalidate(self):
+        """清空总数与游标索引缓存（如手动刷新时）"""
+        with self._lock:
+            self._index_cache.clear()
+
+    def _page_index(self, db, where_clause, params):
+        """获取(总记录数, 稀疏游标列表)；anchors[k]为第k*index_stride+1页的首条history_id"""
+        key = (where_clause, tuple(params))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._index_cache.get(key)
+            if cached and now - cached[0] < self.cache_ttl:
+                return cached[1], cached[2]
+
+        # 一次扫描同时得到总数与每index_stride页的页首ID（MySQL 8窗口函数）
+        query = f"""
+            SELECT ranked.history_id, ranked.total FROM (
+                SELECT h.history_id,
+                       ROW_NUMBER() OVER (ORDER BY h.history_id DESC) AS rn,
+                       COUNT(*) OVER () AS total
+                {self.FROM_CLAUSE}
+                {where_clause}
+            ) AS ranked
+            WHERE MOD(ranked.rn - 1, %s) = 0
+            ORDER BY ranked.rn
+        """
+        rows = db.fetch_all(query, params + [self.index_stride * self.page_size]) or []
+        total = rows[0]["total"] if rows else 0
+        anchors = [row["history_id"] for row in rows]
+
+        with self._lock:
+            self._index_cache[key] = (now, total, anchors)
+        return total, anchors
+
+    def _fetch(self, db, where_clause, params, condition="", condition_params=(),
+               ascending=False, offset=0):
+        query = (self.SELECT_COLUMNS + self.FROM_CLAUSE + self.OPERATOR_JOIN + where_clause + condition
+                 + f" ORDER BY h.history_id {'ASC' if ascending else 'DESC'} LIMIT %s OFFSET %s")
+        rows = db.fetch_all(query, params + list(condition_params) + [self.page_size, offset]) or []
+        return rows[::-1] if ascending else rows
+
+    def fetch_page(self, db, where_clause, params, page, cursor=None):
+        """查询指定页，cursor为上次fetch_page返回的游标（筛选条件相同时用于相邻翻页）
+
+        返回 {"page", "total", "total_pages", "rows", "cursor"}
+        """
+        total, anchors = self._page_index(db, where_clause, params)
+        total_pages = max(1, (total + self.page_size - 1) // self.page_size)
+        page = min(max(1, page), total_pages)
+
+        filter_key = (where_clause, tuple(params))
+        if cursor and cursor["filter_key"] != filter_key:
+            cursor = None  # 筛选条件已变，旧游标作废
+
+        if page == 1:
+            rows = self._fetch(db, where_clause, params)
+        elif cursor and page == cursor["page"] + 1 and cursor["last_id"] is not None:
+            rows = self._fetch(db, where_clause, params, " AND h.history_id < %s ", (cursor["last_id"],))
+        elif cursor and page == cursor["page"] - 1 and cursor["first_id"] is not None:
+            rows = self._fetch(db, where_clause, params, " AND h.history_id > %s ", (cursor["first_id"],),
+                               ascending=True)
+        else:
+            # 跳页：从不晚于目标页的最近索引游标出发
+            slot = min((page - 1) // self.index_stride, len(anchors) - 1)
+            offset = (page - 1 - slot * self.index_stride) * self.page_size
+            rows = self._fetch(db, where_clause, params, " AND h.history_id <= %s ", (anchors[slot],),
+                               offset=offset)
+
+        return {
+            "page": page,
+            "total": total,
+            "total_pages": total_pages,
+            "rows": rows,
+            "cursor": {
+                "filter_key": filter_key,
+                "page": page,
+                "first_id": rows[0]["history_id"] if rows else None,
+                "last_id": rows[-1]["history_id"] if rows else None,
+            },
+        }
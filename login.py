@@ -305,24 +305,23 @@ class LoginDialog(QDialog):
                 self.progress.show()
                 self.animation.start()
                 # 连接动画完成信号到登录成功方法，并传递user_id
-                self.animation.finished.connect(lambda: self.login_success(is_admin, db, user_id))
+                self.animation.finished.connect(lambda: self.login_success(is_admin, user_id))
             else:
                 QMessageBox.warning(self, '登录失败', '账号或密码错误，请重新输入')
         except Exception as e:
             QMessageBox.critical(self, '错误', f'数据验证失败: {str(e)}')
             if hasattr(self, 'progress'):
                 self.progress.close()
+        finally:
+            # 验证完成后立即归还连接，动画期间及失败/取消时都不占用连接池
             db.close()
 
-    def login_success(self, is_admin, db, user_id):
+    def login_success(self, is_admin, user_id):
         """处理登录成功逻辑，接收user_id参数"""
         try:
             if hasattr(self, 'progress'):
                 self.progress.close()
 
-            # 关闭数据库连接
-            db.close()
-
             # 关闭登录窗口并发射信号，传递is_admin和user_id
             self.accept()
             self.login_success_signal.emit(is_admin, user_id)
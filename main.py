@@ -1,6 +1,7 @@
 # main.py
 from PyQt5 import QtGui, QtWidgets
 
+from db_connect import close_pool
 from login import LoginDialog, show_main_window
 
 main_window = None
@@ -10,6 +11,7 @@ if __name__ == "__main__":
     app = QtWidgets.QApplication(sys.argv)
     font = QtGui.QFont("Microsoft YaHei", 9)
     app.setFont(font)
+    app.aboutToQuit.connect(close_pool)  # 退出时关闭数据库连接池
 
     login_window = LoginDialog()
 
@@ -1,10 +1,34 @@
-from PyQt5.QtCore import QThread, pyqtSignal
-import json
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
+from collections import deque
+from concurrent.futures import Future
+import itertools
+import random
+import threading
 import time
 import socket
-import datetime
-import hashlib
-import hmac
+import uuid
+
+from codec import JSON_CODEC, DecodeError, available_encodings, decode_frame, negotiate
+from pubsub import publish_command
+from signing import SigningContext, signing_timestamp
+from framing import (COMPRESSION_METHODS, FrameCompressor, FrameDecodeError, FrameReader, FrameTooLargeError,
+                     FrameWriter, encode_frame, set_nodelay)
+
+
+def enable_keepalive(sock, interval):
+    """开启TCP keepalive：空闲interval秒后开始探测，探测间隔interval秒，3次失败即断开"""
+    interval = max(1, int(interval))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, "TCP_KEEPIDLE"):  # Linux
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, interval)
+    elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, interval)
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    if hasattr(socket, "TCP_KEEPCNT"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+    if hasattr(socket, "SIO_KEEPALIVE_VALS"):  # Windows
+        sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, interval * 1000, interval * 1000))
 
 
 class SocketClient(QThread):
@@ -13,64 +37,278 @@ class SocketClient(QThread):
     message_received = pyqtSignal(dict)  # 用于发送接收到的消息
     connection_established = pyqtSignal()  # 连接成功信号
     connection_lost = pyqtSignal()  # 连接丢失信号
+    request_completed = pyqtSignal(str, dict)  # request_id, 最终响应
+    request_timed_out = pyqtSignal(str)  # request_id
+    request_failed = pyqtSignal(str, str)  # request_id, 失败原因（如连接断开）
+    rtt_measured = pyqtSignal(float)  # 心跳往返时间(毫秒)
+    reconnecting = pyqtSignal(int, float)  # 第几次重连, 等待秒数
 
+    REQUEST_TIMEOUT = 30  # 默认请求超时(秒)
 
-    def __init__(self, secret_key="personnel_management_system_key"):
+    def __init__(self, secret_key="personnel_management_system_key", heartbeat_interval=5, max_missed_heartbeats=3):
         super().__init__()
         self.host = None
         self.port = None
         self.socket = None
+        self.frame_reader = None  # 每个连接一个，跨帧复用接收缓冲区
+        self.codec = JSON_CODEC  # 发送编码，连接后经hello握手协商
+        self.compressor = FrameCompressor()  # 发送端压缩统计（跨连接累计）
+        self.compress_enabled = False  # 是否已协商压缩
         self.running = False
-        self.buffer_size = 4096  # 增大缓冲区大小
-        self.secret_key = secret_key.encode('utf-8')  # 初始化密钥并转为字节
+        self.signer = SigningContext(secret_key)  # 密钥只处理一次，每条消息复制预加载的HMAC
         self.reconnect_attempts = 0
-        self.max_reconnect_attempts = 3
-        self.reconnect_delay = 5  # 重连延迟(秒)
+        self.max_reconnect_attempts = None  # None表示一直重连直到stop()
+        self.reconnect_base_delay = 1  # 首次重连等待(秒)，之后每次翻倍
+        self.reconnect_max_delay = 30  # 重连等待上限(秒)
+        self._stop_event = threading.Event()  # stop()时打断重连等待
+        self.frame_writer = None  # GUI线程发命令、接收线程发心跳，同时到达的帧合并写出
+
+        # 待发送队列：连接中断期间发送的数据暂存于此，重连成功后按顺序补发
+        self.connected = False
+        self._outbound_lock = threading.Lock()
+        self._outbound = deque()
+        self.max_outbound = 100
+
+        # 心跳：接收循环每隔heartbeat_interval秒发一次，连续max_missed_heartbeats次
+        # 没有收到任何数据即判定连接已断开（半开连接不会再让线程永久阻塞）
+        self.heartbeat_interval = heartbeat_interval
+        self.max_missed_heartbeats = max_missed_heartbeats
+        self._heartbeats = {}  # 未应答心跳 request_id -> 发送时间
+        self._last_heartbeat = 0.0
+        self.missed_heartbeats = 0
+
+        # 待响应请求表：request_id -> {"future", "deadline", "timeout"}
+        # 同一连接上可同时有多个命令在执行，响应按request_id匹配（可能乱序到达）
+        self._request_prefix = uuid.uuid4().hex[:8]
+        self._request_counter = itertools.count(1)
+        self.client_id = self._request_prefix  # 服务器据此不把本客户端发布的事件再推回来
+        self.subscriptions = set()  # 已订阅的数据变更主题
+        self._pending_lock = threading.Lock()
+        self._pending_requests = {}
+        self.request_timer = QTimer(self)  # 在GUI线程中检查超时
+        self.request_timer.setInterval(500)
+        self.request_timer.timeout.connect(self._check_request_timeouts)
 
     def set_server(self, host, port):
         """设置服务器地址和端口"""
         self.host = host
         self.port = int(port)
 
+    def set_heartbeat(self, interval, max_missed=3):
+        """设置心跳间隔(秒)与允许连续丢失的次数，下次连接时生效"""
+        self.heartbeat_interval = interval
+        self.max_missed_heartbeats = max_missed
+
+    def set_reconnect_policy(self, base_delay=1, max_delay=30, max_attempts=None):
+        """设置重连退避：等待时间从base_delay起按2倍增长，最多max_delay秒；max_attempts为None时不限次数"""
+        self.reconnect_base_delay = base_delay
+        self.reconnect_max_delay = max_delay
+        self.max_reconnect_attempts = max_attempts
+
+    def backoff_delay(self, attempt):
+        """第attempt次（从0开始）重连前的等待时间：指数增长并加随机抖动，避免多个客户端同时重连"""
+        ceiling = min(self.reconnect_max_delay, self.reconnect_base_delay * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def next_request_id(self):
+        return f"{self._request_prefix}-{next(self._request_counter)}"
+
+    def send_request(self, data, timeout=None):
+        """发送带签名的请求并登记到待响应表，返回Future（附带request_id属性）
+
+        收到最终响应时Future得到结果并发出request_completed；超时或连接断开时
+        Future得到异常并发出request_timed_out/request_failed。需在GUI线程中调用。
+        """
+        data = {**data, "request_id": data.get("request_id") or self.next_request_id()}
+        timeout = timeout or self.REQUEST_TIMEOUT
+        future = Future()
+        future.request_id = data["request_id"]
+        with self._pending_lock:
+            self._pending_requests[future.request_id] = {
+                "future": future,
+                "timeout": timeout,
+                "deadline": time.monotonic() + timeout
+            }
+        if not self.request_timer.isActive():
+            self.request_timer.start()
+
+        if not self.send_secure_data(data):
+            self._fail_request(future.request_id, "发送失败")
+        return future
+
+    def compression_stats(self):
+        """压缩统计：发送方向节省的字节数，以及接收到的压缩帧解压前后大小"""
+        stats = {"sent": self.compressor.stats()}
+        reader = self.frame_reader
+        if reader is not None:
+            stats["received"] = {
+                "frames_decompressed": reader.frames_decompressed,
+                "bytes_compressed": reader.bytes_compressed,
+                "bytes_decompressed": reader.bytes_decompressed,
+                "bytes_saved": reader.bytes_decompressed - reader.bytes_compressed
+            }
+        return stats
+
+    def request_stats(self):
+        """向服务器查询运行统计（需签名），结果以type为stats的消息返回"""
+        return self.send_request({
+            "type": "stats",
+            "command": "stats"
+        })
+
+    def subscribe(self, topics):
+        """订阅数据变更主题，事件以type为event的消息返回；断线重连后自动重新订阅"""
+        self.subscriptions.update(topics)
+        if self.connected:
+            try:
+                self._send_frame(self._subscribe_message())
+            except OSError:
+                pass  # 重连后随握手重新订阅
+
+    def _subscribe_message(self):
+        return {"type": "subscribe", "topics": sorted(self.subscriptions), "client_id": self.client_id,
+                "request_id": self.next_request_id()}
+
+    def publish(self, topic, action, ids, **fields):
+        """广播一条数据变更（需签名），其他订阅了topic的客户端据此刷新受影响的行"""
+        event = {"action": action, "ids": list(ids), **fields}
+        return self.send_secure_data({
+            "type": "publish",
+            "command": publish_command(topic, event),
+            "topic": topic,
+            "event": event,
+            "client_id": self.client_id
+        })
+
+    def pending_request_count(self):
+        with self._pending_lock:
+            return len(self._pending_requests)
+
+    def _resolve_request(self, message):
+        """收到带request_id的响应时更新待响应表（在接收线程中调用）"""
+        request_id = message.get("request_id")
+        if request_id is None:
+            return
+        with self._pending_lock:
+            entry = self._pending_requests.get(request_id)
+            if entry is None:
+                return
+            if message.get("type") == "command_chunk":
+                # 流式输出仍在进行，顺延超时
+                entry["deadline"] = time.monotonic() + entry["timeout"]
+                return
+            del self._pending_requests[request_id]
+        entry["future"].set_result(message)
+        self.request_completed.emit(request_id, message)
+
+    def _fail_request(self, request_id, reason):
+        with self._pending_lock:
+            entry = self._pending_requests.pop(request_id, None)
+        if entry is not None:
+            entry["future"].set_exception(ConnectionError(reason))
+            self.request_failed.emit(request_id, reason)
+
+    def _fail_all_requests(self, reason, keep=()):
+        """让所有待响应请求失败；keep中的请求（仍在待发送队列中）保留"""
+        with self._pending_lock:
+            request_ids = [request_id for request_id in self._pending_requests if request_id not in keep]
+        for request_id in request_ids:
+            self._fail_request(request_id, reason)
+
+    def _check_request_timeouts(self):
+        now = time.monotonic()
+        with self._pending_lock:
+            expired = [request_id for request_id, entry in self._pending_requests.items()
+                       if entry["deadline"] <= now]
+            entries = [self._pending_requests.pop(request_id) for request_id in expired]
+            if not self._pending_requests:
+                self.request_timer.stop()
+        for request_id, entry in zip(expired, entries):
+            entry["future"].set_exception(TimeoutError(f"请求超时: {request_id}"))
+            self.request_timed_out.emit(request_id)
+
+    def _sign(self, data):
+        """构建带HMAC签名的安全数据包（签名覆盖命令、时间戳和一次性nonce，服务器据此拒绝重放）"""
+        # 提取命令和时间戳
+        cmd = data.get("command", "")
+        timestamp = signing_timestamp()  # 每次签名都取当前UTC时间，调用方数据中的本地时间不参与签名
+        nonce = uuid.uuid4().hex
+
+        # 构建安全数据包（每帧都带request_id）
+        return {
+            "request_id": self.next_request_id(),
+            **data,
+            "timestamp": timestamp,
+            "nonce": nonce,
+            "signature": self.signer.sign(cmd, timestamp, nonce),
+            "sign_type": "hmac-sha256",
+            "client_type": "personnel_management_client"
+        }
+
+    def _queue_outbound(self, kind, data):
+        """连接中断时把数据放入待发送队列，返回是否已入队（已连接时返回False）"""
+        dropped = None
+        with self._outbound_lock:
+            if self.connected:
+                return False
+            if len(self._outbound) >= self.max_outbound:
+                dropped = self._outbound.popleft()[1]
+            self._outbound.append((kind, data))
+        if dropped is not None:
+            self.status_updated.emit(f"待发送队列已满，丢弃最早的数据: {dropped.get('command', dropped.get('type'))}")
+            if dropped.get("request_id") is not None:
+                self._fail_request(dropped["request_id"], "待发送队列已满")
+        return True
+
+    def _replay_outbound(self):
+        """重连后按顺序补发待发送队列（在接收线程中调用），发送失败的数据留在队列中"""
+        replayed = 0
+        with self._outbound_lock:
+            while self._outbound:
+                kind, data = self._outbound[0]
+                if kind == "secure":
+                    # 按补发时间重新签名，避免中断较久时时间戳超出服务器的重放窗口
+                    self._send_frame(self._sign(data))
+                else:
+                    self._send_frame({"request_id": self.next_request_id(), **data})
+                self._outbound.popleft()
+                replayed += 1
+            self.connected = True
+        if replayed:
+            self.status_updated.emit(f"已补发连接中断期间的 {replayed} 条数据")
+
+    def _queued_request_ids(self):
+        with self._outbound_lock:
+            return {data.get("request_id") for _, data in self._outbound}
+
     def send_secure_data(self, data):
-        """发送带HMAC签名的数据"""
-        if not self.socket or not self.running:
+        """发送带HMAC签名的数据，返回是否已发送（连接中断期间返回是否已加入待发送队列）"""
+        if not self.running:
             self.status_updated.emit("未连接到服务器，无法发送安全数据")
-            return
+            return False
 
-        try:
-            # 提取命令和时间戳
-            cmd = data.get("command", "")
-            timestamp = data.get("timestamp", datetime.datetime.now().isoformat())
-
-            # 生成签名
-            data_to_sign = f"{cmd}|{timestamp}".encode('utf-8')
-            signature = hmac.new(
-                self.secret_key,
-                data_to_sign,
-                hashlib.sha256
-            ).hexdigest()
-
-            # 构建安全数据包
-            secure_data = {
-                **data,
-                "signature": signature,
-                "sign_type": "hmac-sha256",
-                "client_type": "personnel_management_client"
-            }
+        cmd = data.get("command", "")
+        if self._queue_outbound("secure", data):
+            self.status_updated.emit(f"连接中断，命令已加入待发送队列: {cmd}")
+            return True
 
+        try:
             # 发送数据
-            json_data = json.dumps(secure_data).encode('utf-8')
-            self.socket.sendall(len(json_data).to_bytes(4, byteorder='big'))
-            self.socket.sendall(json_data)
+            self._send_frame(self._sign(data))
             self.status_updated.emit(f"[安全] 发送命令: {cmd}")
+            return True
         except Exception as e:
             self.status_updated.emit(f"发送安全命令失败: {str(e)}")
             self.handle_connection_lost()
+            if self.running and self._queue_outbound("secure", data):
+                self.status_updated.emit(f"命令已加入待发送队列，重连后补发: {cmd}")
+                return True
+            return False
 
     def run(self):
-        """线程运行函数，处理Socket连接和数据接收"""
+        """线程运行函数，处理Socket连接和数据接收；连接断开后按退避策略自动重连"""
         self.running = True
+        self._stop_event.clear()
 
         # 连接到服务器
         if not self.connect_to_server():
@@ -82,60 +320,68 @@ class SocketClient(QThread):
         while self.running:
             if self.socket:
                 try:
-                    # 接收数据长度前缀
-                    length_bytes = self.socket.recv(4)
-                    if not length_bytes:
-                        self.handle_connection_lost()
-                        break
-
-                    data_length = int.from_bytes(length_bytes, byteorder='big')
-
-                    # 接收完整数据
-                    received_data = b''
-                    while len(received_data) < data_length:
-                        chunk = self.socket.recv(min(self.buffer_size, data_length - len(received_data)))
-                        if not chunk:
-                            self.handle_connection_lost()
-                            break
-                        received_data += chunk
-
-                    if received_data:
-                        self.process_received_data(received_data)
-                    else:
+                    # 接收完整的一帧（超时中断时已读部分保留，下次继续）
+                    received_data = self.frame_reader.read_frame()
+                    if received_data is None:
                         self.handle_connection_lost()
-                        break
+                        continue
+
+                    self.process_received_data(received_data)
 
                 except socket.timeout:
-                    # 超时处理
-                    self.status_updated.emit("接收数据超时")
+                    # 一个心跳间隔内没有数据，检查心跳
+                    pass
+                except (FrameTooLargeError, FrameDecodeError) as e:
+                    self.status_updated.emit(f"接收数据错误: {str(e)}")
+                    self.handle_connection_lost()
                     continue
                 except socket.error as e:
                     # 套接字错误
                     self.status_updated.emit(f"套接字错误: {str(e)}")
                     self.handle_connection_lost()
-                    break
+                    continue
                 except Exception as e:
                     # 其他错误
                     self.status_updated.emit(f"接收数据错误: {str(e)}")
                     self.handle_connection_lost()
-                    break
-            else:
-                # 尝试重连
-                if self.reconnect_attempts < self.max_reconnect_attempts:
-                    self.status_updated.emit(
-                        f"尝试重连 ({self.reconnect_attempts + 1}/{self.max_reconnect_attempts})...")
-                    if self.connect_to_server():
-                        self.reconnect_attempts = 0
-                    else:
-                        self.reconnect_attempts += 1
-                        time.sleep(self.reconnect_delay)  # 等待后再次尝试
-                else:
-                    self.status_updated.emit("重连尝试次数已达上限，停止重连")
-                    self.running = False
-                time.sleep(1)  # 避免CPU占用过高
+                    continue
+
+                if not self._heartbeat_tick():
+                    self.status_updated.emit(f"连续 {self.missed_heartbeats} 次心跳无响应")
+                    self.handle_connection_lost()
+            elif not self._reconnect():
+                break
 
-    def connect_to_server(self):
-        """连接到服务器，返回连接成功与否"""
+    def _reconnect(self):
+        """按抖动指数退避等待后重连一次；已停止或重连次数达到上限时返回False"""
+        if self.max_reconnect_attempts is not None and self.reconnect_attempts >= self.max_reconnect_attempts:
+            self.status_updated.emit("重连尝试次数已达上限，停止重连")
+            self.running = False
+            self._discard_outbound("重连失败")
+            return False
+
+        delay = self.backoff_delay(self.reconnect_attempts)
+        self.reconnect_attempts += 1
+        self.reconnecting.emit(self.reconnect_attempts, delay)
+        self.status_updated.emit(f"{delay:.1f}秒后尝试第 {self.reconnect_attempts} 次重连...")
+        if self._stop_event.wait(delay):
+            return False  # stop()打断等待
+
+        if self.connect_to_server(report_failure=False):
+            self.reconnect_attempts = 0
+        return True
+
+    def _discard_outbound(self, reason):
+        """清空待发送队列，其中的请求一并失败"""
+        with self._outbound_lock:
+            request_ids = [data.get("request_id") for _, data in self._outbound]
+            self._outbound.clear()
+        for request_id in request_ids:
+            if request_id is not None:
+                self._fail_request(request_id, reason)
+
+    def connect_to_server(self, report_failure=True):
+        """连接到服务器并补发待发送队列，返回连接成功与否（重连时report_failure为False，失败不再发出connection_lost）"""
         if not self.host or not self.port:
             self.status_updated.emit("请先设置服务器地址和端口")
             return False
@@ -144,49 +390,111 @@ class SocketClient(QThread):
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(10)  # 设置连接超时为10秒
             self.socket.connect((self.host, self.port))
-            self.socket.settimeout(None)  # 重置超时设置，使用阻塞模式
+            enable_keepalive(self.socket, self.heartbeat_interval)
+            # 接收超时等于心跳间隔：空闲时接收循环按时醒来发心跳
+            self.socket.settimeout(self.heartbeat_interval)
+            set_nodelay(self.socket)
+            self.frame_reader = FrameReader(self.socket)
+            self.frame_writer = FrameWriter(self.socket)
+            self._heartbeats.clear()
+            self._last_heartbeat = time.monotonic()
+            self.missed_heartbeats = 0
+            # 编码协商：握手完成前使用JSON
+            self.codec = JSON_CODEC
+            self.compress_enabled = False
+            self._send_frame({"type": "hello", "encodings": available_encodings(),
+                              "compression": COMPRESSION_METHODS, "request_id": self.next_request_id()})
+            if self.subscriptions:
+                self._send_frame(self._subscribe_message())
+            self._replay_outbound()
             self.status_updated.emit(f"成功连接到服务器 {self.host}:{self.port}")
             self.connection_established.emit()
             return True
         except Exception as e:
             self.status_updated.emit(f"连接服务器失败: {str(e)}")
-            self.socket = None
-            self.connection_lost.emit()
+            self.close_socket()
+            if report_failure:
+                self.connection_lost.emit()
             return False
 
     def send_data(self, data):
-        """发送数据到服务器"""
-        if not self.socket or not self.running:
+        """发送数据到服务器（连接中断期间加入待发送队列）"""
+        if not self.running:
             self.status_updated.emit("未连接到服务器，无法发送数据")
             return
+        if self._queue_outbound("plain", data):
+            self.status_updated.emit(f"连接中断，数据已加入待发送队列: {data.get('type', '未知类型')}")
+            return
 
         try:
-            # 将数据转换为JSON字符串
-            json_data = json.dumps(data).encode('utf-8')
-            # 发送数据长度和数据
-            self.socket.sendall(len(json_data).to_bytes(4, byteorder='big'))
-            self.socket.sendall(json_data)
+            # 每帧都带request_id
+            self._send_frame({"request_id": self.next_request_id(), **data})
             self.status_updated.emit(f"已发送数据: {data.get('type', '未知类型')}")
         except Exception as e:
             self.status_updated.emit(f"发送数据失败: {str(e)}")
             self.handle_connection_lost()
 
+    def _send_frame(self, data):
+        """按当前编码发送一帧"""
+        frame = encode_frame(self.codec.encode(data), self.compressor if self.compress_enabled else None)
+        frame_writer = self.frame_writer
+        if frame_writer is None:
+            raise OSError("未连接到服务器")
+        frame_writer.send(frame)
+
+    def _heartbeat_tick(self):
+        """到期时发送心跳（在接收线程中调用），心跳连续丢失过多时返回False"""
+        now = time.monotonic()
+        if now - self._last_heartbeat < self.heartbeat_interval:
+            return True
+        self._last_heartbeat = now
+        if self._heartbeats:
+            self.missed_heartbeats += 1
+            if self.missed_heartbeats >= self.max_missed_heartbeats:
+                return False
+
+        request_id = self.next_request_id()
+        self._heartbeats[request_id] = now
+        try:
+            self._send_frame({"type": "heartbeat", "request_id": request_id, "timestamp": time.time()})
+        except OSError as e:
+            self.status_updated.emit(f"发送心跳失败: {str(e)}")
+            return False
+        return True
+
+    def _on_heartbeat_ack(self, request_id):
+        """收到心跳应答：计算往返时间，清除更早的未应答心跳"""
+        sent_at = self._heartbeats.get(request_id)
+        if sent_at is None:
+            return False
+        self.rtt_measured.emit((time.monotonic() - sent_at) * 1000)
+        self._heartbeats = {key: t for key, t in self._heartbeats.items() if t > sent_at}
+        return True
+
     def process_received_data(self, data):
         """处理接收到的数据，通过信号发送到主线程"""
         try:
-            json_str = data.decode('utf-8')
-            message = json.loads(json_str)
+            message = decode_frame(data)
+            self.missed_heartbeats = 0  # 收到任何数据都说明连接仍然可用
+            if message.get("type") == "heartbeat_ack" and self._on_heartbeat_ack(message.get("request_id")):
+                return  # 内部心跳的应答不转发给界面
+            if message.get("type") == "hello_ack":
+                self.codec = negotiate([message.get("encoding")])
+                self.compress_enabled = message.get("compression") in COMPRESSION_METHODS
+                self.status_updated.emit(
+                    f"通信编码: {self.codec.name}，压缩: {message.get('compression') or '无'}")
+            self._resolve_request(message)
 
             # 发送原始消息到主线程处理
             self.message_received.emit(message)
 
-        except json.JSONDecodeError as e:
+        except DecodeError as e:
             # 发送错误消息到主线程
             error_msg = {
                 "type": "error",
-                "error_type": "JSONDecodeError",
+                "error_type": "DecodeError",
                 "message": str(e),
-                "raw_data": data[:100].decode('utf-8', errors='replace') + "..."
+                "raw_data": str(data[:100], 'utf-8', 'replace') + "..."
             }
             self.message_received.emit(error_msg)
         except Exception as e:
@@ -203,9 +511,12 @@ class SocketClient(QThread):
             self.status_updated.emit("与服务器的连接已丢失")
             self.connection_lost.emit()
         self.close_socket()
+        # 已发出但未收到响应的请求无法确认结果，直接失败；仍在待发送队列中的保留到重连后补发
+        self._fail_all_requests("与服务器的连接已丢失", keep=self._queued_request_ids())
 
     def close_socket(self):
         """关闭Socket连接"""
+        self.connected = False
         if self.socket:
             try:
                 # 优雅关闭连接
@@ -215,16 +526,22 @@ class SocketClient(QThread):
                 self.status_updated.emit(f"关闭socket时出错: {str(e)}")
             finally:
                 self.socket = None
+                self.frame_reader = None
+                self.frame_writer = None
 
     def stop(self):
         """安全停止线程和连接"""
         self.running = False
+        self._stop_event.set()  # 打断重连等待
 
         # 重置重连尝试
         self.reconnect_attempts = 0
 
         # 关闭socket
         self.close_socket()
+        self.request_timer.stop()
+        self._discard_outbound("连接已关闭")
+        self._fail_all_requests("连接已关闭")
 
         # 等待线程结束
         self.wait(2000)  # 等待最多2000秒
@@ -0,0 +1,153 @@
+import multiprocessing
+import queue
+import signal
+import socket
+import threading
+import time
+
+from server_metrics import merge_snapshots, render_text
+
+
+def reuse_port_supported():
+    """当前平台是否支持SO_REUSEPORT（Linux/BSD/macOS支持，Windows不支持）"""
+    return hasattr(socket, "SO_REUSEPORT")
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class PreforkSupervisor:
+    """多进程工作者管理
+
+    - 启动worker_count个子进程执行target(index, stats_queue, event_queue, inbox, *args)，每个子进程有自己的GIL
+    - 子进程定期把统计快照放入stats_queue，管理进程保存每个进程的最新快照并合并
+    - 子进程放入event_queue的 (index, 消息) 由转发线程投递到其他子进程各自的inbox
+    - 子进程意外退出时自动重启；刚启动就退出的进程按指数退避延迟重启，避免反复崩溃空转
+    - 已退出进程的累计计数并入retired，重启后合计值不会倒退
+    """
+
+    def __init__(self, target, worker_count, args=(), min_uptime=5, max_restart_delay=30):
+        self.target = target
+        self.worker_count = worker_count
+        self.args = args
+        self.min_uptime = min_uptime
+        self.max_restart_delay = max_restart_delay
+        self.stats_queue = multiprocessing.Queue()
+        self.event_queue = multiprocessing.Queue()
+        self.workers = {}  # index -> {"process", "inbox", "started", "restarts", "restart_at", "delay", "stats"}
+        self.retired = {}  # 已退出进程的累计统计
+        self.stopping = False
+
+    def start(self):
+        for index in range(self.worker_count):
+            self.workers[index] = {"process": None, "inbox": None, "started": 0.0, "restarts": 0,
+                                   "restart_at": 0.0, "delay": 0.0, "stats": None}
+            self._spawn(index)
+        threading.Thread(target=self._relay_events, name="EventRelay", daemon=True).start()
+
+    def _spawn(self, index):
+        worker = self.workers[index]
+        inbox = multiprocessing.Queue()  # 重启时换新队列，旧进程未取走的消息随之丢弃
+        process = multiprocessing.Process(target=self.target,
+                                          args=(index, self.stats_queue, self.event_queue, inbox) + tuple(self.args),
+                                          name=f"ServerWorker-{index}")
+        process.start()
+        worker["inbox"] = inbox
+        worker["process"] = process
+        worker["started"] = time.monotonic()
+        worker["stats"] = None
+        print(f"工作进程 {index} 已启动 (pid {process.pid})")
+
+    def _collect_stats(self, timeout):
+        """接收子进程上报的统计，最多等待timeout秒"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                index, pid, stats = self.stats_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return
+            worker = self.workers.get(index)
+            if worker is not None and worker["process"] is not None and worker["process"].pid == pid:
+                worker["stats"] = stats
+
+    def _relay_events(self):
+        """把某个子进程发布的消息转发给其他所有子进程"""
+        while not self.stopping:
+            try:
+                index, message = self.event_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            for other, worker in list(self.workers.items()):
+                if other != index and worker["process"] is not None:
+                    worker["inbox"].put(message)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for index, worker in self.workers.items():
+            process = worker["process"]
+            if process is not None and not process.is_alive():
+                process.join()
+                lived = now - worker["started"]
+                print(f"[警告] 工作进程 {index} (pid {process.pid}) 已退出，退出码 {process.exitcode}，运行 {lived:.1f} 秒")
+                self._retire(worker["stats"])
+                if lived < self.min_uptime:
+                    worker["delay"] = min(self.max_restart_delay, max(1.0, worker["delay"] * 2))
+                else:
+                    worker["delay"] = 0.0
+                worker["process"] = None
+                worker["restart_at"] = now + worker["delay"]
+            if worker["process"] is None and now >= worker["restart_at"] and not self.stopping:
+                worker["restarts"] += 1
+                self._spawn(index)
+
+    def _retire(self, stats):
+        if not stats:
+            return
+        stats = dict(stats, active_connections=0, frames_per_sec=0)
+        self.retired = merge_snapshots([self.retired, stats])
+
+    def run_forever(self, on_tick=None, tick_interval=1.0):
+        """管理循环：收集统计、重启退出的进程；Ctrl+C或SIGTERM时停止所有子进程"""
+        signal.signal(signal.SIGTERM, _raise_interrupt)  # 子进程继承该处理，terminate()时也能正常收尾
+        self.start()
+        try:
+            while True:
+                self._collect_stats(tick_interval)
+                self._check_workers()
+                if on_tick is not None:
+                    on_tick()
+        except KeyboardInterrupt:
+            print("服务器停止")
+        finally:
+            self.stop()
+
+    def stop(self, timeout=5):
+        self.stopping = True
+        for worker in self.workers.values():
+            process = worker["process"]
+            if process is not None and process.is_alive():
+                process.terminate()
+        for worker in self.workers.values():
+            process = worker["process"]
+            if process is not None:
+                process.join(timeout)
+
+    def snapshot(self):
+        """合并所有进程（含已退出进程）的统计，并附上各进程状态"""
+        stats = merge_snapshots([self.retired] + [worker["stats"] for worker in self.workers.values()])
+        stats["workers"] = {
+            str(index): {
+                "pid": worker["process"].pid if worker["process"] is not None else 0,
+                "alive": int(worker["process"] is not None and worker["process"].is_alive()),
+                "restarts": worker["restarts"],
+                "active_connections": (worker["stats"] or {}).get("active_connections", 0)
+            }
+            for index, worker in self.workers.items()
+        }
+        return stats
+
+    def render_text(self):
+        return render_text(self.snapshot())
@@ -0,0 +1,181 @@
+import json
+import queue
+import threading
+import time
+
+# 可订阅的数据变更主题
+TOPICS = ("employee", "suggestion", "notification")
+EVENT_ACTIONS = ("insert", "update", "delete")
+MAX_EVENT_SIZE = 1024  # 事件只携带变更类型和ID，编码后超过该字节数视为非法
+
+
+class PubSubError(ValueError):
+    """订阅主题或事件内容不合法"""
+
+
+def check_topics(topics, allowed=TOPICS):
+    """校验订阅主题列表，返回去重后的主题列表"""
+    if not isinstance(topics, list) or not topics:
+        raise PubSubError("订阅主题应为非空列表")
+    unknown = [topic for topic in topics if topic not in allowed]
+    if unknown:
+        raise PubSubError(f"未知的订阅主题: {unknown}")
+    return list(dict.fromkeys(topics))
+
+
+def check_event(topic, event, allowed=TOPICS):
+    """校验发布的事件：{"action": insert/update/delete, "ids": [...], 其他少量字段}"""
+    if topic not in allowed:
+        raise PubSubError(f"未知的主题: {topic}")
+    if not isinstance(event, dict) or event.get("action") not in EVENT_ACTIONS:
+        raise PubSubError(f"事件应包含action（{'/'.join(EVENT_ACTIONS)}）")
+    if not isinstance(event.get("ids"), list):
+        raise PubSubError("事件应包含ids列表")
+    if len(json.dumps(event, ensure_ascii=False, default=str)) > MAX_EVENT_SIZE:
+        raise PubSubError(f"事件超过 {MAX_EVENT_SIZE} 字节")
+
+
+def publish_command(topic, event):
+    """发布请求中参与签名的command：主题加上事件的规范化JSON，服务器按收到的topic/event重建后比对，
+    签名因此同时覆盖主题和事件内容"""
+    return f"publish {topic} " + json.dumps(event, sort_keys=True, separators=(",", ":"),
+                                            ensure_ascii=False, default=str)
+
+
+class PubSubHub:
+    """数据变更事件的发布/订阅中心（线程安全）
+
+    - 每个连接以key登记一个send回调和订阅的主题；连接断开时调用unsubscribe(key)清除
+    - 会阻塞的send（线程模式的sendall）：每个订阅者一个有界队列和一个发送线程，
+      publish()只放入队列；某个订阅者不读数据时只有它自己的队列积压
+    - 不阻塞的send（asyncio模式交给事件循环）：publish()直接调用，send发现积压过多时抛出异常
+    - 队列已满时：发送线程卡在同一次send超过stall_timeout秒的订阅者被移除，否则只丢弃这条事件；
+      send出错的订阅者也被移除（客户端仍可手动刷新），都不影响其他订阅者
+    - 发布者自己的连接（client_id相同）不会收到自己发布的事件
+    - 多进程模式下设置forward，本进程发布的事件经管理进程转发给其他工作进程
+    """
+
+    def __init__(self, topics=TOPICS, subscriber_queue_size=1000, stall_timeout=5):
+        self.topics = tuple(topics)
+        self.subscriber_queue_size = subscriber_queue_size
+        self.stall_timeout = stall_timeout
+        self.forward = None  # forward(topic, event, source)
+        self._lock = threading.Lock()
+        # key -> {"topics", "send", "client_id", "queue"(不阻塞的send为None), "sending_since", "closed"}
+        self._subscribers = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def subscribe(self, key, topics, send, client_id=None, blocking=True):
+        with self._lock:
+            subscriber = self._subscribers.get(key)
+            if subscriber is None:
+                subscriber = self._subscribers[key] = {
+                    "topics": set(), "send": send, "client_id": client_id, "sending_since": None, "closed": False,
+                    "queue": queue.Queue(self.subscriber_queue_size) if blocking else None
+                }
+                if blocking:
+                    threading.Thread(target=self._deliver_loop, args=(key, subscriber),
+                                     name=f"PubSubDelivery-{key}", daemon=True).start()
+            subscriber["topics"].update(topics)
+            subscriber["client_id"] = client_id or subscriber["client_id"]
+            return sorted(subscriber["topics"])
+
+    def unsubscribe(self, key, topics=None):
+        """取消订阅；topics为None时取消该连接的全部订阅"""
+        with self._lock:
+            subscriber = self._subscribers.get(key)
+            if subscriber is None:
+                return
+            if topics is not None:
+                subscriber["topics"].difference_update(topics)
+            if topics is None or not subscriber["topics"]:
+                self._remove(key, subscriber)
+
+    def _remove(self, key, subscriber):
+        """移除订阅者并通知其发送线程退出（调用方持有锁）"""
+        if self._subscribers.get(key) is subscriber:
+            del self._subscribers[key]
+        subscriber["closed"] = True
+        if subscriber["queue"] is not None:
+            try:
+                subscriber["queue"].put_nowait(None)
+            except queue.Full:
+                pass  # 发送线程取到下一条时会看到closed
+
+    def _evict(self, key, subscriber, reason):
+        with self._lock:
+            if subscriber["closed"]:
+                return
+            self._remove(key, subscriber)
+            self.evicted += 1
+        print(f"[警告] 订阅者 {key} {reason}，已取消其订阅")
+
+    def publish(self, topic, event, source=None, forward=True):
+        """向订阅了topic的连接广播事件，返回本进程中接收事件的连接数"""
+        message = {"type": "event", "topic": topic, "event": event, "source": source, "timestamp": time.time()}
+        with self._lock:
+            self.published += 1
+            targets = [(key, subscriber) for key, subscriber in self._subscribers.items()
+                       if topic in subscriber["topics"] and not (source and subscriber["client_id"] == source)]
+        accepted = 0
+        for key, subscriber in targets:
+            if subscriber["queue"] is None:
+                try:
+                    subscriber["send"](message)
+                except Exception as e:
+                    self._evict(key, subscriber, f"推送失败({e})")
+                    continue
+                with self._lock:
+                    self.delivered += 1
+            else:
+                try:
+                    subscriber["queue"].put_nowait(message)
+                except queue.Full:
+                    sending_since = subscriber["sending_since"]
+                    if sending_since is not None and time.monotonic() - sending_since > self.stall_timeout:
+                        self._evict(key, subscriber, "长时间未读取推送")
+                    else:
+                        with self._lock:
+                            self.dropped += 1
+                    continue
+            accepted += 1
+        if forward and self.forward is not None:
+            self.forward(topic, event, source)
+        return accepted
+
+    def _deliver_loop(self, key, subscriber):
+        while True:
+            message = subscriber["queue"].get()
+            if message is None or subscriber["closed"]:
+                return
+            subscriber["sending_since"] = time.monotonic()
+            try:
+                subscriber["send"](message)
+            except Exception:
+                self._evict(key, subscriber, "连接已断开")
+                return
+            subscriber["sending_since"] = None
+            with self._lock:
+                self.delivered += 1
+
+    def stats(self):
+        with self._lock:
+            by_topic = {topic: 0 for topic in self.topics}
+            queued = 0
+            for subscriber in self._subscribers.values():
+                for topic in subscriber["topics"]:
+                    by_topic[topic] = by_topic.get(topic, 0) + 1
+                if subscriber["queue"] is not None:
+                    queued += subscriber["queue"].qsize()
+            return {
+                "subscribers": len(self._subscribers),
+                "by_topic": by_topic,
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "evicted": self.evicted,
+                "queued": queued
+            }
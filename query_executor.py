@@ -0,0 +1,121 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from db_connect import Database
+
+
+class _TaskSignals(QObject):
+    """QRunnable本身不能发信号，由该对象在工作线程中代发（跨线程自动排队到GUI线程）"""
+    finished = pyqtSignal(str, int, object)  # key, 代次, 查询结果
+    failed = pyqtSignal(str, int, str)  # key, 代次, 错误信息
+
+
+class QueryTask(QRunnable):
+    """在线程池中执行的查询任务，使用从连接池借来的独立连接"""
+
+    def __init__(self, key, generation, func, args, signals):
+        super().__init__()
+        self.setAutoDelete(False)  # 由执行器持有引用，便于tryTake撤销
+        self.key = key
+        self.generation = generation
+        self.func = func
+        self.args = args
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            return
+        try:
+            with Database() as db:
+                if not db.connect_success:
+                    raise RuntimeError("数据库未连接")
+                result = self.func(db, *self.args)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(self.key, self.generation, str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self.key, self.generation, result)
+
+
+class QueryExecutor(QObject):
+    """后台查询执行器
+
+    同一key同时只保留最新一次查询：新提交会撤销尚未开始的旧任务，
+    已在执行的旧任务结果到达后直接丢弃，回调始终在GUI线程中执行。
+    """
+    loading_changed = pyqtSignal(str, bool)  # key, 是否正在加载
+
+    def __init__(self, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max_threads)
+        self.signals = _TaskSignals(self)
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+        self._generation = {}  # key -> 最新代次
+        self._pending = {}  # key -> (task, on_success, on_error)
+
+    def submit(self, key, func, *args, on_success=None, on_error=None):
+        """提交查询：func(db, *args)在工作线程执行，返回值传给on_success"""
+        was_loading = key in self._pending
+        self._cancel_task(key)
+
+        generation = self._generation.get(key, 0) + 1
+        self._generation[key] = generation
+        task = QueryTask(key, generation, func, args, self.signals)
+        self._pending[key] = (task, on_success, on_error)
+        self.thread_pool.start(task)
+        if not was_loading:
+            self.loading_changed.emit(key, True)
+        return generation
+
+    def is_loading(self, key=None):
+        if key is None:
+            return bool(self._pending)
+        return key in self._pending
+
+    def cancel(self, key):
+        """撤销指定key的查询（已在执行的查询结果将被丢弃）"""
+        if self._cancel_task(key):
+            self.loading_changed.emit(key, False)
+
+    def cancel_all(self):
+        for key in list(self._pending):
+            self.cancel(key)
+
+    def shutdown(self, timeout_ms=2000):
+        """撤销全部查询并等待正在执行的任务结束"""
+        self.cancel_all()
+        self.thread_pool.waitForDone(timeout_ms)
+
+    def _cancel_task(self, key):
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return False
+        task = entry[0]
+        task.cancelled = True
+        self.thread_pool.tryTake(task)  # 尚未开始的任务直接移出队列
+        return True
+
+    def _take_current(self, key, generation):
+        entry = self._pending.get(key)
+        if entry is None or entry[0].generation != generation:
+            return None  # 已被撤销或被新查询取代
+        del self._pending[key]
+        self.loading_changed.emit(key, False)
+        return entry
+
+    def _on_finished(self, key, generation, result):
+        entry = self._take_current(key, generation)
+        if entry and entry[1]:
+            entry[1](result)
+
+    def _on_failed(self, key, generation, message):
+        entry = self._take_current(key, generation)
+        if entry is None:
+            return
+        if entry[2]:
+            entry[2](message)
+        else:
+            print(f"后台查询失败 [{key}]: {message}")
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict
+
+# 按命令名单独限速的命令：(每秒令牌数, 桶容量)
+DEFAULT_COMMAND_RATES = {
+    "ping": (1, 3),
+    "top": (0.5, 2),
+}
+
+
+class RateLimitedError(Exception):
+    """请求超过限速，retry_after为建议的重试等待秒数"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_rate_options(values, base=None):
+    """解析形如 "ping=1/3"（每秒1个、桶容量3）或 "ping=2" 的命令限速配置（0表示不限速）"""
+    rates = dict(DEFAULT_COMMAND_RATES if base is None else base)
+    for value in values or []:
+        name, sep, spec = value.partition("=")
+        if not sep:
+            raise ValueError(f"限速格式应为 命令=每秒次数[/桶容量]: {value}")
+        rate, _, burst = spec.partition("/")
+        rate = float(rate)
+        rates[name.strip().lower()] = (rate, float(burst) if burst else max(1.0, rate))
+    return {name: limit for name, limit in rates.items() if limit[0] > 0}
+
+
+class TokenBucket:
+    """令牌桶：每秒补充rate个令牌，最多攒burst个；取不到令牌时给出需要等待的秒数"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def acquire(self, now):
+        """取一个令牌，返回 (是否成功, 需要等待的秒数)"""
+        # now可能在桶创建之前取得，经过时间不能为负
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class RateLimiter:
+    """按客户端身份限速（线程安全）
+
+    - 每个客户端一个令牌桶（client_rate/client_burst）
+    - 可选（host_rate>0时启用）：同一主机的所有客户端另外共用一个令牌桶（host_rate/host_burst），
+      不断更换标识也无法超过主机的总额度；默认关闭，以免同一主机/NAT后的多个正常客户端互相挤占
+    - command_rates中列出的命令，每个客户端另有一个该命令的令牌桶
+    - 长时间不活动的客户端/主机的桶会被淘汰，各最多保留max_clients个
+    """
+
+    def __init__(self, client_rate=10, client_burst=20, command_rates=None, max_clients=10000,
+                 host_rate=0, host_burst=100):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.command_rates = dict(DEFAULT_COMMAND_RATES if command_rates is None else command_rates)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # 客户端 -> {None: 客户端桶, 命令名: 命令桶}
+        self._host_buckets = OrderedDict()  # 主机 -> 主机桶
+        self.allowed = 0
+        self.throttled = 0
+
+    @staticmethod
+    def _lookup(table, key, max_entries, factory):
+        """取出key对应的条目（不存在时用factory创建），并按最近使用排序、淘汰最久未用的条目"""
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = factory()
+            while len(table) > max_entries:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+        return entry
+
+    def check(self, client_key, command_name=None, host=None):
+        """通过时返回None，超过限速时抛出RateLimitedError；host为客户端所在主机（同一主机共用主机额度）"""
+        use_host = host is not None and self.host_rate > 0
+        if self.client_rate <= 0 and not use_host and command_name not in self.command_rates:
+            return
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._lookup(self._buckets, client_key, self.max_clients, dict)
+            acquired = []  # 已取得令牌的桶，后面的桶拒绝时退还，被拒绝的请求不占用额度
+
+            def take(bucket, message):
+                ok, retry_after = bucket.acquire(now)
+                if not ok:
+                    for earlier in acquired:
+                        earlier.refund()
+                    self.throttled += 1
+                    raise RateLimitedError(message.format(retry_after=retry_after), retry_after)
+                acquired.append(bucket)
+
+            if self.client_rate > 0:
+                client_bucket = buckets.get(None)
+                if client_bucket is None:
+                    client_bucket = buckets[None] = TokenBucket(self.client_rate, self.client_burst)
+                take(client_bucket, "请求过于频繁，请 {retry_after:.1f} 秒后重试")
+
+            if use_host:
+                host_bucket = self._lookup(self._host_buckets, host, self.max_clients,
+                                           lambda: TokenBucket(self.host_rate, self.host_burst))
+                take(host_bucket, "该主机的请求过于频繁，请 {retry_after:.1f} 秒后重试")
+
+            if command_name in self.command_rates:
+                command_bucket = buckets.get(command_name)
+                if command_bucket is None:
+                    command_bucket = buckets[command_name] = TokenBucket(*self.command_rates[command_name])
+                take(command_bucket, f"命令 {command_name} 调用过于频繁，请 {{retry_after:.1f}} 秒后重试")
+            self.allowed += 1
+
+    def stats(self):
+        with self._lock:
+            return {"allowed": self.allowed, "throttled": self.throttled, "clients": len(self._buckets),
+                    "hosts": len(self._host_buckets)}
+
+
+class InflightLimiter:
+    """单个连接的读端背压（线程模式）：已接收但回复尚未写出的命令达到high_water时，
+    读线程暂停读取该连接，直到降到low_water以下再继续"""
+
+    def __init__(self, high_water=8, low_water=None):
+        self.high_water = high_water
+        self.low_water = high_water // 2 if low_water is None else low_water
+        self._cond = threading.Condition()
+        self.inflight = 0
+        self.pauses = 0
+
+    def add(self):
+        with self._cond:
+            self.inflight += 1
+
+    def done(self):
+        with self._cond:
+            self.inflight -= 1
+            if self.inflight <= self.low_water:
+                self._cond.notify_all()
+
+    def wait(self):
+        """在读取下一帧之前调用：积压过多时阻塞"""
+        with self._cond:
+            if self.high_water <= 0 or self.inflight < self.high_water:
+                return
+            self.pauses += 1
+            while self.inflight > self.low_water:
+                self._cond.wait()
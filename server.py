@@ -1,61 +1,53 @@
+import argparse
+import asyncio
+import functools
 import threading
 import socket
-import json
 import time
-import hmac
-import hashlib
+import codecs
+import locale
+import multiprocessing
+import os
 import subprocess
 from datetime import datetime
-import platform
+
+from codec import JSON_CODEC, available_encodings, decode_frame, negotiate
+from command_cache import CommandCache, parse_ttl_options
+from command_runner import SAFE_COMMANDS, CommandRunner
+from command_scheduler import CommandScheduler, SchedulerBusyError
+from prefork import PreforkSupervisor, reuse_port_supported
+from pubsub import PubSubError, PubSubHub, check_event, check_topics, publish_command
+from rate_limit import InflightLimiter, RateLimitedError, RateLimiter, parse_rate_options
+from server_metrics import ServerMetrics, start_metrics_http
+from signing import ReplayGuard, SigningContext
+from framing import (COMPRESSION_METHODS, HEADER_SIZE, MAX_FRAME_SIZE, FrameCompressor, FrameDecodeError,
+                     FrameReader, FrameTooLargeError, FrameWriter, decompress_payload, encode_frame, parse_header,
+                     set_nodelay)
 
 
 def verify_hmac_signature(data, signature, secret_key):
-    """验证HMAC签名"""
-    cmd = data.get("command", "")
-    timestamp = data.get("timestamp", "")
-    data_to_sign = f"{cmd}|{timestamp}".encode('utf-8')
-    expected_signature = hmac.new(
-        secret_key.encode('utf-8'),
-        data_to_sign,
-        hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(signature, expected_signature)
+    """验证HMAC签名（一次性调用；连接处理中使用预先创建的SigningContext）"""
+    return SigningContext(secret_key).verify(data, signature)
+
+
+COMMAND_TIMEOUT = 10  # 命令执行超时(秒)
+STREAM_CHUNK_SIZE = 4096  # 流式输出每次读取的字节数
+PUSH_BUFFER_LIMIT = 1024 * 1024  # asyncio模式下连接发送缓冲超过该字节数时不再推送事件
+COMMAND_RUNNER = CommandRunner(SAFE_COMMANDS)  # 启动时解析好白名单命令的路径
+
+
+def check_command(command):
+    """检查命令是否在白名单中，不允许时返回错误结果，否则返回None"""
+    return COMMAND_RUNNER.check(command)
 
 
 def execute_command(command):
     """安全执行命令并返回结果"""
     try:
-        # 命令白名单（仅允许执行安全命令）
-        safe_commands = ["ls", "dir", "echo", "date", "time", "whoami", "ping", "ps", "top", "df"]
-
-        # 检查命令是否在白名单中（简化实现，实际应更严格）
-        cmd_parts = command.split()
-        if not cmd_parts:
-            return {"status": "error", "message": "空命令"}
-
-        cmd = cmd_parts[0].lower()
-        if cmd not in safe_commands:
-            return {"status": "error", "message": "禁止执行该命令"}
-
-        # 根据操作系统选择合适的命令执行方式
-        if platform.system() == "Windows":
-            if cmd == "ls":
-                cmd = "dir"  # Windows中ls等价于dir
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10  # 命令执行超时
-            )
-        else:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+        rejected = check_command(command)
+        if rejected:
+            return rejected
+        result = COMMAND_RUNNER.run(command, COMMAND_TIMEOUT)
 
         # 构建执行结果
         if result.returncode == 0:
@@ -63,14 +55,16 @@ def execute_command(command):
                 "status": "success",
                 "message": "命令执行成功",
                 "output": result.stdout,
-                "error": result.stderr
+                "error": result.stderr,
+                "returncode": result.returncode
             }
         else:
             return {
                 "status": "error",
                 "message": f"命令执行失败 (返回码: {result.returncode})",
                 "output": result.stdout,
-                "error": result.stderr
+                "error": result.stderr,
+                "returncode": result.returncode
             }
 
     except subprocess.TimeoutExpired:
@@ -79,128 +73,446 @@ def execute_command(command):
         return {"status": "error", "message": f"执行错误: {str(e)}"}
 
 
-def handle_client(client_socket, client_address, secret_key="personnel_management_system_key"):
-    """处理客户端连接"""
-    print(f"新客户端连接: {client_address}")
+def _pump_pipe(pipe, stream, emit, on_emit_error):
+    """持续读取子进程的一个输出管道，解码后逐块调用emit(stream, text)"""
+    decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors='replace')
+    emitting = True
+    while True:
+        data = pipe.read1(STREAM_CHUNK_SIZE)
+        text = decoder.decode(data, final=not data)
+        if text and emitting:
+            try:
+                emit(stream, text)
+            except Exception as e:
+                emitting = False  # 客户端已断开，只需把管道读空
+                on_emit_error(e)
+        if not data:
+            break
+    pipe.close()
+
+
+def stream_command(command, emit):
+    """流式执行命令：边读子进程的stdout/stderr边调用emit(stream, text)，返回执行结果（不含输出）"""
+    rejected = check_command(command)
+    if rejected:
+        return rejected
+
     try:
-        while True:
-            # 接收数据长度前缀
-            length_bytes = client_socket.recv(4)
-            if not length_bytes:
-                break
+        process = COMMAND_RUNNER.popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        return {"status": "error", "message": f"执行错误: {str(e)}"}
+
+    timed_out = threading.Event()
+
+    def kill(reason=None):
+        if reason is None:
+            timed_out.set()
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+    timer = threading.Timer(COMMAND_TIMEOUT, kill)
+    timer.start()
+    try:
+        stderr_reader = threading.Thread(target=_pump_pipe, args=(process.stderr, "stderr", emit, kill), daemon=True)
+        stderr_reader.start()
+        _pump_pipe(process.stdout, "stdout", emit, kill)
+        stderr_reader.join()
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+
+    if timed_out.is_set():
+        return {"status": "error", "message": "命令执行超时", "returncode": returncode}
+    if returncode == 0:
+        return {"status": "success", "message": "命令执行成功", "returncode": returncode}
+    return {"status": "error", "message": f"命令执行失败 (返回码: {returncode})", "returncode": returncode}
+
+
+def run_command(command_obj, emit, cache=None):
+    """按请求方式执行命令：stream为真时流式输出，否则一次性返回全部输出
+
+    可缓存的命令（见command_cache）经cache执行：结果短时复用，并发的相同命令只起一个进程；
+    流式请求时把完整输出作为command_chunk补发。
+    """
+    if cache is not None and cache.ttl_for(command_obj["command"]):
+        cmd_result = cache.get_or_run(command_obj["command"], execute_command)
+        if not command_obj.get("stream"):
+            return cmd_result
+        for stream in ("stdout", "stderr"):
+            text = cmd_result.pop("output" if stream == "stdout" else "error", "")
+            if text:
+                emit(stream, text)
+        return cmd_result
+    if command_obj.get("stream"):
+        return stream_command(command_obj["command"], emit)
+    return execute_command(command_obj["command"])
+
+
+class ServerContext:
+    """所有连接共享的服务器组件：签名、重放保护、限速、命令调度、帧压缩、数据变更推送与运行指标"""
+
+    def __init__(self, secret_key="personnel_management_system_key", scheduler=None, compressor=None,
+                 replay_guard=None, metrics=None, cache=None, rate_limiter=None, max_inflight=8, pubsub=None,
+                 require_signature=True):
+        self.signer = SigningContext(secret_key)
+        # 命令须签名：未签名的命令帧没有nonce/时间戳校验，去掉签名就能重放
+        self.require_signature = require_signature
+        self.scheduler = scheduler or CommandScheduler()
+        self.compressor = compressor or FrameCompressor()
+        self.replay_guard = replay_guard or ReplayGuard()
+        self.metrics = metrics or ServerMetrics()
+        self.cache = cache or CommandCache(runner=COMMAND_RUNNER)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.pubsub = pubsub or PubSubHub()
+        self.max_inflight = max_inflight  # 单个连接未回复命令数的高水位，达到后暂停读取（0表示不限制）
+        self.metrics.add_source("scheduler", self.scheduler.stats)
+        self.metrics.add_source("compression", self.compressor.stats)
+        self.metrics.add_source("command_cache", self.cache.stats)
+        self.metrics.add_source("rate_limit", self.rate_limiter.stats)
+        self.metrics.add_source("pubsub", self.pubsub.stats)
+
+    def submit_command(self, client_key, command_obj, emit):
+        """把命令交给调度器，返回Future；超过限速时抛出RateLimitedError，排队已满时抛出SchedulerBusyError"""
+        # 客户端身份：签名通过的请求按 client_id@地址 分开计算（同一地址上的多个客户端），
+        # 未签名请求的client_id可以随意伪造，只按地址计算
+        client_id = command_obj.get("client_id")
+        identity = f"{client_id}@{client_key[0]}" if client_id and command_obj.get("verified") else client_key[0]
+        try:
+            self.rate_limiter.check(identity, command_obj["command"].split()[0].lower(), host=client_key[0])
+        except RateLimitedError:
+            self.metrics.command_throttled()
+            raise
+        try:
+            return self.scheduler.submit(client_key, self._run_timed, command_obj, emit, time.monotonic())
+        except SchedulerBusyError:
+            self.metrics.command_rejected()
+            raise
+
+    def _run_timed(self, command_obj, emit, submitted_at):
+        started_at = time.monotonic()
+        cmd_result = run_command(command_obj, emit, self.cache)
+        # 只按白名单命令名统计，其他命令都归入rejected，避免客户端随意发送的命令名撑大统计
+        name = COMMAND_RUNNER.name_of(command_obj["command"]) or "rejected"
+        self.metrics.command_finished(name, started_at - submitted_at, time.monotonic() - started_at,
+                                      cmd_result["status"])
+        return cmd_result
+
+    def log_stats(self):
+        log_scheduler_stats(self.scheduler)
+        log_compression_stats(self.compressor)
+        log_cache_stats(self.cache)
+
+
+def handle_message(received_data, context):
+    """处理一帧请求（解析、心跳、验签），返回 (响应, 待执行的命令消息)
+
+    待执行的命令消息不为None时表示这是合法的命令请求，调用方用 run_command 执行后
+    再用 build_command_response 生成响应（命令执行较慢，由调用方决定在哪个线程执行）。
+    请求带有request_id时，响应原样带回，客户端据此匹配乱序返回的响应。
+    """
+    try:
+        message_obj = decode_frame(received_data)
+        if not isinstance(message_obj, dict):
+            raise ValueError("消息不是对象")
+    except ValueError:
+        raw_message = str(received_data, 'utf-8', 'ignore')
+        print(f"收到非JSON数据: {raw_message}")
+        response_data = {
+            "type": "legacy_response",
+            "raw_message": raw_message,
+            "timestamp": time.time()
+        }
+        return response_data, None
+
+    response_data, command_obj = dispatch_message(message_obj, context)
+    if response_data is not None and message_obj.get("request_id") is not None:
+        response_data["request_id"] = message_obj["request_id"]
+    return response_data, command_obj
+
+
+def dispatch_message(message_obj, context):
+    """按消息类型处理已解析的请求，返回值同 handle_message"""
+    # 编码/压缩协商：回复hello_ack（仍按原方式发送），之后本连接改用协商结果
+    if message_obj.get("type") == "hello":
+        compression = next((method for method in message_obj.get("compression") or []
+                            if method in COMPRESSION_METHODS), None)
+        return {
+            "type": "hello_ack",
+            "encoding": negotiate(message_obj.get("encodings")).name,
+            "encodings": available_encodings(),
+            "compression": compression
+        }, None
+
+    # 处理心跳包
+    if message_obj.get("type") == "heartbeat":
+        return {"type": "heartbeat_ack", "timestamp": time.time()}, None
+
+    # 验证安全签名
+    verified = False
+    if "signature" in message_obj:
+        signature = message_obj.pop("signature")
+        sign_type = message_obj.get("sign_type", "")
+
+        if sign_type == "hmac-sha256":
+            is_valid = context.signer.verify(message_obj, signature)
+
+            if not is_valid:
+                context.metrics.signature_failed()
+                print(f"[警告] 无效签名: {message_obj}")
+                response = {
+                    "type": "error",
+                    "code": 401,
+                    "message": "签名验证失败"
+                }
+                return response, None
+
+            # 重放保护：时间戳须在窗口内，nonce不能重复
+            accepted, reason = context.replay_guard.check(message_obj.get("nonce"), message_obj.get("timestamp"))
+            if not accepted:
+                context.metrics.replay_rejected()
+                print(f"[警告] 拒绝可能的重放请求({reason}): {message_obj}")
+                return {"type": "error", "code": 401, "message": f"请求已失效: {reason}"}, None
+            verified = True
+        else:
+            print(f"[警告] 不支持的签名类型: {sign_type}")
+
+    # 运行统计（仅限签名请求）
+    if message_obj.get("type") == "stats":
+        if not verified:
+            return {"type": "error", "code": 401, "message": "查询统计信息需要签名"}, None
+        return {"type": "stats", "timestamp": time.time(), "stats": context.metrics.snapshot()}, None
+
+    # 数据变更推送：订阅/取消订阅由连接处理函数根据ack登记，发布需要签名
+    if message_obj.get("type") in ("subscribe", "unsubscribe"):
+        try:
+            topics = check_topics(message_obj.get("topics"), context.pubsub.topics)
+        except PubSubError as e:
+            return {"type": "error", "code": 400, "message": str(e)}, None
+        return {"type": f"{message_obj['type']}_ack", "topics": topics,
+                "client_id": message_obj.get("client_id")}, None
+
+    if message_obj.get("type") == "publish":
+        if not verified:
+            return {"type": "error", "code": 401, "message": "发布数据变更需要签名"}, None
+        topic, event = message_obj.get("topic"), message_obj.get("event")
+        try:
+            check_event(topic, event, context.pubsub.topics)
+        except PubSubError as e:
+            return {"type": "error", "code": 400, "message": str(e)}, None
+        # 签名只覆盖command，topic/event须与command中的内容一致，否则可能被中途替换
+        if message_obj.get("command") != publish_command(topic, event):
+            context.metrics.signature_failed()
+            return {"type": "error", "code": 401, "message": "发布内容与签名不一致"}, None
+        delivered = context.pubsub.publish(topic, event, source=message_obj.get("client_id"))
+        return {"type": "publish_ack", "topic": topic, "delivered": delivered}, None
+
+    print(f"收到命令: {message_obj.get('command', '未知命令')}")
+
+    # 执行命令（仅处理command类型消息）
+    if message_obj.get("type") == "command":
+        cmd = message_obj.get("command", "")
+        if context.require_signature and not verified:
+            context.metrics.signature_failed()
+            print(f"[警告] 拒绝未签名的命令: {message_obj}")
+            return {"type": "error", "code": 401, "message": "执行命令需要签名"}, None
+        if isinstance(cmd, str) and cmd.strip():  # 限速和调度按命令名处理，先排除空白或非字符串命令
+            message_obj["verified"] = verified  # 覆盖客户端可能自带的同名字段
+            return None, message_obj
+        response_data = {
+            "type": "error",
+            "message": "命令为空"
+        }
+    else:
+        response_data = {
+            "type": "response",
+            "timestamp": datetime.now().isoformat(),
+            "status": "success"
+        }
+        if message_obj.get("echo"):  # 仅在请求要求时回显原消息
+            response_data["received"] = message_obj
+    return response_data, None
+
+
+def build_command_response(command_obj, cmd_result):
+    """根据命令执行结果构建响应（流式请求返回command_done，输出已通过command_chunk发送）"""
+    response = {
+        "type": "command_response",
+        "command": command_obj["command"],
+        "timestamp": datetime.now().isoformat(),
+        "status": cmd_result["status"],
+        "message": cmd_result["message"]
+    }
+    if command_obj.get("request_id") is not None:
+        response["request_id"] = command_obj["request_id"]
+    if command_obj.get("stream"):
+        response["type"] = "command_done"
+        response["returncode"] = cmd_result.get("returncode")
+    else:
+        response["output"] = cmd_result.get("output", "")
+        response["error"] = cmd_result.get("error", "")
+    if "code" in cmd_result:
+        response["code"] = cmd_result["code"]
+    if "retry_after" in cmd_result:
+        response["retry_after"] = cmd_result["retry_after"]
+    return response
+
+
+def finish_command(command_obj, future):
+    """从调度器返回的Future中取出执行结果并构建响应"""
+    try:
+        cmd_result = future.result()
+    except Exception as e:
+        cmd_result = {"status": "error", "message": f"执行错误: {str(e)}"}
+    return build_command_response(command_obj, cmd_result)
+
+
+def build_command_chunk(command_obj, stream, data):
+    """流式输出的一段数据"""
+    return {
+        "type": "command_chunk",
+        "request_id": command_obj.get("request_id"),
+        "stream": stream,
+        "data": data
+    }
+
+
+def busy_result(reason):
+    """命令排队已满时的繁忙结果"""
+    return {"status": "busy", "code": 503, "message": f"服务器繁忙，请稍后重试: {reason}"}
+
+
+def throttled_result(error):
+    """超过限速时的结果，retry_after为建议的重试等待秒数"""
+    return {"status": "throttled", "code": 429, "message": str(error), "retry_after": round(error.retry_after, 3)}
+
+
+def log_compression_stats(compressor):
+    stats = compressor.stats()
+    print(f"压缩统计: 压缩帧 {stats['frames_compressed']}，"
+          f"{stats['bytes_before']} -> {stats['bytes_after']} 字节，节省 {stats['bytes_saved']} 字节")
+
+
+def log_scheduler_stats(scheduler):
+    """打印命令调度统计（排队等待时间与执行时间）"""
+    stats = scheduler.stats()
+    print(f"命令统计: 完成 {stats['completed']}，失败 {stats['failed']}，拒绝 {stats['rejected']}，"
+          f"平均等待 {stats['wait_avg']:.3f}s(最大 {stats['wait_max']:.3f}s)，"
+          f"平均执行 {stats['run_avg']:.3f}s(最大 {stats['run_max']:.3f}s)")
+
+
+def log_cache_stats(cache):
+    """打印命令结果缓存统计"""
+    stats = cache.stats()
+    print(f"缓存统计: 命中 {stats['hits']}，合并 {stats['coalesced']}，执行 {stats['misses']}，"
+          f"命中率 {stats['hit_ratio'] * 100:.1f}%")
+
+
+def encode_response(response_data, codec=JSON_CODEC, compressor=None):
+    """把响应编码为带4字节长度前缀的帧（协商了压缩时，较大的负载会被压缩）"""
+    return encode_frame(codec.encode(response_data), compressor)
+
+
+def handle_client(client_socket, client_address, context=None):
+    """处理客户端连接（线程模式，每个连接一个线程）"""
+    print(f"新客户端连接: {client_address}")
+    context = context or ServerContext()
+    metrics = context.metrics
+    metrics.connection_opened()
+    set_nodelay(client_socket)
+    frame_writer = FrameWriter(client_socket)  # 流式输出时命令线程与本线程都会发送，同时到达的帧合并写出
+
+    codec = JSON_CODEC  # 收到hello后改为协商出的编码
+    frame_compressor = None  # 协商了压缩后使用服务器共享的compressor
+
+    def send_frame(response_data):
+        frame = encode_response(response_data, codec, frame_compressor)
+        frame_writer.send(frame)
+        metrics.frame_sent(len(frame))
 
-            data_length = int.from_bytes(length_bytes, byteorder='big')
+    inflight = InflightLimiter(context.max_inflight)  # 回复积压过多时暂停读取该连接
 
-            # 接收完整数据
-            received_data = b''
-            while len(received_data) < data_length:
-                chunk = client_socket.recv(min(1024, data_length - len(received_data)))
-                if not chunk:
-                    break
-                received_data += chunk
+    def reply(command_obj, future):
+        # 在命令线程中调用：命令完成后立即回复，不必等待同一连接上更早的命令
+        try:
+            send_frame(finish_command(command_obj, future))
+        except OSError:
+            pass  # 客户端已断开
+        finally:
+            inflight.done()
+
+    frame_reader = FrameReader(client_socket)
+    try:
+        while True:
+            pauses = inflight.pauses
+            inflight.wait()
+            if inflight.pauses != pauses:
+                metrics.read_paused()
 
-            if not received_data:
+            # 接收完整的一帧（对端关闭时返回None）
+            received_data = frame_reader.read_frame()
+            if received_data is None:
                 break
+            metrics.frame_received(frame_reader.last_frame_size)
 
-            try:
-                message = received_data.decode('utf-8')
-                message_obj = json.loads(message)
-
-                # 处理心跳包
-                if message_obj.get("type") == "heartbeat":
-                    response = {"type": "heartbeat_ack", "timestamp": time.time()}
-                    json_response = json.dumps(response).encode('utf-8')
-                    client_socket.sendall(len(json_response).to_bytes(4, byteorder='big'))
-                    client_socket.sendall(json_response)
-                    continue
+            response_data, command_obj = handle_message(received_data, context)
+            if command_obj is not None:
+                def emit(stream, data, command_obj=command_obj):
+                    send_frame(build_command_chunk(command_obj, stream, data))
 
-                # 验证安全签名
-                if "signature" in message_obj:
-                    signature = message_obj.pop("signature")
-                    sign_type = message_obj.get("sign_type", "")
-
-                    if sign_type == "hmac-sha256":
-                        is_valid = verify_hmac_signature(
-                            message_obj,
-                            signature,
-                            secret_key
-                        )
-
-                        if not is_valid:
-                            print(f"[警告] 无效签名: {message_obj}")
-                            response = {
-                                "type": "error",
-                                "code": 401,
-                                "message": "签名验证失败"
-                            }
-                            json_response = json.dumps(response).encode('utf-8')
-                            client_socket.sendall(len(json_response).to_bytes(4, byteorder='big'))
-                            client_socket.sendall(json_response)
-                            continue
-                    else:
-                        print(f"[警告] 不支持的签名类型: {sign_type}")
-
-                print(f"收到命令: {message_obj.get('command', '未知命令')}")
-
-                # 执行命令（仅处理command类型消息）
-                if message_obj.get("type") == "command":
-                    cmd = message_obj.get("command", "")
-                    if cmd:
-                        # 执行命令并获取结果
-                        cmd_result = execute_command(cmd)
-
-                        # 构建响应
-                        response_data = {
-                            "type": "command_response",
-                            "command": cmd,
-                            "timestamp": datetime.now().isoformat(),
-                            "status": cmd_result["status"],
-                            "message": cmd_result["message"],
-                            "output": cmd_result.get("output", ""),
-                            "error": cmd_result.get("error", "")
-                        }
-                    else:
-                        response_data = {
-                            "type": "error",
-                            "message": "命令为空"
-                        }
+                # 交给调度器执行，本线程继续读取后续请求，结果由命令线程乱序回复
+                inflight.add()
+                try:
+                    future = context.submit_command(client_address, command_obj, emit)
+                except RateLimitedError as e:
+                    inflight.done()
+                    response_data = build_command_response(command_obj, throttled_result(e))
+                except SchedulerBusyError as e:
+                    inflight.done()
+                    response_data = build_command_response(command_obj, busy_result(e))
                 else:
-                    response_data = {
-                        "type": "response",
-                        "received": message_obj,
-                        "timestamp": datetime.now().isoformat(),
-                        "status": "success"
-                    }
-
-                # 发送响应
-                json_response = json.dumps(response_data).encode('utf-8')
-                client_socket.sendall(len(json_response).to_bytes(4, byteorder='big'))
-                client_socket.sendall(json_response)
-
-            except json.JSONDecodeError:
-                print(f"收到非JSON数据: {received_data.decode('utf-8', errors='ignore')}")
-                response_data = {
-                    "type": "legacy_response",
-                    "raw_message": received_data.decode('utf-8', errors='ignore'),
-                    "timestamp": time.time()
-                }
-                json_response = json.dumps(response_data).encode('utf-8')
-                client_socket.sendall(len(json_response).to_bytes(4, byteorder='big'))
-                client_socket.sendall(json_response)
+                    future.add_done_callback(functools.partial(reply, command_obj))
+                    continue
 
+            # 发送响应
+            send_frame(response_data)
+            if response_data.get("type") == "hello_ack":
+                codec = negotiate([response_data["encoding"]])
+                frame_compressor = context.compressor if response_data["compression"] else None
+            elif response_data.get("type") == "subscribe_ack":
+                context.pubsub.subscribe(client_address, response_data["topics"], send_frame,
+                                         response_data["client_id"])
+            elif response_data.get("type") == "unsubscribe_ack":
+                context.pubsub.unsubscribe(client_address, response_data["topics"])
+
+    except (FrameTooLargeError, FrameDecodeError) as e:
+        print(f"[警告] {client_address} {e}，断开连接")
     except Exception as e:
         print(f"客户端处理错误: {e}")
     finally:
+        context.pubsub.unsubscribe(client_address)
         client_socket.close()
+        metrics.connection_closed()
         print(f"客户端断开: {client_address}")
 
 
-def start_server(host='0.0.0.0', port=5555, secret_key="personnel_management_system_key"):
-    """启动服务器"""
+def create_listen_socket(host, port, backlog=128, reuse_port=False):
+    """创建监听socket；reuse_port为True时设置SO_REUSEPORT，多个进程可各自监听同一端口，由内核分配连接"""
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     server.bind((host, port))
-    server.listen(5)
+    server.listen(backlog)
+    return server
+
+
+def start_server(host='0.0.0.0', port=5555, secret_key="personnel_management_system_key", backlog=128,
+                 context=None, sock=None):
+    """启动服务器（线程模式），传入sock时直接使用这个已监听的socket"""
+    context = context or ServerContext(secret_key)
+    server = sock or create_listen_socket(host, port, backlog)
     print(f"服务器启动，监听 {host}:{port}")
 
     try:
@@ -208,7 +520,7 @@ def start_server(host='0.0.0.0', port=5555, secret_key="personnel_management_sys
             client_socket, client_address = server.accept()
             client_thread = threading.Thread(
                 target=handle_client,
-                args=(client_socket, client_address, secret_key),
+                args=(client_socket, client_address, context),
                 daemon=True
             )
             client_thread.start()
@@ -216,7 +528,290 @@ def start_server(host='0.0.0.0', port=5555, secret_key="personnel_management_sys
         print("服务器停止")
     finally:
         server.close()
+        context.log_stats()
+
+
+async def handle_client_async(reader, writer, context, idle_timeout):
+    """处理客户端连接（asyncio模式），命令交给调度器执行"""
+    client_address = writer.get_extra_info('peername')
+    print(f"新客户端连接: {client_address}")
+    metrics = context.metrics
+    metrics.connection_opened()
+    loop = asyncio.get_running_loop()
+    drain_lock = asyncio.Lock()  # 旧版本Python不允许多个协程同时drain
+
+    codec = JSON_CODEC  # 收到hello后改为协商出的编码
+    frame_compressor = None  # 协商了压缩后使用服务器共享的compressor
+
+    async def send_frame(response_data):
+        # write()同步追加整帧到传输层缓冲区，帧不会交错；缓冲区中的多帧由事件循环合并写出
+        frame = encode_response(response_data, codec, frame_compressor)
+        writer.write(frame)
+        metrics.frame_sent(len(frame))
+        async with drain_lock:
+            await writer.drain()
+
+    def emit(command_obj, stream, data):
+        # 在命令线程中调用：等待帧写入（含drain）完成，输出过快时自然限速
+        chunk = build_command_chunk(command_obj, stream, data)
+        asyncio.run_coroutine_threadsafe(send_frame(chunk), loop).result(COMMAND_TIMEOUT)
+
+    def push_event(message):
+        # 由发布者所在线程调用：交给事件循环发送，不等待完成；对端长时间不读时抛出异常，由推送中心移除订阅
+        if writer.transport.get_write_buffer_size() > PUSH_BUFFER_LIMIT:
+            raise BufferError("发送缓冲区积压过多")
+        asyncio.run_coroutine_threadsafe(send_frame(message), loop)
+
+    async def reply(command_obj, future):
+        # 每个命令一个协程等待结果，完成即回复，同一连接上的命令互不阻塞
+        await asyncio.wait([asyncio.wrap_future(future)])
+        try:
+            await send_frame(finish_command(command_obj, future))
+        except Exception:
+            pass  # 客户端已断开
+
+    pending_replies = set()
+    try:
+        while True:
+            # 读端背压：未回复的命令达到高水位时暂停读取，降到一半以下再继续
+            if 0 < context.max_inflight <= len(pending_replies):
+                metrics.read_paused()
+                while sum(not task.done() for task in pending_replies) > context.max_inflight // 2:
+                    await asyncio.wait(pending_replies, return_when=asyncio.FIRST_COMPLETED)
+
+            # 接收数据长度前缀（超过idle_timeout无数据则断开）
+            try:
+                length_bytes = await asyncio.wait_for(reader.readexactly(HEADER_SIZE), idle_timeout)
+            except asyncio.TimeoutError:
+                print(f"客户端空闲超时: {client_address}")
+                break
+
+            data_length, compressed = parse_header(length_bytes)
+            if data_length > MAX_FRAME_SIZE:
+                raise FrameTooLargeError(f"帧长度 {data_length} 超过上限 {MAX_FRAME_SIZE}")
+            received_data = await asyncio.wait_for(reader.readexactly(data_length), idle_timeout)
+            metrics.frame_received(HEADER_SIZE + data_length)
+            if compressed:
+                received_data = decompress_payload(received_data)
+
+            response_data, command_obj = handle_message(received_data, context)
+            if command_obj is not None:
+                try:
+                    future = context.submit_command(
+                        client_address, command_obj,
+                        lambda stream, data, command_obj=command_obj: emit(command_obj, stream, data))
+                except RateLimitedError as e:
+                    response_data = build_command_response(command_obj, throttled_result(e))
+                except SchedulerBusyError as e:
+                    response_data = build_command_response(command_obj, busy_result(e))
+                else:
+                    task = loop.create_task(reply(command_obj, future))
+                    pending_replies.add(task)
+                    task.add_done_callback(pending_replies.discard)
+                    continue
+
+            await send_frame(response_data)
+            if response_data.get("type") == "hello_ack":
+                codec = negotiate([response_data["encoding"]])
+                frame_compressor = context.compressor if response_data["compression"] else None
+            elif response_data.get("type") == "subscribe_ack":
+                context.pubsub.subscribe(client_address, response_data["topics"], push_event,
+                                         response_data["client_id"], blocking=False)
+            elif response_data.get("type") == "unsubscribe_ack":
+                context.pubsub.unsubscribe(client_address, response_data["topics"])
+
+    except asyncio.IncompleteReadError:
+        pass  # 客户端关闭连接
+    except (FrameTooLargeError, FrameDecodeError) as e:
+        print(f"[警告] {client_address} {e}，断开连接")
+    except Exception as e:
+        print(f"客户端处理错误: {e}")
+    finally:
+        context.pubsub.unsubscribe(client_address)
+        for task in pending_replies:
+            task.cancel()
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+        metrics.connection_closed()
+        print(f"客户端断开: {client_address}")
+
+
+async def serve_async(host='0.0.0.0', port=5555, secret_key="personnel_management_system_key",
+                      max_connections=100, idle_timeout=300, backlog=128, context=None, sock=None):
+    """asyncio服务器主协程，传入sock时直接使用这个已监听的socket"""
+    context = context or ServerContext(secret_key)
+    active_connections = 0
+
+    async def on_connect(reader, writer):
+        nonlocal active_connections
+        if active_connections >= max_connections:
+            # 超出连接上限：回复繁忙后立即断开
+            context.metrics.connection_rejected()
+            print(f"[警告] 连接数已达上限({max_connections})，拒绝: {writer.get_extra_info('peername')}")
+            writer.write(encode_response({"type": "error", "code": 503, "message": "服务器繁忙，连接数已达上限"}))
+            try:
+                await writer.drain()
+            finally:
+                writer.close()
+            return
+
+        active_connections += 1
+        try:
+            await handle_client_async(reader, writer, context, idle_timeout)
+        finally:
+            active_connections -= 1
+
+    if sock is not None:
+        server = await asyncio.start_server(on_connect, sock=sock)
+    else:
+        server = await asyncio.start_server(on_connect, host, port, reuse_address=True, backlog=backlog)
+    print(f"服务器启动(asyncio)，监听 {host}:{port}，最大连接数 {max_connections}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        context.log_stats()
+
+
+def start_async_server(host='0.0.0.0', port=5555, secret_key="personnel_management_system_key",
+                       max_connections=100, idle_timeout=300, backlog=128, context=None, sock=None):
+    """启动服务器（asyncio模式）"""
+    try:
+        asyncio.run(serve_async(host, port, secret_key, max_connections, idle_timeout, backlog, context, sock))
+    except KeyboardInterrupt:
+        print("服务器停止")
+
+
+def build_context(args, shared_nonces=None):
+    """按命令行参数创建ServerContext"""
+    return ServerContext(
+        args.secret_key,
+        scheduler=CommandScheduler(args.command_workers, args.client_queue, args.total_queue),
+        compressor=FrameCompressor(args.compress_threshold),
+        replay_guard=ReplayGuard(args.replay_window, require_nonce=args.require_nonce, shared=shared_nonces),
+        cache=CommandCache({} if args.no_command_cache else parse_ttl_options(args.cache_ttl),
+                           runner=COMMAND_RUNNER),
+        rate_limiter=RateLimiter(args.client_rate, args.client_burst, parse_rate_options(args.command_rate),
+                                 host_rate=args.host_rate, host_burst=args.host_burst),
+        max_inflight=args.max_inflight,
+        require_signature=not args.allow_unsigned_commands
+    )
+
+
+def run_server(args, context, sock=None):
+    if args.mode == "asyncio":
+        start_async_server(args.host, args.port, args.secret_key, args.max_connections,
+                           args.idle_timeout, args.backlog, context, sock)
+    else:
+        start_server(args.host, args.port, args.secret_key, args.backlog, context, sock)
+
+
+def run_worker(index, stats_queue, event_queue, inbox, args, listen_sock, shared_nonces):
+    """多进程模式下的工作进程：独立的ServerContext，定期向管理进程上报统计，
+    本进程发布的数据变更经管理进程转发给其他进程的订阅者"""
+    context = build_context(args, shared_nonces)
+    pid = os.getpid()
+    context.metrics.add_source("worker", lambda: {"index": index, "pid": pid})
+    context.pubsub.forward = lambda topic, event, source: event_queue.put((index, (topic, event, source)))
+
+    def receive_events():
+        while True:
+            topic, event, source = inbox.get()
+            context.pubsub.publish(topic, event, source, forward=False)
+
+    threading.Thread(target=receive_events, name="EventReceiver", daemon=True).start()
+
+    def report():
+        while True:
+            time.sleep(args.stats_interval)
+            stats_queue.put((index, pid, context.metrics.snapshot()))
+
+    threading.Thread(target=report, name="StatsReporter", daemon=True).start()
+    # 平台支持SO_REUSEPORT时每个进程自己监听，否则使用管理进程传来的监听socket
+    sock = listen_sock or create_listen_socket(args.host, args.port, args.backlog, reuse_port=True)
+    run_server(args, context, sock)
+
+
+def start_prefork_server(args):
+    """多进程模式：启动args.workers个工作进程共享监听端口，管理进程负责重启与汇总统计"""
+    listen_sock = None
+    if not reuse_port_supported():
+        listen_sock = create_listen_socket(args.host, args.port, args.backlog)
+    # nonce记录在各进程间共享，重放请求落到其他进程也会被拒绝
+    manager = multiprocessing.Manager()
+    shared_nonces = manager.dict()
+    supervisor = PreforkSupervisor(run_worker, args.workers, (args, listen_sock, shared_nonces))
+    if args.metrics_port:
+        start_metrics_http(supervisor, args.metrics_host, args.metrics_port)
+    print(f"多进程模式：{args.workers} 个工作进程，"
+          f"{'SO_REUSEPORT' if listen_sock is None else '共享监听socket'}，监听 {args.host}:{args.port}")
+
+    last_purge = time.monotonic()
+
+    def on_tick():
+        nonlocal last_purge
+        if time.monotonic() - last_purge >= 60:
+            last_purge = time.monotonic()
+            ReplayGuard.purge_shared(shared_nonces)
+
+    try:
+        supervisor.run_forever(on_tick)
+    finally:
+        stats = supervisor.snapshot()
+        print(f"合计: 连接 {stats.get('total_connections', 0)}，命令 {stats.get('command_status', {})}")
+        manager.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="人事管理系统命令服务器")
+    parser.add_argument("--mode", choices=["thread", "asyncio"], default="thread",
+                        help="thread: 每连接一个线程；asyncio: 单线程事件循环+有界命令线程池")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--secret-key", default="personnel_management_system_key")
+    parser.add_argument("--backlog", type=int, default=128, help="监听队列长度")
+    parser.add_argument("--max-connections", type=int, default=100, help="最大并发连接数（asyncio模式）")
+    parser.add_argument("--idle-timeout", type=float, default=300, help="连接空闲超时秒数（asyncio模式）")
+    parser.add_argument("--command-workers", type=int, default=4, help="同时执行的命令数上限")
+    parser.add_argument("--client-queue", type=int, default=8, help="单个客户端排队命令数上限")
+    parser.add_argument("--total-queue", type=int, default=64, help="全部客户端排队命令数上限")
+    parser.add_argument("--compress-threshold", type=int, default=1024,
+                        help="协商压缩后，负载达到该字节数才压缩")
+    parser.add_argument("--replay-window", type=int, default=300, help="签名时间戳允许的偏差秒数")
+    parser.add_argument("--require-nonce", action="store_true", help="拒绝不带nonce的签名请求")
+    parser.add_argument("--allow-unsigned-commands", action="store_true",
+                        help="接受未签名的命令（不做重放保护，仅用于兼容旧客户端）")
+    parser.add_argument("--cache-ttl", action="append", metavar="命令=秒数",
+                        help="设置某个命令的结果缓存时间，可重复指定（0表示不缓存）")
+    parser.add_argument("--no-command-cache", action="store_true", help="关闭命令结果缓存")
+    parser.add_argument("--client-rate", type=float, default=10, help="每个客户端每秒允许的命令数（0表示不限速）")
+    parser.add_argument("--client-burst", type=float, default=20, help="每个客户端允许的突发命令数")
+    parser.add_argument("--host-rate", type=float, default=0,
+                        help="同一主机上所有客户端合计每秒允许的命令数（默认0，不限速）")
+    parser.add_argument("--host-burst", type=float, default=100, help="同一主机允许的突发命令数")
+    parser.add_argument("--command-rate", action="append", metavar="命令=每秒次数[/突发数]",
+                        help="单独限制某个命令的速率，可重复指定（0表示不限速）")
+    parser.add_argument("--max-inflight", type=int, default=8,
+                        help="单个连接未回复命令数达到该值时暂停读取（0表示不限制）")
+    parser.add_argument("--metrics-port", type=int, default=0, help="指标HTTP端口（0表示不启动）")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="指标HTTP监听地址")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="工作进程数（0表示单进程）；多进程时每个进程按--mode运行，各自有独立的GIL")
+    parser.add_argument("--stats-interval", type=float, default=5, help="多进程模式下工作进程上报统计的间隔(秒)")
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        start_prefork_server(args)
+        return
+
+    context = build_context(args)
+    if args.metrics_port:
+        start_metrics_http(context.metrics, args.metrics_host, args.metrics_port)
+    run_server(args, context)
 
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    main()
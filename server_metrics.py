@@ -0,0 +1,265 @@
+import bisect
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Histogram:
+    """固定桶延迟直方图（单位：秒），分位数按桶上界估算（超出最大桶时取观测最大值）"""
+    BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)  # 最后一个桶为+Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.BUCKETS[i] if i < len(self.BUCKETS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.BUCKETS] + ["+Inf"], self.counts)),
+        }
+
+
+class ServerMetrics:
+    """服务器运行指标（线程安全）
+
+    统计连接数、收发帧数与字节数、每秒帧数（最近rate_window秒的平均）、
+    签名/重放拒绝次数、命令排队与执行耗时直方图以及各命令的调用次数。
+    其他组件（调度器、压缩器）可通过add_source挂上自己的统计。
+    """
+
+    def __init__(self, rate_window=10):
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.active_connections = 0
+        self.total_connections = 0
+        self.rejected_connections = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.signature_failures = 0
+        self.replay_rejections = 0
+        self.read_pauses = 0  # 因回复积压暂停读取连接的次数
+        self.command_counts = Counter()  # 命令名 -> 次数
+        self.command_status = Counter()  # 结果状态 -> 次数
+        self.wait_histogram = Histogram()
+        self.run_histogram = Histogram()
+        self._frame_seconds = deque()  # [整秒, 该秒收发帧数]
+        self._sources = {}
+
+    def add_source(self, name, stats_func):
+        """登记外部统计来源，snapshot时调用stats_func()并放在name下"""
+        self._sources[name] = stats_func
+
+    def _count_frame(self):
+        second = int(time.monotonic())
+        if self._frame_seconds and self._frame_seconds[-1][0] == second:
+            self._frame_seconds[-1][1] += 1
+        else:
+            self._frame_seconds.append([second, 1])
+            while self._frame_seconds[0][0] <= second - self.rate_window - 1:
+                self._frame_seconds.popleft()
+
+    def connection_opened(self):
+        with self._lock:
+            self.active_connections += 1
+            self.total_connections += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.active_connections -= 1
+
+    def connection_rejected(self):
+        with self._lock:
+            self.rejected_connections += 1
+
+    def frame_received(self, size):
+        with self._lock:
+            self.frames_in += 1
+            self.bytes_in += size
+            self._count_frame()
+
+    def frame_sent(self, size):
+        with self._lock:
+            self.frames_out += 1
+            self.bytes_out += size
+            self._count_frame()
+
+    def signature_failed(self):
+        with self._lock:
+            self.signature_failures += 1
+
+    def replay_rejected(self):
+        with self._lock:
+            self.replay_rejections += 1
+
+    def command_rejected(self):
+        with self._lock:
+            self.command_status["busy"] += 1
+
+    def command_throttled(self):
+        with self._lock:
+            self.command_status["throttled"] += 1
+
+    def read_paused(self):
+        with self._lock:
+            self.read_pauses += 1
+
+    def command_finished(self, name, wait_time, run_time, status):
+        with self._lock:
+            self.command_counts[name] += 1
+            self.command_status[status] += 1
+            self.wait_histogram.observe(wait_time)
+            self.run_histogram.observe(run_time)
+
+    def frames_per_second(self):
+        """最近rate_window个完整秒内的平均每秒帧数"""
+        current = int(time.monotonic())
+        with self._lock:
+            total = sum(count for second, count in self._frame_seconds
+                        if current - self.rate_window <= second < current)
+        return total / self.rate_window
+
+    def snapshot(self):
+        fps = self.frames_per_second()
+        with self._lock:
+            stats = {
+                "uptime": time.time() - self.started_at,
+                "active_connections": self.active_connections,
+                "total_connections": self.total_connections,
+                "rejected_connections": self.rejected_connections,
+                "frames_in": self.frames_in,
+                "frames_out": self.frames_out,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "frames_per_sec": fps,
+                "signature_failures": self.signature_failures,
+                "replay_rejections": self.replay_rejections,
+                "read_pauses": self.read_pauses,
+                "commands": dict(self.command_counts),
+                "command_status": dict(self.command_status),
+                "command_wait": self.wait_histogram.snapshot(),
+                "command_run": self.run_histogram.snapshot(),
+            }
+        for name, stats_func in self._sources.items():
+            try:
+                stats[name] = stats_func()
+            except Exception as e:
+                stats[name] = {"error": str(e)}
+        return stats
+
+    def render_text(self):
+        return render_text(self.snapshot())
+
+
+def render_text(snapshot):
+    """纯文本格式（每行“指标名 值”，嵌套字段用下划线连接），便于curl查看或采集"""
+    lines = []
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix}_{key}", item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"{prefix} {value}")
+
+    for key, value in snapshot.items():
+        walk(f"server_{key}", value)
+    return "\n".join(lines) + "\n"
+
+
+# 只属于单个进程、不参与合并的统计部分
+PER_PROCESS_SECTIONS = ("worker",)
+
+
+def _merge_values(key, values):
+    if all(isinstance(value, dict) for value in values):
+        if "buckets" in values[0]:
+            return _merge_histograms(values)
+        keys = list(dict.fromkeys(k for value in values for k in value))
+        return {k: _merge_values(k, [value[k] for value in values if k in value]) for k in keys}
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        if key in ("max", "uptime") or key.endswith("_max"):
+            return max(values)
+        if key == "avg" or key.endswith("_avg") or key.endswith("_ratio"):
+            return sum(values) / len(values)  # 各进程的简单平均（近似）
+        return sum(values)
+    return values[0]
+
+
+def _merge_histograms(snapshots):
+    histogram = Histogram()
+    for snapshot in snapshots:
+        for i, bucket_count in enumerate(snapshot["buckets"].values()):
+            histogram.counts[i] += bucket_count
+        histogram.count += snapshot["count"]
+        histogram.total += snapshot["sum"]
+        histogram.max = max(histogram.max, snapshot["max"])
+    return histogram.snapshot()
+
+
+def merge_snapshots(snapshots):
+    """合并多个进程的snapshot：计数求和，最大值取最大，直方图按桶合并后重新计算分位数
+
+    只描述单个进程的部分（PER_PROCESS_SECTIONS，如进程序号和pid）求和没有意义，合并结果中不包含，
+    各进程的状态由管理进程另行列出（见PreforkSupervisor.snapshot的workers）
+    """
+    snapshots = [{key: value for key, value in snapshot.items() if key not in PER_PROCESS_SECTIONS}
+                 for snapshot in snapshots if snapshot]
+    if not snapshots:
+        return {}
+    return _merge_values("", snapshots)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.metrics.render_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不打印每次访问
+
+
+def start_metrics_http(metrics, host='127.0.0.1', port=9100):
+    """在后台线程启动指标HTTP服务（GET /metrics），默认只监听本机，返回HTTPServer对象"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=httpd.serve_forever, name="MetricsHTTP", daemon=True).start()
+    print(f"指标服务启动: http://{host}:{port}/metrics")
+    return httpd
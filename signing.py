@@ -0,0 +1,112 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class SigningContext:
+    """HMAC-SHA256签名上下文
+
+    密钥只在创建时处理一次，得到预先加载密钥的HMAC对象；每条消息签名/验签时
+    copy()一份再写入待签名内容，省去反复编码密钥、初始化HMAC的开销。可在多线程间共享。
+    """
+
+    def __init__(self, secret_key):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        self._base = hmac.new(secret_key, digestmod=hashlib.sha256)
+
+    @staticmethod
+    def signing_string(cmd, timestamp, nonce=None):
+        """待签名内容：命令|时间戳[|随机数]"""
+        text = f"{cmd}|{timestamp}"
+        if nonce:
+            text += f"|{nonce}"
+        return text.encode('utf-8')
+
+    def sign(self, cmd, timestamp, nonce=None):
+        mac = self._base.copy()
+        mac.update(self.signing_string(cmd, timestamp, nonce))
+        return mac.hexdigest()
+
+    def verify(self, data, signature):
+        """验证消息签名（data中取command、timestamp、nonce）"""
+        expected = self.sign(data.get("command", ""), data.get("timestamp", ""), data.get("nonce"))
+        return hmac.compare_digest(str(signature), expected)
+
+
+def signing_timestamp():
+    """签名用的时间戳：带时区的UTC时间（ISO格式），客户端与服务器不在同一时区也能正确比较"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def parse_timestamp(value):
+    """把消息中的时间戳转为epoch秒，无法解析时返回None
+
+    支持epoch秒数和带时区的ISO字符串；不带时区的字符串（旧客户端）按服务器本地时间解析。
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+class ReplayGuard:
+    """重放保护（线程安全）
+
+    - 时间戳与服务器时间相差超过window秒的消息直接拒绝
+    - 窗口内见过的nonce记录在按到达顺序排列的有界字典中，重复出现即拒绝；
+      过期记录从头部淘汰，超过max_entries时淘汰最早的记录
+    - 不带nonce的旧客户端只做时间窗口检查（require_nonce为True时直接拒绝）
+    """
+
+    def __init__(self, window=300, max_entries=100000, require_nonce=False, shared=None):
+        self.window = window
+        self.max_entries = max_entries
+        self.require_nonce = require_nonce
+        self.shared = shared  # 多进程时各进程共享的 nonce -> 过期时间(epoch秒) 字典（如Manager().dict()）
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()  # nonce -> 过期时间(monotonic)
+
+    def check(self, nonce, timestamp):
+        """检查一条已通过验签的消息，返回 (是否放行, 拒绝原因)"""
+        sent_at = parse_timestamp(timestamp)
+        if sent_at is None:
+            return False, "时间戳无效"
+        if abs(time.time() - sent_at) > self.window:
+            return False, "时间戳超出允许范围"
+        if not nonce:
+            if self.require_nonce:
+                return False, "缺少nonce"
+            return True, ""
+
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                oldest, expires_at = next(iter(self._seen.items()))
+                if expires_at > now and len(self._seen) < self.max_entries:
+                    break
+                self._seen.popitem(last=False)
+            if nonce in self._seen:
+                return False, "重复的nonce"
+            self._seen[nonce] = now + self.window
+
+        if self.shared is not None:
+            # setdefault是原子操作：返回值不是自己写入的过期时间，说明其他进程已见过该nonce
+            expires_at = time.time() + self.window
+            if self.shared.setdefault(nonce, expires_at) != expires_at:
+                return False, "重复的nonce"
+        return True, ""
+
+    @staticmethod
+    def purge_shared(shared):
+        """清理共享字典中已过期的nonce（由管理进程定期调用），返回清理数量"""
+        now = time.time()
+        expired = [nonce for nonce, expires_at in shared.items() if expires_at <= now]
+        for nonce in expired:
+            shared.pop(nonce, None)
+        return len(expired)
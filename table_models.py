@@ -0,0 +1,111 @@
+import bisect
+import datetime
+from array import array
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class EmployeeTableModel(QAbstractTableModel):
+    """员工列表模型（配合QTableView使用）
+
+    数据按列存放（员工ID用紧凑的整型数组），不为每个单元格创建对象；
+    视图只对可见行调用data()，日期也在显示时才格式化。
+    """
+    FIELDS = [
+        "employee_id",  # 第0列
+        "employee_name",  # 第1列
+        "account",  # 第2列
+        "created_at",  # 第3列（日期类型）
+        "marital_status",  # 第4列
+        "education",  # 第5列
+        "gender",  # 第6列
+        "position_name"  # 第7列（可能为NULL）
+    ]  # 员工字段映射
+    HEADERS = ["员工ID", "姓名", "电话", "入职日期", "婚姻状况", "学历", "性别", "职位"]
+    EMPTY_TEXT = "未设置"
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = self.columnize([])
+        self._row_count = 0
+
+    @classmethod
+    def columnize(cls, rows):
+        """把查询结果（字典列表）转换为按列存储的数据，可在后台线程中调用"""
+        columns = [array('q', (row["employee_id"] for row in rows))]
+        for field in cls.FIELDS[1:]:
+            columns.append([row.get(field) for row in rows])
+        return columns
+
+    def set_columns(self, columns):
+        """整体替换表格数据"""
+        self.beginResetModel()
+        self._columns = columns
+        self._row_count = len(columns[0])
+        self.endResetModel()
+
+    def set_rows(self, rows):
+        self.set_columns(self.columnize(rows))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.FIELDS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        value = self._columns[index.column()][index.row()]
+        if value is None:
+            return self.EMPTY_TEXT
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.strftime('%Y-%m-%d')
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def value(self, row, field):
+        """按字段名取某行的原始值"""
+        return self._columns[self.FIELDS.index(field)][row]
+
+    def row_of(self, employee_id):
+        """员工ID所在的行号，不在表格中时返回None"""
+        try:
+            return self._columns[0].index(employee_id)
+        except ValueError:
+            return None
+
+    def upsert_rows(self, rows, insert=True):
+        """按员工ID更新已有行；insert为True时把表格中没有的员工按ID顺序插入（不重置整个模型）"""
+        for row_data in rows:
+            row = self.row_of(row_data["employee_id"])
+            if row is not None:
+                for column, field in enumerate(self.FIELDS[1:], 1):
+                    self._columns[column][row] = row_data.get(field)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.FIELDS) - 1))
+            elif insert:
+                row = bisect.bisect_left(self._columns[0], row_data["employee_id"])
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._columns[0].insert(row, row_data["employee_id"])
+                for column, field in enumerate(self.FIELDS[1:], 1):
+                    self._columns[column].insert(row, row_data.get(field))
+                self._row_count += 1
+                self.endInsertRows()
+
+    def remove_ids(self, employee_ids):
+        """删除指定员工ID所在的行"""
+        for employee_id in employee_ids:
+            row = self.row_of(employee_id)
+            if row is None:
+                continue
+            self.beginRemoveRows(QModelIndex(), row, row)
+            for column in self._columns:
+                del column[row]
+            self._row_count -= 1
+            self.endRemoveRows()
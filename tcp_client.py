@@ -0,0 +1,494 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtNetwork import QAbstractSocket, QTcpSocket
+from collections import deque
+from concurrent.futures import Future
+import itertools
+import random
+import time
+import uuid
+
+from codec import JSON_CODEC, DecodeError, available_encodings, decode_frame, negotiate
+from pubsub import publish_command
+from signing import SigningContext, signing_timestamp
+from framing import (COMPRESSION_METHODS, FrameCompressor, FrameDecodeError, FrameDecoder, FrameTooLargeError,
+                     encode_frame)
+
+
+class TcpSocketClient(QObject):
+    """基于QTcpSocket的事件驱动客户端
+
+    与network.SocketClient的信号和接口相同（start/stop/isRunning/send_data/send_secure_data/send_request等），
+    可直接替换。不占用单独线程：连接、收发、心跳、超时与退避重连都由GUI事件循环驱动，
+    readyRead时增量解析帧；stop()直接abort连接并停止所有定时器，立即返回。
+    """
+    status_updated = pyqtSignal(str)  # 用于发送状态消息
+    message_received = pyqtSignal(dict)  # 用于发送接收到的消息
+    connection_established = pyqtSignal()  # 连接成功信号
+    connection_lost = pyqtSignal()  # 连接丢失信号
+    request_completed = pyqtSignal(str, dict)  # request_id, 最终响应
+    request_timed_out = pyqtSignal(str)  # request_id
+    request_failed = pyqtSignal(str, str)  # request_id, 失败原因（如连接断开）
+    rtt_measured = pyqtSignal(float)  # 心跳往返时间(毫秒)
+    reconnecting = pyqtSignal(int, float)  # 第几次重连, 等待秒数
+
+    REQUEST_TIMEOUT = 30  # 默认请求超时(秒)
+    CONNECT_TIMEOUT = 10  # 连接超时(秒)
+
+    def __init__(self, secret_key="personnel_management_system_key", heartbeat_interval=5, max_missed_heartbeats=3,
+                 parent=None):
+        super().__init__(parent)
+        self.host = None
+        self.port = None
+        self.codec = JSON_CODEC  # 发送编码，连接后经hello握手协商
+        self.compressor = FrameCompressor()  # 发送端压缩统计（跨连接累计）
+        self.compress_enabled = False  # 是否已协商压缩
+        self.decoder = None  # 每个连接一个
+        self.running = False
+        self.connected = False
+        self.signer = SigningContext(secret_key)
+        self.reconnect_attempts = 0
+        self.max_reconnect_attempts = None  # None表示一直重连直到stop()
+        self.reconnect_base_delay = 1
+        self.reconnect_max_delay = 30
+        self._ever_connected = False  # 首次连接失败时不重连（与SocketClient一致）
+
+        # 待发送队列：连接中断期间发送的数据暂存于此，重连成功后按顺序补发
+        self._outbound = deque()
+        self.max_outbound = 100
+
+        self.heartbeat_interval = heartbeat_interval
+        self.max_missed_heartbeats = max_missed_heartbeats
+        self._heartbeats = {}  # 未应答心跳 request_id -> 发送时间
+        self.missed_heartbeats = 0
+
+        # 待响应请求表：request_id -> {"future", "deadline", "timeout"}（只在GUI线程访问，无需加锁）
+        self._request_prefix = uuid.uuid4().hex[:8]
+        self._request_counter = itertools.count(1)
+        self._pending_requests = {}
+        self.client_id = self._request_prefix  # 服务器据此不把本客户端发布的事件再推回来
+        self.subscriptions = set()  # 已订阅的数据变更主题
+
+        self.socket = QTcpSocket(self)
+        self.socket.connected.connect(self._on_connected)
+        self.socket.disconnected.connect(self._on_disconnected)
+        self.socket.readyRead.connect(self._on_ready_read)
+        # Qt 5.15起为errorOccurred，旧版本为重载的error信号
+        error_signal = getattr(self.socket, "errorOccurred", None) or self.socket.error[QAbstractSocket.SocketError]
+        error_signal.connect(self._on_socket_error)
+
+        self.connect_timer = QTimer(self)
+        self.connect_timer.setSingleShot(True)
+        self.connect_timer.timeout.connect(lambda: self._on_connect_failed("连接超时"))
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self._connect)
+        self.heartbeat_timer = QTimer(self)
+        self.heartbeat_timer.timeout.connect(self._heartbeat_tick)
+        self.request_timer = QTimer(self)
+        self.request_timer.setInterval(500)
+        self.request_timer.timeout.connect(self._check_request_timeouts)
+
+    # ---- 配置 ----
+
+    def set_server(self, host, port):
+        """设置服务器地址和端口"""
+        self.host = host
+        self.port = int(port)
+
+    def set_heartbeat(self, interval, max_missed=3):
+        """设置心跳间隔(秒)与允许连续丢失的次数，下次连接时生效"""
+        self.heartbeat_interval = interval
+        self.max_missed_heartbeats = max_missed
+
+    def set_reconnect_policy(self, base_delay=1, max_delay=30, max_attempts=None):
+        """设置重连退避：等待时间从base_delay起按2倍增长，最多max_delay秒；max_attempts为None时不限次数"""
+        self.reconnect_base_delay = base_delay
+        self.reconnect_max_delay = max_delay
+        self.max_reconnect_attempts = max_attempts
+
+    def backoff_delay(self, attempt):
+        """第attempt次（从0开始）重连前的等待时间：指数增长并加随机抖动"""
+        ceiling = min(self.reconnect_max_delay, self.reconnect_base_delay * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def next_request_id(self):
+        return f"{self._request_prefix}-{next(self._request_counter)}"
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        """开始连接（立即返回，结果通过connection_established/connection_lost通知）"""
+        if self.running:
+            return
+        if not self.host or not self.port:
+            self.status_updated.emit("请先设置服务器地址和端口")
+            return
+        self.running = True
+        self._ever_connected = False
+        self.reconnect_attempts = 0
+        self._connect()
+
+    def isRunning(self):
+        return self.running
+
+    def stop(self):
+        """立即停止：中止连接、停止所有定时器，待发送和待响应的请求全部失败"""
+        was_running = self.running
+        self.running = False
+        self.connected = False
+        for timer in (self.connect_timer, self.reconnect_timer, self.heartbeat_timer, self.request_timer):
+            timer.stop()
+        self.socket.abort()
+        self.decoder = None
+        self.reconnect_attempts = 0
+        self._discard_outbound("连接已关闭")
+        self._fail_all_requests("连接已关闭")
+        if was_running:
+            self.status_updated.emit("连接已关闭")
+
+    def _connect(self):
+        if not self.running:
+            return
+        self.socket.abort()
+        self.decoder = FrameDecoder()
+        self.connect_timer.start(self.CONNECT_TIMEOUT * 1000)
+        self.socket.connectToHost(self.host, self.port)
+
+    def _on_connected(self):
+        self.connect_timer.stop()
+        self.socket.setSocketOption(QAbstractSocket.LowDelayOption, 1)
+        self.socket.setSocketOption(QAbstractSocket.KeepAliveOption, 1)
+        self._heartbeats.clear()
+        self.missed_heartbeats = 0
+        # 编码协商：握手完成前使用JSON
+        self.codec = JSON_CODEC
+        self.compress_enabled = False
+        self._send_frame({"type": "hello", "encodings": available_encodings(),
+                          "compression": COMPRESSION_METHODS, "request_id": self.next_request_id()})
+        if self.subscriptions:
+            self._send_frame(self._subscribe_message())
+        self.connected = True
+        self._ever_connected = True
+        self.reconnect_attempts = 0
+        self._replay_outbound()
+        self.heartbeat_timer.start(int(self.heartbeat_interval * 1000))
+        self.status_updated.emit(f"成功连接到服务器 {self.host}:{self.port}")
+        self.connection_established.emit()
+
+    def _on_socket_error(self, error):
+        if not self.running:
+            return
+        if self.connected:
+            self.status_updated.emit(f"套接字错误: {self.socket.errorString()}")
+            self._handle_connection_lost()
+        elif self.connect_timer.isActive():
+            self._on_connect_failed(self.socket.errorString())
+
+    def _on_disconnected(self):
+        if self.running and self.connected:
+            self._handle_connection_lost()
+
+    def _on_connect_failed(self, reason):
+        self.connect_timer.stop()
+        self.socket.abort()
+        self.status_updated.emit(f"连接服务器失败: {reason}")
+        if not self._ever_connected:
+            # 首次连接失败：与SocketClient一样直接结束
+            self.running = False
+            self._discard_outbound("连接失败")
+            self.connection_lost.emit()
+            return
+        self._schedule_reconnect()
+
+    def _handle_connection_lost(self):
+        """处理连接丢失：已发出未响应的请求失败，队列中的请求保留到重连后补发"""
+        self.connected = False
+        self.heartbeat_timer.stop()
+        self.socket.abort()
+        self.status_updated.emit("与服务器的连接已丢失")
+        self.connection_lost.emit()
+        self._fail_all_requests("与服务器的连接已丢失", keep=self._queued_request_ids())
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if not self.running:
+            return
+        if self.max_reconnect_attempts is not None and self.reconnect_attempts >= self.max_reconnect_attempts:
+            self.status_updated.emit("重连尝试次数已达上限，停止重连")
+            self.running = False
+            self._discard_outbound("重连失败")
+            return
+        delay = self.backoff_delay(self.reconnect_attempts)
+        self.reconnect_attempts += 1
+        self.reconnecting.emit(self.reconnect_attempts, delay)
+        self.status_updated.emit(f"{delay:.1f}秒后尝试第 {self.reconnect_attempts} 次重连...")
+        self.reconnect_timer.start(int(delay * 1000))
+
+    # ---- 接收 ----
+
+    def _on_ready_read(self):
+        if self.decoder is None:
+            return
+        try:
+            frames = self.decoder.feed(bytes(self.socket.readAll()))
+        except (FrameTooLargeError, FrameDecodeError) as e:
+            self.status_updated.emit(f"接收数据错误: {str(e)}")
+            self._handle_connection_lost()
+            return
+        for frame in frames:
+            self.process_received_data(frame)
+            if not self.connected:
+                break  # 处理过程中连接已关闭
+
+    def process_received_data(self, data):
+        """处理一帧数据并发出message_received"""
+        try:
+            message = decode_frame(data)
+            self.missed_heartbeats = 0  # 收到任何数据都说明连接仍然可用
+            if message.get("type") == "heartbeat_ack" and self._on_heartbeat_ack(message.get("request_id")):
+                return  # 内部心跳的应答不转发给界面
+            if message.get("type") == "hello_ack":
+                self.codec = negotiate([message.get("encoding")])
+                self.compress_enabled = message.get("compression") in COMPRESSION_METHODS
+                self.status_updated.emit(
+                    f"通信编码: {self.codec.name}，压缩: {message.get('compression') or '无'}")
+            self._resolve_request(message)
+            self.message_received.emit(message)
+        except DecodeError as e:
+            self.message_received.emit({
+                "type": "error",
+                "error_type": "DecodeError",
+                "message": str(e),
+                "raw_data": str(data[:100], 'utf-8', 'replace') + "..."
+            })
+        except Exception as e:
+            self.message_received.emit({"type": "error", "error_type": "ProcessingError", "message": str(e)})
+
+    # ---- 心跳 ----
+
+    def _heartbeat_tick(self):
+        if self._heartbeats:
+            self.missed_heartbeats += 1
+            if self.missed_heartbeats >= self.max_missed_heartbeats:
+                self.status_updated.emit(f"连续 {self.missed_heartbeats} 次心跳无响应")
+                self._handle_connection_lost()
+                return
+        request_id = self.next_request_id()
+        self._heartbeats[request_id] = time.monotonic()
+        try:
+            self._send_frame({"type": "heartbeat", "request_id": request_id, "timestamp": time.time()})
+        except OSError as e:
+            self.status_updated.emit(f"发送心跳失败: {str(e)}")
+
+    def _on_heartbeat_ack(self, request_id):
+        """收到心跳应答：计算往返时间，清除更早的未应答心跳"""
+        sent_at = self._heartbeats.get(request_id)
+        if sent_at is None:
+            return False
+        self.rtt_measured.emit((time.monotonic() - sent_at) * 1000)
+        self._heartbeats = {key: t for key, t in self._heartbeats.items() if t > sent_at}
+        return True
+
+    # ---- 发送 ----
+
+    def _send_frame(self, data):
+        """按当前编码写入一帧（写入QTcpSocket的发送缓冲区，由事件循环发出）"""
+        frame = encode_frame(self.codec.encode(data), self.compressor if self.compress_enabled else None)
+        if self.socket.state() != QAbstractSocket.ConnectedState or self.socket.write(frame) != len(frame):
+            raise OSError("未连接到服务器")
+
+    def _sign(self, data):
+        """构建带HMAC签名的安全数据包（签名覆盖命令、时间戳和一次性nonce）"""
+        cmd = data.get("command", "")
+        timestamp = signing_timestamp()  # 每次签名都取当前UTC时间，调用方数据中的本地时间不参与签名
+        nonce = uuid.uuid4().hex
+        return {
+            "request_id": self.next_request_id(),
+            **data,
+            "timestamp": timestamp,
+            "nonce": nonce,
+            "signature": self.signer.sign(cmd, timestamp, nonce),
+            "sign_type": "hmac-sha256",
+            "client_type": "personnel_management_client"
+        }
+
+    def _queue_outbound(self, kind, data):
+        """连接中断时把数据放入待发送队列，返回是否已入队（已连接时返回False）"""
+        if self.connected:
+            return False
+        self._append_outbound(kind, data)
+        return True
+
+    def _append_outbound(self, kind, data):
+        """加入待发送队列，超过max_outbound时丢弃最早的数据"""
+        if len(self._outbound) >= self.max_outbound:
+            dropped = self._outbound.popleft()[1]
+            self.status_updated.emit(f"待发送队列已满，丢弃最早的数据: {dropped.get('command', dropped.get('type'))}")
+            if dropped.get("request_id") is not None:
+                self._fail_request(dropped["request_id"], "待发送队列已满")
+        self._outbound.append((kind, data))
+
+    def _replay_outbound(self):
+        """重连后按顺序补发待发送队列（重新签名），发送成功才出队；连接又断开时其余数据留在队列中等下次重连"""
+        replayed = 0
+        while self._outbound:
+            kind, data = self._outbound[0]
+            try:
+                if kind == "secure":
+                    self._send_frame(self._sign(data))
+                else:
+                    self._send_frame({"request_id": self.next_request_id(), **data})
+            except OSError as e:
+                self.status_updated.emit(f"补发中断: {e}，剩余 {len(self._outbound)} 条数据等待重连后发送")
+                break
+            except Exception as e:  # 无法编码的数据重发也不会成功，丢弃并让对应请求失败
+                self._outbound.popleft()
+                if data.get("request_id") is not None:
+                    self._fail_request(data["request_id"], f"补发失败: {e}")
+                continue
+            self._outbound.popleft()
+            replayed += 1
+        if replayed:
+            self.status_updated.emit(f"已补发连接中断期间的 {replayed} 条数据")
+
+    def _queued_request_ids(self):
+        return {data.get("request_id") for _, data in self._outbound}
+
+    def _discard_outbound(self, reason):
+        """清空待发送队列，其中的请求一并失败"""
+        request_ids = [data.get("request_id") for _, data in self._outbound]
+        self._outbound.clear()
+        for request_id in request_ids:
+            if request_id is not None:
+                self._fail_request(request_id, reason)
+
+    def send_data(self, data):
+        """发送数据到服务器（连接中断期间加入待发送队列）"""
+        if not self.running:
+            self.status_updated.emit("未连接到服务器，无法发送数据")
+            return
+        if self._queue_outbound("plain", data):
+            self.status_updated.emit(f"连接中断，数据已加入待发送队列: {data.get('type', '未知类型')}")
+            return
+        try:
+            self._send_frame({"request_id": self.next_request_id(), **data})
+            self.status_updated.emit(f"已发送数据: {data.get('type', '未知类型')}")
+        except OSError as e:
+            self.status_updated.emit(f"发送数据失败: {str(e)}")
+
+    def send_secure_data(self, data):
+        """发送带HMAC签名的数据，返回是否已发送（连接中断期间返回是否已加入待发送队列）"""
+        if not self.running:
+            self.status_updated.emit("未连接到服务器，无法发送安全数据")
+            return False
+        cmd = data.get("command", "")
+        if self._queue_outbound("secure", data):
+            self.status_updated.emit(f"连接中断，命令已加入待发送队列: {cmd}")
+            return True
+        try:
+            self._send_frame(self._sign(data))
+            self.status_updated.emit(f"[安全] 发送命令: {cmd}")
+            return True
+        except OSError as e:
+            # 连接刚断开、disconnected信号还未处理：放入队列，重连后补发
+            self.status_updated.emit(f"发送安全命令失败: {str(e)}，重连后补发")
+            self._append_outbound("secure", data)
+            return True
+
+    # ---- 请求跟踪 ----
+
+    def send_request(self, data, timeout=None):
+        """发送带签名的请求并登记到待响应表，返回Future（附带request_id属性）"""
+        data = {**data, "request_id": data.get("request_id") or self.next_request_id()}
+        timeout = timeout or self.REQUEST_TIMEOUT
+        future = Future()
+        future.request_id = data["request_id"]
+        self._pending_requests[future.request_id] = {
+            "future": future,
+            "timeout": timeout,
+            "deadline": time.monotonic() + timeout
+        }
+        if not self.request_timer.isActive():
+            self.request_timer.start()
+        if not self.send_secure_data(data):
+            self._fail_request(future.request_id, "发送失败")
+        return future
+
+    def request_stats(self):
+        """向服务器查询运行统计（需签名），结果以type为stats的消息返回"""
+        return self.send_request({
+            "type": "stats",
+            "command": "stats"
+        })
+
+    def subscribe(self, topics):
+        """订阅数据变更主题，事件以type为event的消息返回；断线重连后自动重新订阅"""
+        self.subscriptions.update(topics)
+        if self.connected:
+            try:
+                self._send_frame(self._subscribe_message())
+            except OSError:
+                pass  # 重连后随握手重新订阅
+
+    def _subscribe_message(self):
+        return {"type": "subscribe", "topics": sorted(self.subscriptions), "client_id": self.client_id,
+                "request_id": self.next_request_id()}
+
+    def publish(self, topic, action, ids, **fields):
+        """广播一条数据变更（需签名），其他订阅了topic的客户端据此刷新受影响的行"""
+        event = {"action": action, "ids": list(ids), **fields}
+        return self.send_secure_data({
+            "type": "publish",
+            "command": publish_command(topic, event),
+            "topic": topic,
+            "event": event,
+            "client_id": self.client_id
+        })
+
+    def compression_stats(self):
+        """压缩统计：发送方向节省的字节数，以及接收到的压缩帧解压前后大小"""
+        stats = {"sent": self.compressor.stats()}
+        decoder = self.decoder
+        if decoder is not None:
+            stats["received"] = {
+                "frames_decompressed": decoder.frames_decompressed,
+                "bytes_compressed": decoder.bytes_compressed,
+                "bytes_decompressed": decoder.bytes_decompressed,
+                "bytes_saved": decoder.bytes_decompressed - decoder.bytes_compressed
+            }
+        return stats
+
+    def pending_request_count(self):
+        return len(self._pending_requests)
+
+    def _resolve_request(self, message):
+        request_id = message.get("request_id")
+        entry = self._pending_requests.get(request_id) if request_id is not None else None
+        if entry is None:
+            return
+        if message.get("type") == "command_chunk":
+            entry["deadline"] = time.monotonic() + entry["timeout"]  # 流式输出仍在进行，顺延超时
+            return
+        del self._pending_requests[request_id]
+        entry["future"].set_result(message)
+        self.request_completed.emit(request_id, message)
+
+    def _fail_request(self, request_id, reason):
+        entry = self._pending_requests.pop(request_id, None)
+        if entry is not None:
+            entry["future"].set_exception(ConnectionError(reason))
+            self.request_failed.emit(request_id, reason)
+
+    def _fail_all_requests(self, reason, keep=()):
+        for request_id in [request_id for request_id in self._pending_requests if request_id not in keep]:
+            self._fail_request(request_id, reason)
+
+    def _check_request_timeouts(self):
+        now = time.monotonic()
+        expired = [request_id for request_id, entry in self._pending_requests.items() if entry["deadline"] <= now]
+        for request_id in expired:
+            entry = self._pending_requests.pop(request_id)
+            entry["future"].set_exception(TimeoutError(f"请求超时: {request_id}"))
+            self.request_timed_out.emit(request_id)
+        if not self._pending_requests:
+            self.request_timer.stop()
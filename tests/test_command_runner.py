@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import command_runner
+from command_runner import CommandRejectedError, CommandRunner
+
+
+class ShellFallbackTest(unittest.TestCase):
+    """回退为shell执行的命令，参数不能再启动第二个命令"""
+
+    def make_runner(self, missing):
+        runner = CommandRunner()
+        for name in missing:
+            runner.executables[name] = None  # 模拟PATH中找不到可执行文件
+        return runner
+
+    def test_posix_time_keyword_rejects_arguments(self):
+        runner = self.make_runner(["time"])
+        with mock.patch.object(command_runner, "IS_WINDOWS", False):
+            with self.assertRaises(CommandRejectedError):
+                runner.prepare("time touch /tmp/pwned_by_time")
+            self.assertEqual(runner.prepare("time"), (("time",), True))
+
+    def test_posix_arguments_are_quoted(self):
+        runner = self.make_runner(["echo"])
+        with mock.patch.object(command_runner, "IS_WINDOWS", False):
+            argv, use_shell = runner.prepare("echo 'a; touch /tmp/x'")
+        self.assertTrue(use_shell)
+        self.assertEqual(argv, ("echo 'a; touch /tmp/x'",))
+
+    @unittest.skipIf(os.name == "nt", "需要POSIX shell")
+    def test_posix_shell_does_not_run_second_command(self):
+        runner = self.make_runner(["echo"])
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, "pwned")
+            result = runner.run(f"echo 'a; touch {target}' '$(touch {target})'", timeout=5)
+            self.assertFalse(os.path.exists(target))
+        self.assertIn("a; touch", result.stdout)
+
+    def test_windows_rejects_cmd_metacharacters(self):
+        runner = self.make_runner(["echo", "dir"])
+        with mock.patch.object(command_runner, "IS_WINDOWS", True):
+            for command in ("echo a & del x", "echo a|more", "echo a > out.txt", "echo %PATH%", "dir ^& calc"):
+                with self.subTest(command=command):
+                    with self.assertRaises(CommandRejectedError):
+                        runner.prepare(command)
+            self.assertEqual(runner.prepare("echo hello"), (("echo hello",), True))
+
+    def test_rejects_commands_outside_whitelist(self):
+        runner = CommandRunner()
+        with self.assertRaises(CommandRejectedError):
+            runner.prepare("rm -rf /")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import uuid
+
+from server import ServerContext, dispatch_message
+from signing import SigningContext, signing_timestamp
+
+SECRET_KEY = "test_key"
+
+
+def signed_command(command="whoami"):
+    timestamp = signing_timestamp()
+    nonce = uuid.uuid4().hex
+    return {
+        "type": "command",
+        "command": command,
+        "timestamp": timestamp,
+        "nonce": nonce,
+        "signature": SigningContext(SECRET_KEY).sign(command, timestamp, nonce),
+        "sign_type": "hmac-sha256",
+        "request_id": 1
+    }
+
+
+class ReplayTest(unittest.TestCase):
+    """截获的命令帧不能再次执行，去掉签名后也不行"""
+
+    def setUp(self):
+        self.context = ServerContext(SECRET_KEY)
+
+    def dispatch(self, frame):
+        return dispatch_message(dict(frame), self.context)
+
+    def test_signed_command_is_accepted_once(self):
+        frame = signed_command()
+        response, command_obj = self.dispatch(frame)
+        self.assertIsNone(response)
+        self.assertEqual(command_obj["command"], "whoami")
+
+        response, command_obj = self.dispatch(frame)
+        self.assertIsNone(command_obj)
+        self.assertEqual(response["code"], 401)
+
+    def test_replay_with_signature_stripped_is_rejected(self):
+        frame = signed_command()
+        self.dispatch(frame)
+        stripped = {key: value for key, value in frame.items() if key not in ("signature", "sign_type")}
+
+        response, command_obj = self.dispatch(stripped)
+        self.assertIsNone(command_obj)
+        self.assertEqual(response["code"], 401)
+
+    def test_unsupported_sign_type_is_rejected(self):
+        frame = dict(signed_command(), sign_type="none")
+        response, command_obj = self.dispatch(frame)
+        self.assertIsNone(command_obj)
+        self.assertEqual(response["code"], 401)
+
+    def test_unsigned_commands_can_be_allowed_explicitly(self):
+        context = ServerContext(SECRET_KEY, require_signature=False)
+        response, command_obj = dispatch_message({"type": "command", "command": "whoami"}, context)
+        self.assertIsNone(response)
+        self.assertFalse(command_obj["verified"])
+
+
+if __name__ == "__main__":
+    unittest.main()